@@ -39,32 +39,44 @@ class Rand(snap.Collector):
         # add flag to test lib-py flags
         self._flags.add_multiple([('required-config', snap.plugin.FlagType.toggle, 'Example flag'),
                                  ('some-value', snap.plugin.FlagType.value, 'Some value to pass to metric', 1234)])
+        # the requested metrics are dispatched to the handler registered for
+        # their namespace, "*" matches any value
+        self.add_handler(("intel", "random", "float64"),
+                         lambda metrics: self._set(metrics, random.random))
+        self.add_handler(("intel", "random", "string"),
+                         lambda metrics: self._set(metrics, lambda: "bah"))
+        self.add_handler(("intel", "random", "int64"), self._collect_int)
+        self.add_handler(("intel", "random", "other_value"),
+                         lambda metrics: self._set(
+                             metrics, lambda: self._args.some_value))
+        self.add_handler(("intel", "random", "*", "uid"),
+                         lambda metrics: self._set_pid(metrics, os.getuid))
+        self.add_handler(("intel", "random", "*", "gid"),
+                         lambda metrics: self._set_pid(metrics, os.getgid))
 
     def collect(self, metrics):
+        """Called with the requested metrics no handler is registered for"""
         LOG.debug("CollectMetrics called")
+        return []
+
+    def _set(self, metrics, value):
         for metric in metrics:
-            switch = {
-                "float64": random.random(),
-                "string": "bah",
-                "int64": random.randint(
-                    metric.config["int_min"],
-                    metric.config["int_max"]
-                    ),
-                "other_value": self._args.some_value,
-                "*": None
-            }
-            typ = metric.namespace[2].value
-            if typ == "*":
-                metric.namespace[2].value = str(os.getpid())
-                if metric.namespace[3].value == "uid":
-                    metric.data = os.getuid()
-                elif metric.namespace[3].value == "gid":
-                    metric.data = os.getgid()
-            else:
-                metric.data = switch[typ]
+            metric.data = value()
             metric.timestamp = time.time()
         return metrics
 
+    def _collect_int(self, metrics):
+        for metric in metrics:
+            metric.data = random.randint(metric.config["int_min"],
+                                         metric.config["int_max"])
+            metric.timestamp = time.time()
+        return metrics
+
+    def _set_pid(self, metrics, value):
+        for metric in metrics:
+            metric.namespace[2].value = str(os.getpid())
+        return self._set(metrics, value)
+
     def update_catalog(self, config):
         LOG.debug("GetMetricTypes called")
         metrics = []
@@ -50,9 +50,10 @@ class Tag(snap.Processor):
                 List of processed metrics.
         """
         LOG.debug("Process called")
-        for metric in metrics:
-            metric.tags["instance-id"] = config["instance-id"]
-        return metrics
+        # apply adds the tag to the protobuf of every metric without
+        # wrapping it in a snap.Metric
+        tags = snap.TagSet({"instance-id": config["instance-id"]})
+        return tags.apply(metrics)
 
     def get_config_policy(self):
         """Get's the config policy
@@ -25,9 +25,12 @@ https://intelsdi-x.github.io/snap-plugin-lib-py/.
 
 """
 
-__all__ = ['Collector', 'Processor', 'Publisher', 'StreamCollector', 'Metric', 'Namespace',
-           'NamespaceElement', 'ConfigMap', 'StringRule', 'IntegerRule',
-           'BoolRule', 'FloatRule', 'ConfigPolicy', 'FlagType']
+__all__ = ['Collector', 'Processor', 'Publisher', 'StreamCollector', 'Metric',
+           'MetricBatch', 'MetricList', 'MetricPrototype', 'MetricRow',
+           'Namespace', 'NamespaceElement', 'NamespaceRouter', 'TagSet',
+           'ConfigMap', 'FrozenConfigMap', 'StringRule', 'IntegerRule',
+           'BoolRule', 'FloatRule', 'ConfigPolicy', 'FlagType',
+           'ResourceCache', 'ResultCache', 'Deadline']
 
 import logging
 import sys
@@ -37,17 +40,37 @@ from .processor import Processor
 from .publisher import Publisher
 from .stream_collector import StreamCollector
 from .metric import Metric
+from .metric_batch import MetricBatch
+from .metric_list import MetricList
+from .metric_prototype import MetricPrototype
+from .encoder import MetricRow
+from .tag_set import TagSet
 from .namespace import Namespace
 from .namespace_element import NamespaceElement
-from .config_map import ConfigMap
+from .namespace_router import NamespaceRouter
+from .config_map import ConfigMap, FrozenConfigMap
 from .config_policy import ConfigPolicy
 from .string_policy import StringRule
 from .integer_policy import IntegerRule
 from .bool_policy import BoolRule
 from .float_policy import FloatRule
 from .plugin import FlagType
+from .resource_cache import ResourceCache
+from .result_cache import ResultCache
+from .deadline import Deadline
 from ._version import get_versions
 
+# the asyncio plugins need contextvars (python 3.7+)
+if sys.version_info >= (3, 7):
+    try:
+        from .aio import (AsyncCollector, AsyncProcessor, AsyncPublisher,
+                          AsyncStreamCollector)
+        __all__ += ['AsyncCollector', 'AsyncProcessor', 'AsyncPublisher',
+                    'AsyncStreamCollector']
+    except ImportError:
+        # grpcio older than 1.32 has no grpc.aio
+        pass
+
 LOG = logging.getLogger()
 _OUT_HDLR = logging.StreamHandler(sys.stderr)
 _OUT_HDLR.setFormatter(logging.Formatter("""%(asctime)s - %(name)s - \
@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""asyncio plugins served by a ``grpc.aio`` server (Python 3.7+).
+
+The server runs on an event loop in a thread of its own, so starting the
+plugin, the preamble and the health check monitor work as for the other
+plugins.  The methods of the plugin (``collect``, ``process``, ``publish`` and
+``stream``) are coroutines run on that loop: a request waiting on I/O
+doesn't hold a thread and any number of requests can be served at once.
+``update_catalog`` and ``get_config_policy`` remain regular methods, run on
+a thread pool so that they don't block the loop.
+
+The requests served concurrently on the loop thread keep their reply
+timestamp and deadline in context variables, which the thread-local
+fallback of Python 3.6 would share between them.
+"""
+
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import traceback
+from abc import abstractmethod
+from concurrent import futures
+
+import grpc
+from grpc import aio
+
+from .catalog_cache import _metric_types
+from .collector import Collector, _collected
+from .collector_proxy import _CollectorProxy
+from .config_map import ConfigMap
+from .deadline import Deadline, _request_deadline
+from .encoder import _metrics_reply
+from .metric_list import MetricList
+from .namespace_router import _extend, _missed_deadline
+from .plugin_pb2 import CollectReply, ErrReply, MetricsReply
+from .plugin_proxy import PluginProxy
+from .processor import Processor
+from .processor_proxy import _ProcessorProxy
+from .publisher import Publisher
+from .publisher_proxy import PublisherProxy
+from .result_cache import _miss_request
+from .servicers import (_EXHAUSTED, add_CollectorServicer_to_server,
+                        add_ProcessorServicer_to_server,
+                        add_PublisherServicer_to_server,
+                        add_StreamCollectorServicer_to_server)
+from .stream_collector import StreamCollector
+from .stream_collector_proxy import _StreamCollectorProxy
+
+LOG = logging.getLogger(__name__)
+
+if sys.version_info < (3, 7):
+    # asyncio tasks don't run in a context of their own before 3.7
+    raise ImportError("asyncio plugins require Python 3.7+")
+
+
+class _AioServer(object):
+    """Drives a grpc.aio server running on `loop` from other threads.
+
+    It provides the part of :py:class:`grpc.Server` used by
+    :py:class:`~snap_plugin.v1.plugin.Plugin`.
+    """
+
+    def __init__(self, loop, server):
+        self._loop = loop
+        self._server = server
+
+    def _call(self, function, *args):
+        async def _run():
+            return function(*args)
+        return asyncio.run_coroutine_threadsafe(_run(), self._loop).result()
+
+    def add_insecure_port(self, address):
+        return self._call(self._server.add_insecure_port, address)
+
+    def add_secure_port(self, address, credentials):
+        return self._call(self._server.add_secure_port, address, credentials)
+
+    def start(self):
+        asyncio.run_coroutine_threadsafe(self._server.start(),
+                                         self._loop).result()
+
+    def stop(self, grace):
+        """Stops the server and its loop, returns an event set once done"""
+        stopped = threading.Event()
+
+        def _done(_):
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            stopped.set()
+        asyncio.run_coroutine_threadsafe(
+            self._server.stop(grace), self._loop).add_done_callback(_done)
+        return stopped
+
+
+class _AsyncPlugin(object):
+    """Serves a plugin with a grpc.aio server.
+
+    `worker_count` sizes the thread pool running the regular methods of the
+    plugin.  Worker processes (`process_workers`) aren't supported, the
+    coroutines have to run on the loop.
+    """
+
+    _process_pool_supported = False
+
+    def _create_server(self):
+        if self._config.get("ProcessWorkers", self.meta.process_workers):
+            raise ValueError("asyncio plugins don't support process_workers")
+        workers, max_rpcs, options = self._server_settings()
+        max_rpcs = self._reserve_control(max_rpcs)
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(
+            futures.ThreadPoolExecutor(max_workers=workers))
+        thread = threading.Thread(target=loop.run_forever,
+                                  name="snap-plugin-aio")
+        thread.daemon = True
+        thread.start()
+
+        async def _server():
+            server = aio.server(options=options,
+                                maximum_concurrent_rpcs=max_rpcs)
+            self._add_servicer(server)
+            return server
+        server = asyncio.run_coroutine_threadsafe(_server(), loop).result()
+        return _AioServer(loop, server)
+
+
+class _AsyncPluginProxy(PluginProxy):
+    """Serves the requests common to all asyncio plugins"""
+
+    async def Ping(self, request, context):
+        return PluginProxy.Ping(self, request, context)
+
+    async def Kill(self, request, context):
+        # stopping waits for the server (and this request) to finish
+        asyncio.get_event_loop().run_in_executor(None, self.plugin.stop_plugin)
+        return ErrReply()
+
+    async def GetConfigPolicy(self, request, context):
+        return await asyncio.get_event_loop().run_in_executor(
+            None, PluginProxy.GetConfigPolicy, self, request, context)
+
+
+class _AsyncCollectorProxy(_AsyncPluginProxy, _CollectorProxy):
+
+    async def CollectMetrics(self, request, context):
+        """Dispatches the request to the plugins collect coroutine"""
+        LOG.debug("CollectMetrics called")
+        cache = self.plugin.result_cache
+        if cache is None:
+            return await self._collect_metrics(request, context)
+        cached, misses = cache.lookup(request.metrics)
+        reply = None
+        if misses:
+            reply = await self._collect_metrics(_miss_request(misses),
+                                                context)
+        return cache.merge(request.metrics, cached, reply)
+
+    async def _collect_metrics(self, request, context):
+        try:
+            policy = self._config_policy()
+            if policy is not None:
+                policy.apply_metrics(request.metrics)
+            with self._reply_timestamp(), self._deadline(context) as deadline:
+                metrics = MetricList(request.metrics)
+                key = self.plugin._group_key
+                if len(self.plugin.router) > 0 or key is not None or \
+                        deadline.time_remaining is not None:
+                    metrics_collected = await _dispatch(
+                        self.plugin.router, metrics, self.plugin.collect, key,
+                        deadline)
+                else:
+                    metrics_collected = await self.plugin.collect(metrics)
+                return _metrics_reply(metrics_collected)
+        except Exception as err:
+            msg = "message: {}\n\nstack trace: {}".format(
+                err, traceback.format_exc())
+            return MetricsReply(metrics=[], error=msg)
+
+    async def GetMetricTypes(self, request, context):
+        """Runs the plugins update_catalog method on the thread pool"""
+        LOG.debug("GetMetricTypes called")
+        return await asyncio.get_event_loop().run_in_executor(
+            None, _metric_types, self.plugin, request.config)
+
+
+class _AsyncProcessorProxy(_AsyncPluginProxy, _ProcessorProxy):
+
+    async def Process(self, request, context):
+        """Dispatches the request to the plugins process coroutine"""
+        LOG.debug("Process called")
+        try:
+            self._apply_config_policy(request.Config)
+            with self._reply_timestamp(), self._deadline(context):
+                metrics = await self.plugin.process(
+                    MetricList(request.Metrics),
+                    ConfigMap(pb=request.Config)
+                )
+                return _metrics_reply(metrics)
+        except Exception as err:
+            msg = "message: {}\n\nstack trace: {}".format(
+                err, traceback.format_exc())
+            return MetricsReply(metrics=[], error=msg)
+
+
+class _AsyncPublisherProxy(_AsyncPluginProxy, PublisherProxy):
+
+    async def Publish(self, request, context):
+        """Dispatches the request to the plugins publish coroutine"""
+        LOG.debug("Publish called")
+        try:
+            self._apply_config_policy(request.Config)
+            await self.plugin.publish(
+                MetricList(request.Metrics),
+                ConfigMap(pb=request.Config)
+            )
+            return ErrReply()
+        except Exception as err:
+            msg = "message: {}\n\nstack trace: {}".format(
+                err, traceback.format_exc())
+            return ErrReply(error=msg)
+
+
+class _AsyncStreamCollectorProxy(_AsyncPluginProxy, _StreamCollectorProxy):
+
+    async def StreamMetrics(self, request_iterator, context):
+        """Streams the metrics returned by the plugins stream coroutine"""
+        LOG.debug("StreamMetrics called")
+        loop = asyncio.get_event_loop()
+        collect_args = await request_iterator.__anext__()
+        self._schedule(collect_args)
+        queue = asyncio.Queue()
+
+        async def _stream():
+            requested_metrics = MetricList(collect_args.Metrics_Arg.metrics)
+            while True:
+                # metrics are due once per max-collect-duration
+                with _request_deadline(Deadline(self.max_collect_duration)):
+                    returned_metrics = await self.plugin.stream(
+                        requested_metrics)
+                if not isinstance(returned_metrics,
+                                  (list, tuple, MetricList)):
+                    returned_metrics = [returned_metrics]
+                queue.put_nowait(returned_metrics)
+        stream = asyncio.ensure_future(_stream())
+
+        try:
+            metrics_to_stream = []
+            deadline = loop.time() + self.max_collect_duration
+            while True:
+                try:
+                    # wait for metrics until timeout is reached
+                    metrics = await asyncio.wait_for(
+                        queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    LOG.debug("Max collect duration exceeded. Streaming {} "
+                              "metrics".format(len(metrics_to_stream)))
+                    yield _collect_reply(metrics_to_stream)
+                    metrics_to_stream = []
+                    deadline = loop.time() + self.max_collect_duration
+                    continue
+                for metric in metrics:
+                    metrics_to_stream.append(metric)
+                    if len(metrics_to_stream) == self.max_metrics_buffer:
+                        yield _collect_reply(metrics_to_stream)
+                        metrics_to_stream = []
+                        deadline = loop.time() + self.max_collect_duration
+                if self.max_metrics_buffer == 0:
+                    yield _collect_reply(metrics_to_stream)
+                    metrics_to_stream = []
+                    deadline = loop.time() + self.max_collect_duration
+        finally:
+            # the stream ends when Snap cancels it
+            stream.cancel()
+
+
+def _limited_async(slots, method):
+    """Returns the coroutine `method` rejecting the requests once `slots`
+    are taken, see :py:func:`snap_plugin.v1.servicers._limited`"""
+    if inspect.isasyncgenfunction(method):
+        async def _stream(request_iterator, context):
+            if not slots.acquire():
+                await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                                    _EXHAUSTED)
+            try:
+                async for reply in method(request_iterator, context):
+                    yield reply
+            finally:
+                slots.release()
+        return _stream
+
+    async def _method(request, context):
+        if not slots.acquire():
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                                _EXHAUSTED)
+        try:
+            return await method(request, context)
+        finally:
+            slots.release()
+    return _method
+
+
+def _collect_reply(metrics):
+    return CollectReply(
+        Metrics_Reply=MetricsReply(metrics=[m.pb for m in metrics]))
+
+
+async def _dispatch(router, metrics, default, key=None, deadline=None):
+    """Calls the handler coroutine of every group of metrics concurrently,
+    cancelling those still running at the deadline"""
+    groups, unmatched = router.route(metrics)
+    if len(unmatched) > 0:
+        groups.append((default, unmatched))
+    if key is not None:
+        groups = [(handler, subgroup) for handler, group in groups
+                  for _, subgroup in group.group_by(key)]
+    timeout = None if deadline is None else deadline.time_remaining
+    if timeout is None or not groups:
+        results = await asyncio.gather(*[handler(group)
+                                         for handler, group in groups])
+        collected = []
+        for metrics_collected in results:
+            _extend(collected, metrics_collected)
+        return collected
+    tasks = [asyncio.ensure_future(handler(group))
+             for handler, group in groups]
+    done, _ = await asyncio.wait(tasks, timeout=timeout)
+    collected = []
+    late = []
+    for task, (_, group) in zip(tasks, groups):
+        if task in done:
+            _extend(collected, task.result())
+        else:
+            task.cancel()
+            late.append(group)
+    if late:
+        _missed_deadline(late, len(groups))
+    return collected
+
+
+class AsyncCollector(_AsyncPlugin, Collector):
+    """Abstract base class for asyncio 'collector' plugins.
+
+    Like :py:class:`snap_plugin.v1.collector.Collector` except that
+    :py:meth:`collect`, and the handlers given to
+    :py:meth:`~snap_plugin.v1.collector.Collector.add_handler`, are
+    coroutines.  The handlers of a request, and the groups of
+    :py:meth:`~snap_plugin.v1.collector.Collector.group_by` (whatever
+    `max_workers`), run concurrently on the event loop.
+
+    Example:
+    ::
+        class Ping(snap.AsyncCollector):
+            async def collect(self, metrics):
+                await asyncio.gather(*[self.probe(m) for m in metrics])
+                return metrics
+    """
+
+    def __init__(self, name, version, **kwargs):
+        super(AsyncCollector, self).__init__(name, version, **kwargs)
+        self.proxy = _AsyncCollectorProxy(self)
+
+    def _add_servicer(self, server):
+        add_CollectorServicer_to_server(self.proxy, server,
+                                        slots=self._slots)
+
+    def _collect_now(self, metrics):
+        loop = asyncio.new_event_loop()
+        try:
+            return _collected(loop.run_until_complete(_dispatch(
+                self.router, MetricList(metrics), self.collect,
+                self._group_key)))
+        finally:
+            loop.close()
+
+    @abstractmethod
+    async def collect(self, metrics):
+        """Collects metrics, see
+        :py:meth:`snap_plugin.v1.collector.Collector.collect`"""
+        pass
+
+
+class AsyncProcessor(_AsyncPlugin, Processor):
+    """Abstract base class for asyncio 'processor' plugins.
+
+    Like :py:class:`snap_plugin.v1.processor.Processor` except that
+    :py:meth:`process` is a coroutine.
+    """
+
+    def __init__(self, name, version, **kwargs):
+        super(AsyncProcessor, self).__init__(name, version, **kwargs)
+        self.proxy = _AsyncProcessorProxy(self)
+
+    def _add_servicer(self, server):
+        add_ProcessorServicer_to_server(self.proxy, server,
+                                        slots=self._slots)
+
+    @abstractmethod
+    async def process(self, metrics, config):
+        """Processes metrics, see
+        :py:meth:`snap_plugin.v1.processor.Processor.process`"""
+        pass
+
+
+class AsyncPublisher(_AsyncPlugin, Publisher):
+    """Abstract base class for asyncio 'publisher' plugins.
+
+    Like :py:class:`snap_plugin.v1.publisher.Publisher` except that
+    :py:meth:`publish` is a coroutine.
+    """
+
+    def __init__(self, name, version, **kwargs):
+        super(AsyncPublisher, self).__init__(name, version, **kwargs)
+        self.proxy = _AsyncPublisherProxy(self)
+
+    def _add_servicer(self, server):
+        add_PublisherServicer_to_server(self.proxy, server,
+                                        slots=self._slots)
+
+    @abstractmethod
+    async def publish(self, metrics, config):
+        """Publishes metrics, see
+        :py:meth:`snap_plugin.v1.publisher.Publisher.publish`"""
+        pass
+
+
+class AsyncStreamCollector(_AsyncPlugin, StreamCollector):
+    """Abstract base class for asyncio 'stream collector' plugins.
+
+    Like :py:class:`snap_plugin.v1.stream_collector.StreamCollector` except
+    that :py:meth:`stream` is a coroutine, awaited again as soon as it
+    returns for as long as Snap keeps the stream open.
+    """
+
+    def __init__(self, name, version, **kwargs):
+        super(AsyncStreamCollector, self).__init__(name, version, **kwargs)
+        self.proxy = _AsyncStreamCollectorProxy(self)
+
+    def _add_servicer(self, server):
+        add_StreamCollectorServicer_to_server(self.proxy, server,
+                                              slots=self._slots)
+
+    @abstractmethod
+    async def stream(self, metrics):
+        """Returns the next metrics to stream, see
+        :py:meth:`snap_plugin.v1.stream_collector.StreamCollector.stream`"""
+        pass
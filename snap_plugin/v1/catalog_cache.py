@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import logging
+import os
+import tempfile
+import threading
+import traceback
+from timeit import default_timer as _now
+
+from .config_map import ConfigMap, FrozenConfigMap
+from .lru import _LRU, _LRUCache
+from .plugin_pb2 import ConfigMap as PbConfigMap
+from .plugin_pb2 import MetricsReply
+
+LOG = logging.getLogger(__name__)
+
+_replace = getattr(os, "replace", os.rename)
+
+
+class CatalogCache(_LRUCache):
+    """CatalogCache keeps the metric catalogs of a collector.
+
+    The serialized reply to a GetMetricTypes request is kept per request
+    config for `ttl` seconds, so :py:meth:`update_catalog` isn't called again
+    until it expires.  With a `path` the catalogs are also written to disk: a
+    restarted plugin answers with the catalog it found there right away and
+    calls :py:meth:`update_catalog` in the background to refresh it.  If that
+    fails, the catalog from disk is used for `ttl` seconds at most.  Expired
+    catalogs are dropped by the plugin's expiry thread.
+
+    Collectors get a cache when :py:attr:`Meta.catalog_cache_ttl` is set.
+
+    Args:
+        ttl (:obj:`float`): seconds a catalog is reused for
+        max_size (:obj:`int`): the number of catalogs (configs) kept in memory
+            and on disk, the files written least recently are removed first
+        path (:obj:`str`): directory the catalogs are persisted to
+    """
+
+    def __init__(self, ttl, max_size=16, path=None):
+        # fingerprint -> serialized reply, aging from when it was built.  A
+        # catalog read from disk is pinned until its refresh is over.
+        self._lru = _LRU(max_size, ttl)
+        self.path = path
+        self._refreshing = set()
+        # catalogs whose refresh failed: rebuilt rather than read from disk
+        # again once they expire
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def get(self, config, build):
+        """Returns the serialized catalog of `config`.
+
+        Args:
+            config (:py:class:`snap_plugin.v1.plugin_pb2.ConfigMap`): the
+                request config
+            build (callable): called with `config` when the catalog isn't
+                cached, returns the reply and whether it may be cached (error
+                replies aren't)
+
+        Returns:
+            the reply, :obj:`bytes` when cached
+        """
+        key = FrozenConfigMap.from_pb(config).fingerprint
+        with self._lock:
+            reply = self._lru.get(key, _now())
+            if reply is not None:
+                if self._lru.pinned(key):
+                    self._refresh(key, config, build)
+                return reply
+            stale = key in self._failed
+        if self.path is not None and not stale:
+            reply = self._load(key)
+            if reply is not None:
+                with self._lock:
+                    self._lru.put(key, reply, _now(), pinned=True)
+                    self._refresh(key, config, build)
+                return reply
+        reply, cacheable = build(config)
+        if cacheable:
+            reply = reply.SerializeToString()
+            with self._lock:
+                self._lru.put(key, reply, _now())
+                self._failed.discard(key)
+            self._save(key, reply)
+        return reply
+
+    def expire(self):
+        """Drops the catalogs older than the ttl.
+
+        Returns:
+            :obj:`int`: the number of catalogs dropped
+        """
+        with self._lock:
+            return len(self._lru.expire(_now()))
+
+    def clear(self):
+        """Drops the catalogs kept in memory"""
+        with self._lock:
+            self._lru.clear()
+
+    def _refresh(self, key, config, build):
+        """Starts rebuilding a catalog read from disk unless it's under way"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        copy = PbConfigMap()
+        copy.CopyFrom(config)
+        thread = threading.Thread(target=self._rebuild,
+                                  args=(key, copy, build))
+        thread.daemon = True
+        thread.start()
+
+    def _rebuild(self, key, config, build):
+        try:
+            reply, cacheable = build(config)
+            if cacheable:
+                reply = reply.SerializeToString()
+                with self._lock:
+                    self._lru.put(key, reply, _now())
+                    self._failed.discard(key)
+                self._save(key, reply)
+            else:
+                LOG.warning("refreshing the metric catalog failed: %s",
+                            reply.error)
+                with self._lock:
+                    # the catalog read from disk is served until it expires,
+                    # then it's built by the request rather than read again
+                    self._lru.unpin(key)
+                    self._failed.add(key)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".catalog")
+
+    def _load(self, key):
+        try:
+            with open(self._file(key), "rb") as f:
+                reply = f.read()
+            # don't answer with a corrupted file
+            MetricsReply.FromString(reply)
+            return reply
+        except (IOError, OSError):
+            return None
+        except Exception:
+            LOG.warning("ignoring the unreadable catalog %s", self._file(key))
+            return None
+
+    def _save(self, key, reply):
+        tmp = None
+        try:
+            try:
+                os.makedirs(self.path)
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(reply)
+            _replace(tmp, self._file(key))
+            tmp = None
+            self._prune()
+        except (IOError, OSError):
+            LOG.exception("failed to persist the metric catalog")
+        finally:
+            if tmp is not None:
+                _unlink(tmp)
+
+    def _prune(self):
+        """Removes the files of the catalogs written least recently beyond
+        `max_size`, the configs no longer requested"""
+        files = [os.path.join(self.path, name)
+                 for name in os.listdir(self.path)
+                 if name.endswith(".catalog")]
+        if len(files) <= self.max_size:
+            return
+        written = []
+        for name in files:
+            try:
+                written.append((os.path.getmtime(name), name))
+            except OSError:
+                # removed meanwhile
+                pass
+        written.sort()
+        for _, name in written[:len(written) - self.max_size]:
+            _unlink(name)
+
+
+def _unlink(name):
+    try:
+        os.remove(name)
+    except OSError:
+        pass
+
+
+def _catalog_cache(meta):
+    """Returns the catalog cache configured by `meta`, or None"""
+    if meta.catalog_cache_ttl is None:
+        return None
+    return CatalogCache(meta.catalog_cache_ttl, meta.catalog_cache_size,
+                        meta.catalog_cache_path)
+
+
+def _metric_types(plugin, config):
+    """Returns the reply to a GetMetricTypes request"""
+    cache = plugin.catalog_cache
+    if cache is None:
+        return _build_catalog(plugin, config)[0]
+    return cache.get(config, lambda cfg: _build_catalog(plugin, cfg))
+
+
+def _build_catalog(plugin, config):
+    try:
+        metrics = plugin.update_catalog(ConfigMap(pb=config))
+        return MetricsReply(metrics=[m.pb for m in metrics]), True
+    except Exception as err:
+        msg = "message: {}\n\nstack trace: {}".format(
+            err, traceback.format_exc())
+        return MetricsReply(metrics=[], error=msg), False
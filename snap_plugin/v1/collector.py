@@ -21,9 +21,15 @@ from abc import ABCMeta, abstractmethod
 
 import six
 
+from .catalog_cache import _catalog_cache
 from .collector_proxy import _CollectorProxy
+from .encoder import _metrics_reply
+from .metric_list import MetricList
+from .namespace_router import NamespaceRouter, _GroupExecutor
+from .plugin_pb2 import MetricsReply
 from .plugin import Meta, Plugin, PluginType
-from .plugin_pb2 import add_CollectorServicer_to_server
+from .result_cache import _result_cache
+from .servicers import add_CollectorServicer_to_server
 
 LOG = logging.getLogger(__name__)
 
@@ -42,11 +48,111 @@ class Collector(Plugin):
         - :py:meth:`~snap_plugin.v1.plugin.Plugin.get_config_policy`
     """
 
+    _process_pool_supported = True
+
     def __init__(self, name, version, **kwargs):
         super(Collector, self).__init__()
         self.meta = Meta(PluginType.collector, name, version, **kwargs)
+        self.router = NamespaceRouter()
+        self._group_key = None
+        self._group_executor = None
+        self.catalog_cache = _catalog_cache(self.meta)
+        self.result_cache = _result_cache(self.meta)
         self.proxy = _CollectorProxy(self)
-        add_CollectorServicer_to_server(self.proxy, self.server)
+
+    def _add_servicer(self, server):
+        add_CollectorServicer_to_server(self.proxy, server, self._control,
+                                        self._slots)
+
+    def add_handler(self, pattern, handler):
+        """Registers a handler collecting the metrics matching `pattern`.
+
+        When handlers are registered the requested metrics are grouped by
+        the pattern their namespace matches and each handler is called once
+        with its group.  Only the metrics matching no pattern are passed to
+        :py:meth:`collect`.  The results are returned to Snap in the order
+        the groups were first requested.
+
+        Args:
+            pattern (:obj:`tuple` of `strings` or :obj:`str`): namespace
+                element values where "*" matches any value, or a namespace
+                key such as "/intel/cpu/*/utilization"
+            handler (callable): takes a list of
+                :obj:`snap_plugin.v1.Metric` and returns the collected
+                metrics, like :py:meth:`collect`
+
+        Example:
+        ::
+            self.add_handler(("acme", "sk8", "*", "rotations"),
+                             self.collect_rotations)
+        """
+        self.router.add(pattern, handler)
+
+    def group_by(self, key, max_workers=4):
+        """Collects the requested metrics concurrently, group by group.
+
+        A request often covers metrics of independent sources (disks,
+        network interfaces, remote endpoints) which :py:meth:`collect` would
+        read one after the other.  Once a group key is set the metrics are
+        split by their key value and :py:meth:`collect` (or the handler
+        registered with :py:meth:`add_handler`) is called once per group, on
+        up to `max_workers` threads at a time.  The collected metrics are
+        returned in the order the groups were first requested, so a request
+        takes about as long as its slowest group.
+
+        Groups still being collected at the request deadline are left out of
+        the reply.  Their threads can't be stopped: the pool is replaced so
+        that later requests get threads of their own, but a source which
+        hangs for good keeps a thread per request.  Collecting functions
+        should bound their I/O with
+        :py:attr:`snap_plugin.v1.Deadline.current().time_remaining
+        <snap_plugin.v1.deadline.Deadline.time_remaining>`.
+
+        Args:
+            key: the group of a metric.  An :obj:`int` groups the metrics by
+                that many leading namespace elements, a :obj:`str` by the
+                value of that config key and a callable is called with the
+                :obj:`snap_plugin.v1.Metric` and returns its (hashable) group.
+                None collects all metrics at once again.
+            max_workers (:obj:`int`): the number of groups collected at once
+
+        Example:
+        ::
+            # one group per disk: /acme/disk/<name>/...
+            self.group_by(3, max_workers=8)
+        """
+        if self._group_executor is not None:
+            self._group_executor.shutdown(wait=False)
+            self._group_executor = None
+        self._group_key = _group_key(key)
+        if key is not None:
+            self._group_executor = _GroupExecutor(max_workers)
+
+    def _collect_now(self, metrics):
+        """Collects metrics outside of a request (diagnostics) the way
+        requests are collected, handlers and groups included"""
+        metrics = MetricList(metrics)
+        if len(self.router) > 0 or self._group_key is not None:
+            collected = self.router.dispatch(metrics, self.collect,
+                                             self._group_key,
+                                             self._group_executor)
+        else:
+            collected = self.collect(metrics)
+        return _collected(collected)
+
+    def _expire(self):
+        super(Collector, self)._expire()
+        if self.result_cache is not None:
+            self.result_cache.expire()
+        if self.catalog_cache is not None:
+            self.catalog_cache.expire()
+
+    def stop_plugin(self):
+        super(Collector, self).stop_plugin()
+        if self._group_executor is not None:
+            self._group_executor.shutdown(wait=False)
+        if self.result_cache is not None:
+            self.result_cache.clear()
 
     @abstractmethod
     def collect(self, metrics):
@@ -64,7 +170,10 @@ class Collector(Plugin):
 
         Returns:
             :obj:`list` of :obj:`snap_plugin.v1.Metric`:
-                List of collected metrics.
+                List of collected metrics.  The list may also hold
+                :obj:`snap_plugin.v1.MetricBatch` and
+                :obj:`snap_plugin.v1.MetricRow` items, which are encoded
+                straight into the serialized reply.
         """
         pass
 
@@ -91,3 +200,28 @@ class Collector(Plugin):
                 List of collectable metrics.
         """
         pass
+
+
+def _group_key(key):
+    """Returns the callable giving the group of a metric, see
+    :py:meth:`Collector.group_by`"""
+    if key is None or callable(key):
+        return key
+    if isinstance(key, bool):
+        raise TypeError("Unsupported group key {!r}".format(key))
+    if isinstance(key, six.integer_types):
+        return lambda metric: tuple(nse.Value
+                                    for nse in metric.pb.Namespace[:key])
+    if isinstance(key, six.string_types):
+        return lambda metric: metric.config.get(key)
+    raise TypeError("Unsupported group key {!r}".format(key))
+
+
+def _collected(metrics):
+    """Returns the metrics returned by a plugin as a
+    :py:class:`~snap_plugin.v1.metric_list.MetricList`, rows and batches
+    included"""
+    reply = _metrics_reply(metrics)
+    if isinstance(reply, bytes):
+        reply = MetricsReply.FromString(reply)
+    return MetricList(reply.metrics)
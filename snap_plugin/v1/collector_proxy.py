@@ -18,11 +18,12 @@
 import logging
 import traceback
 
-from .metric import Metric
-
+from .catalog_cache import _metric_types
+from .encoder import _metrics_reply
+from .metric_list import MetricList
 from .plugin_pb2 import MetricsReply
 from .plugin_proxy import PluginProxy
-from .config_map import ConfigMap
+from .result_cache import _miss_request
 
 LOG = logging.getLogger(__name__)
 
@@ -36,12 +37,33 @@ class _CollectorProxy(PluginProxy):
     def CollectMetrics(self, request, context):
         """Dispatches the request to the plugins collect method"""
         LOG.debug("CollectMetrics called")
+        cache = self.plugin.result_cache
+        if cache is None:
+            return self._collect_metrics(request, context)
+        cached, misses = cache.lookup(request.metrics)
+        reply = None
+        if misses:
+            reply = self._collect_metrics(_miss_request(misses), context)
+        return cache.merge(request.metrics, cached, reply)
+
+    def _collect_metrics(self, request, context):
+        pool = self.plugin._process_pool
+        if pool is not None:
+            return pool.call("_collect_metrics", request, context)
         try:
-            metrics_to_collect = []
-            for metric in request.metrics:
-                metrics_to_collect.append(Metric(pb=metric))
-            metrics_collected = self.plugin.collect(metrics_to_collect)
-            return MetricsReply(metrics=[m.pb for m in metrics_collected])
+            policy = self._config_policy()
+            if policy is not None:
+                policy.apply_metrics(request.metrics)
+            with self._reply_timestamp(), self._deadline(context) as deadline:
+                metrics = MetricList(request.metrics)
+                key = self.plugin._group_key
+                if len(self.plugin.router) > 0 or key is not None:
+                    metrics_collected = self.plugin.router.dispatch(
+                        metrics, self.plugin.collect, key,
+                        self.plugin._group_executor, deadline)
+                else:
+                    metrics_collected = self.plugin.collect(metrics)
+                return _metrics_reply(metrics_collected)
         except Exception as err:
             msg = "message: {}\n\nstack trace: {}".format(
                 err, traceback.format_exc())
@@ -50,10 +72,4 @@ class _CollectorProxy(PluginProxy):
     def GetMetricTypes(self, request, context):
         """Dispatches the request to the plugins update_catalog method"""
         LOG.debug("GetMetricTypes called")
-        try:
-            metrics = self.plugin.update_catalog(ConfigMap(pb=request.config))
-            return MetricsReply(metrics=[m.pb for m in metrics])
-        except Exception as err:
-            msg = "message: {}\n\nstack trace: {}".format(
-                err, traceback.format_exc())
-            return MetricsReply(metrics=[], error=msg)
+        return _metric_types(self.plugin, request.config)
@@ -17,8 +17,16 @@
 # limitations under the License.
 
 from builtins import int
-from collections import MutableMapping
+try:
+    from collections.abc import (ItemsView, KeysView, Mapping, MutableMapping,
+                                 ValuesView)
+except ImportError:
+    from collections import (ItemsView, KeysView, Mapping, MutableMapping,
+                             ValuesView)
+import hashlib
 from itertools import chain
+import threading
+import weakref
 from past.builtins import basestring
 
 from .plugin_pb2 import ConfigMap as PbConfigMap
@@ -37,11 +45,20 @@ class ConfigMap(MutableMapping):
         cfg0 = snap.ConfigMap(user="john", port=911)
         cfg1 = snap.ConfigMap(("user","john"),("port", 911))
 
+    Note:
+        The map keeps an index of the protobuf map holding each key, built on
+        the first lookup, so reading a value costs a single dict lookup.
+        Changes made to the wrapped protobuf directly (rather than through
+        the ConfigMap) after that aren't seen by the ConfigMap.
+
     Also see:
         - :py:class:`snap_plugin.v1.metric.Metric`
     """
 
+    __slots__ = ("_pb", "_index")
+
     def __init__(self, *args, **kwargs):
+        self._index = None
         if "pb" in kwargs:
             self._pb = kwargs.get("pb")
         else:
@@ -53,33 +70,84 @@ class ConfigMap(MutableMapping):
                 if isinstance(arg, (tuple, list)) and len(arg) == 2:
                     self[arg[0]] = arg[1]
 
-
-    def __getattr__(self, attr):
-        if attr in self.__dict__:
-            # this object has it
-            return getattr(self, attr)
-        # proxy to the wrapped object
-        return getattr(self._pb, attr)
+    def _maps(self):
+        """Returns the protobuf maps, the first one holding a key wins"""
+        return (self._pb.IntMap, self._pb.FloatMap, self._pb.StringMap,
+                self._pb.BoolMap)
+
+    def _lookup(self):
+        """Returns the index mapping each key to the protobuf map holding it"""
+        if self._index is None:
+            index = {}
+            for map in reversed(self._maps()):
+                for key in map:
+                    index[key] = map
+            self._index = index
+        return self._index
 
     def __setitem__(self, key, item):
         if isinstance(item, float):
-            self._pb.FloatMap[key] = item
+            map = self._pb.FloatMap
         elif isinstance(item, bool):
-            self._pb.BoolMap[key] = item
+            map = self._pb.BoolMap
         elif isinstance(item, int):
-            self._pb.IntMap[key] = item
+            map = self._pb.IntMap
         elif isinstance(item, basestring):
-            self._pb.StringMap[key] = item
+            map = self._pb.StringMap
         else:
             raise TypeError("The type is '{}' and should be string, int, long, float "
                             "or bool".format(type(item)))
+        index = self._lookup()
+        current = index.get(key)
+        if current is not None and current is not map:
+            # the value changed type
+            del current[key]
+        map[key] = item
+        index[key] = map
 
     def __getitem__(self, key):
-        for dict in [self._pb.IntMap, self._pb.FloatMap, self._pb.StringMap,
-                     self._pb.BoolMap]:
-            if key in dict:
-                return dict[key]
-        raise KeyError(key)
+        return self._lookup()[key][key]
+
+    def _get(self, key, default, map, type_name):
+        current = self._lookup().get(key)
+        if current is None:
+            return default
+        if current is not map:
+            raise TypeError("The value of '{}' is not {}".format(key,
+                                                                 type_name))
+        return map[key]
+
+    def get_int(self, key, default=None):
+        """Returns the int value of `key`, or `default` if it isn't set.
+
+        Raises:
+            TypeError: the value isn't an int
+        """
+        return self._get(key, default, self._pb.IntMap, "an int")
+
+    def get_float(self, key, default=None):
+        """Returns the float value of `key`, or `default` if it isn't set.
+
+        Raises:
+            TypeError: the value isn't a float
+        """
+        return self._get(key, default, self._pb.FloatMap, "a float")
+
+    def get_str(self, key, default=None):
+        """Returns the string value of `key`, or `default` if it isn't set.
+
+        Raises:
+            TypeError: the value isn't a string
+        """
+        return self._get(key, default, self._pb.StringMap, "a string")
+
+    def get_bool(self, key, default=None):
+        """Returns the bool value of `key`, or `default` if it isn't set.
+
+        Raises:
+            TypeError: the value isn't a bool
+        """
+        return self._get(key, default, self._pb.BoolMap, "a bool")
 
     def __repr__(self):
         return repr(dict(chain(self._pb.StringMap.items(),
@@ -88,40 +156,16 @@ class ConfigMap(MutableMapping):
                                self._pb.BoolMap.items())))
 
     def __len__(self):
-        return (len(self._pb.IntMap) + len(self._pb.StringMap) +
-                len(self._pb.FloatMap) + len(self._pb.BoolMap))
+        return len(self._lookup())
 
     def __delitem__(self, key):
-        if key in self:
-            for dict in [self._pb.IntMap, self._pb.FloatMap,
-                         self._pb.StringMap, self._pb.BoolMap]:
-                try:
-                    del dict[key]
-                    return
-                except KeyError:
-                    pass
-        else:
-            raise KeyError(key)
+        del self._lookup().pop(key)[key]
 
     def __iter__(self):
-        for k in self._pb.IntMap:
-            yield k
-        for k in self._pb.FloatMap:
-            yield k
-        for k in self._pb.StringMap:
-            yield k
-        for k in self._pb.BoolMap:
-            yield k
+        return iter(self._lookup())
 
     def __contains__(self, key):
-        for dict in [self._pb.IntMap, self._pb.FloatMap, self._pb.StringMap,
-                     self._pb.BoolMap]:
-            try:
-                if key in dict.keys():
-                    return True
-            except KeyError:
-                pass
-        return False
+        return key in self._lookup()
 
     def __unicode__(self):
         return unicode(repr(self))
@@ -132,6 +176,7 @@ class ConfigMap(MutableMapping):
         self._pb.StringMap.clear()
         self._pb.FloatMap.clear()
         self._pb.BoolMap.clear()
+        self._index = {}
 
     def has_key(self, key):
         """Does the config map contain the key?
@@ -157,14 +202,12 @@ class ConfigMap(MutableMapping):
             self[k] = v
 
     def keys(self):
-        "Returns a list of ConfigMap keys."
-        return (list(self._pb.IntMap.keys()) + list(self._pb.StringMap.keys()) +
-                list(self._pb.FloatMap.keys()) + list(self._pb.BoolMap.keys()))
+        "Returns a view of the ConfigMap keys."
+        return KeysView(self)
 
     def values(self):
-        "Returns a list of ConfigMap values."
-        return (list(self._pb.IntMap.values()) + list(self._pb.StringMap.values()) +
-                list(self._pb.FloatMap.values()) + list(self._pb.BoolMap.values()))
+        "Returns a view of the ConfigMap values."
+        return ValuesView(self)
 
     def iteritems(self):
         "Returns an iterator over the items of ConfigMap."
@@ -188,9 +231,8 @@ class ConfigMap(MutableMapping):
                      self._pb.BoolMap.keys())
 
     def items(self):
-        "Returns a list of (key, value) pairs as 2-tuples."
-        return (list(self._pb.IntMap.items()) + list(self._pb.StringMap.items()) +
-                list(self._pb.FloatMap.items()) + list(self._pb.BoolMap.items()))
+        "Returns a view of the (key, value) pairs as 2-tuples."
+        return ItemsView(self)
 
     def pop(self, key, default=None):
         """Remove specified key and return the corresponding value.
@@ -201,10 +243,7 @@ class ConfigMap(MutableMapping):
             if default is not None:
                 return default
             raise KeyError(key)
-        for map in [self._pb.IntMap, self._pb.FloatMap, self._pb.StringMap,
-                    self._pb.BoolMap]:
-            if key in map.keys():
-                return map.pop(key)
+        return self._lookup().pop(key).pop(key)
 
     def popitem(self):
         """Remove and return some (key, value) pair as a 2-tuple"""        
@@ -216,6 +255,163 @@ class ConfigMap(MutableMapping):
         del self[key]
         return key, value
 
+    def freeze(self):
+        """Returns an immutable snapshot of the config.
+
+        Returns:
+            :py:class:`FrozenConfigMap`
+        """
+        return FrozenConfigMap.from_pb(self._pb)
+
     @property
     def pb(self):
         return self._pb
+
+
+def _config_key(pb):
+    """Returns a hashable key of a protobuf config.
+
+    The maps are kept apart so that, for instance, 1 and True don't collide.
+    """
+    return (tuple(sorted(pb.IntMap.items())),
+            tuple(sorted(pb.FloatMap.items())),
+            tuple(sorted(pb.StringMap.items())),
+            tuple(sorted(pb.BoolMap.items())))
+
+
+class FrozenConfigMap(Mapping):
+    """FrozenConfigMap is an immutable, interned snapshot of a config.
+
+    Freezing a config equal to the one of a live FrozenConfigMap returns the
+    existing object, so the metrics of a task, which all carry the same
+    config, share one snapshot.  Snapshots can be used as dict keys, which
+    lets a plugin keep state (connections, parsed settings...) per config
+    rather than rebuild it for every metric.
+
+    Args:
+        *args: as for :py:class:`ConfigMap`
+        **kwargs: as for :py:class:`ConfigMap`
+
+    Example:
+    ::
+        def collect(self, metrics):
+            for config, group in metrics.by_config():
+                client = self.clients.get(config)
+                if client is None:
+                    client = self.clients[config] = connect(config["host"])
+                ...
+
+    Also see:
+        - :py:meth:`ConfigMap.freeze`
+        - :py:meth:`snap_plugin.v1.metric_list.MetricList.by_config`
+    """
+
+    __slots__ = ("_maps", "_values", "_fingerprint", "__weakref__")
+
+    _interned = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        return cls.from_pb(ConfigMap(*args, **kwargs).pb)
+
+    @classmethod
+    def from_pb(cls, pb):
+        """Returns the snapshot of a protobuf config.
+
+        Args:
+            pb (:py:class:`snap_plugin.v1.plugin_pb2.ConfigMap`): the config
+
+        Returns:
+            :py:class:`FrozenConfigMap`
+        """
+        key = _config_key(pb)
+        with cls._lock:
+            frozen = cls._interned.get(key)
+            if frozen is None:
+                frozen = super(FrozenConfigMap, cls).__new__(cls)
+                frozen._maps = tuple(dict(items) for items in key)
+                values = {}
+                for map in reversed(frozen._maps):
+                    values.update(map)
+                frozen._values = values
+                frozen._fingerprint = None
+                cls._interned[key] = frozen
+        return frozen
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenConfigMap):
+            return self is other
+        return Mapping.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "FrozenConfigMap({!r})".format(self._values)
+
+    def _get(self, key, default, index, type_name):
+        if key not in self._values:
+            return default
+        map = self._maps[index]
+        if key not in map:
+            raise TypeError("The value of '{}' is not {}".format(key,
+                                                                 type_name))
+        return map[key]
+
+    def get_int(self, key, default=None):
+        """See :py:meth:`ConfigMap.get_int`"""
+        return self._get(key, default, 0, "an int")
+
+    def get_float(self, key, default=None):
+        """See :py:meth:`ConfigMap.get_float`"""
+        return self._get(key, default, 1, "a float")
+
+    def get_str(self, key, default=None):
+        """See :py:meth:`ConfigMap.get_str`"""
+        return self._get(key, default, 2, "a string")
+
+    def get_bool(self, key, default=None):
+        """See :py:meth:`ConfigMap.get_bool`"""
+        return self._get(key, default, 3, "a bool")
+
+    @property
+    def fingerprint(self):
+        """A digest of the config which is stable across processes.
+
+        Unlike the hash of the snapshot, the fingerprint can be persisted or
+        shared with other processes.
+
+        Returns:
+            :obj:`str`: the SHA-1 of the deterministic serialization of the
+                config
+        """
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.sha1(
+                self.pb.SerializeToString(deterministic=True)).hexdigest()
+        return self._fingerprint
+
+    @property
+    def pb(self):
+        """A new protobuf holding the config.
+
+        Returns:
+            :py:class:`snap_plugin.v1.plugin_pb2.ConfigMap`
+        """
+        int_map, float_map, string_map, bool_map = self._maps
+        return PbConfigMap(IntMap=int_map, FloatMap=float_map,
+                           StringMap=string_map, BoolMap=bool_map)
@@ -19,6 +19,7 @@
 from past.builtins import basestring
 
 from .bool_policy import BoolRule, _BoolPolicy
+from .config_map import _config_key
 from .float_policy import FloatRule, _FloatPolicy
 from .integer_policy import IntegerRule, _IntegerPolicy
 from .plugin_pb2 import GetConfigPolicyReply
@@ -144,6 +145,143 @@ class ConfigPolicy(object):
         key_types = ["integer", "float", "string", "bool"]
         return zip(key_types, policies)
 
+    def compile(self):
+        """Returns the policy indexed by namespace.
+
+        Returns:
+            :py:class:`CompiledConfigPolicy`
+        """
+        return CompiledConfigPolicy(self)
+
+
+# the ConfigMap protobuf map each policy type applies to, in the order of
+# ConfigPolicy.policies
+_MAPS = ("IntMap", "FloatMap", "StringMap", "BoolMap")
+_TYPE_NAMES = ("an int", "a float", "a string", "a bool")
+
+
+class CompiledConfigPolicy(object):
+    """CompiledConfigPolicy applies a config policy to configs.
+
+    The rules are kept in a trie indexed by the elements of their namespace,
+    and every node holds the rules of its namespace merged with those of its
+    parents (the longest namespace wins).  Applying the policy to a metric
+    config therefore walks the metric namespace once rather than matching
+    every rule against it.  As the metrics of a task share the same config,
+    the outcome is also remembered per namespace and config.
+
+    Args:
+        policy (:py:class:`ConfigPolicy`): the policy
+
+    Also see:
+        - :py:meth:`ConfigPolicy.compile`
+    """
+
+    # bounds the outcomes remembered by each node
+    _MAX_OUTCOMES = 256
+
+    def __init__(self, policy):
+        # a node is [children by element value, rules by key, outcomes]
+        self._root = [{}, {}, {}]
+        rules = []
+        for index, (_, policies) in enumerate(policy.policies):
+            for ns_policy in policies.values():
+                for key, rule in ns_policy.rules.items():
+                    rules.append((tuple(ns_policy.key), key, index, rule))
+        # shorter namespaces come first so that the nodes created for longer
+        # ones copy the rules of their parents
+        for ns, key, index, rule in sorted(rules, key=lambda r: len(r[0])):
+            node = self._root
+            for value in ns:
+                child = node[0].get(value)
+                if child is None:
+                    child = node[0][value] = [{}, dict(node[1]), {}]
+                node = child
+            node[1][key] = _compile_rule(index, rule)
+
+    def apply(self, config, namespace=()):
+        """Fills in the defaults of a config and checks it.
+
+        Args:
+            config (:py:class:`snap_plugin.v1.plugin_pb2.ConfigMap`): the
+                protobuf config, updated in place
+            namespace (:obj:`list` of `strings`): the element values of the
+                metric namespace the config belongs to
+
+        Returns:
+            :obj:`list` of `strings`: the problems found, missing required
+                keys and values out of bounds
+        """
+        node = self._root
+        for value in namespace:
+            child = node[0].get(value)
+            if child is None:
+                break
+            node = child
+        if not node[1]:
+            return []
+        key = _config_key(config)
+        outcome = node[2].get(key)
+        if outcome is None:
+            outcome = _evaluate(node[1], config)
+            if len(node[2]) >= self._MAX_OUTCOMES:
+                node[2].clear()
+            node[2][key] = outcome
+        defaults, problems = outcome
+        for index, name, value in defaults:
+            getattr(config, _MAPS[index])[name] = value
+        return problems
+
+    def apply_metrics(self, metrics):
+        """Applies the policy to the config of every metric.
+
+        Args:
+            metrics (iterable): protobuf metrics
+
+        Raises:
+            ValueError: a config doesn't comply with the policy
+        """
+        for pb in metrics:
+            problems = self.apply(pb.Config, [nse.Value for nse in
+                                              pb.Namespace])
+            if problems:
+                raise ValueError("Invalid config for {}: {}".format(
+                    "/".join(nse.Value for nse in pb.Namespace),
+                    "; ".join(problems)))
+
+
+def _compile_rule(index, rule):
+    """Returns (map index, default or None, required, minimum, maximum)"""
+    return (index,
+            rule.default if rule.has_default else None,
+            rule.required,
+            rule.minimum if getattr(rule, "has_min", False) else None,
+            rule.maximum if getattr(rule, "has_max", False) else None)
+
+
+def _evaluate(rules, config):
+    """Returns the defaults to fill in and the problems of a config"""
+    maps = [getattr(config, name) for name in _MAPS]
+    defaults = []
+    problems = []
+    for key, (index, default, required, minimum, maximum) in \
+            sorted(rules.items()):
+        if key in maps[index]:
+            value = maps[index][key]
+            if minimum is not None and value < minimum:
+                problems.append("{} is lower than the minimum {}".format(
+                    key, minimum))
+            if maximum is not None and value > maximum:
+                problems.append("{} is greater than the maximum {}".format(
+                    key, maximum))
+        elif any(key in map for map in maps):
+            problems.append("{} should be {}".format(key, _TYPE_NAMES[index]))
+        elif default is not None:
+            defaults.append((index, key, default))
+        elif required:
+            problems.append("{} is required".format(key))
+    return defaults, problems
+
 
 def _check_key(key):
     errors = []
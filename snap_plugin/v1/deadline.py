@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from contextlib import contextmanager
+from timeit import default_timer as _now
+
+from .timestamp import ContextVar
+
+# seconds kept from the gRPC deadline to build and send the reply
+_REPLY_MARGIN = .05
+
+# the deadline of the request being handled (see _request_deadline)
+_current = ContextVar("snap_deadline", default=None)
+
+
+class Deadline(object):
+    """Deadline is the time by which a request must be answered.
+
+    Snap sets a deadline on the collect and process requests it sends; a
+    stream collector's deadline is the `max-collect-duration` of the stream.
+    :py:meth:`current` returns the deadline of the request being handled so
+    that a plugin can bound the time it waits for its sources, e.g. by using
+    :py:attr:`time_remaining` as a socket timeout.
+
+    When a collector collects its metrics in groups
+    (:py:meth:`~snap_plugin.v1.collector.Collector.group_by` or
+    :py:meth:`~snap_plugin.v1.collector.Collector.add_handler`) on a thread
+    pool, the library answers at the deadline with the groups collected by
+    then instead of waiting for the slow ones.
+
+    Args:
+        timeout (:obj:`float`): seconds from now, None for no deadline
+
+    Example:
+    ::
+        def collect(self, metrics):
+            timeout = snap.Deadline.current().time_remaining
+            reply = requests.get(self.url, timeout=timeout)
+    """
+
+    __slots__ = ("_at",)
+
+    def __init__(self, timeout=None):
+        self._at = None if timeout is None else _now() + timeout
+
+    def __repr__(self):
+        return "Deadline(time_remaining={})".format(self.time_remaining)
+
+    @property
+    def time_remaining(self):
+        """Seconds left before the deadline (never negative), None when there
+        is no deadline
+
+        Returns:
+            :obj:`float`
+        """
+        if self._at is None:
+            return None
+        return max(self._at - _now(), 0.0)
+
+    @property
+    def expired(self):
+        """Whether the deadline has passed
+
+        Returns:
+            :obj:`bool`
+        """
+        return self._at is not None and _now() >= self._at
+
+    @staticmethod
+    def current():
+        """Returns the deadline of the request being handled.
+
+        Outside of a request, or when the request has no deadline, the
+        returned deadline never expires.
+
+        Returns:
+            :py:class:`Deadline`
+        """
+        deadline = _current.get()
+        if deadline is None:
+            return _NO_DEADLINE
+        return deadline
+
+
+_NO_DEADLINE = Deadline()
+
+
+def _from_context(context):
+    """Returns the deadline of a gRPC request, less the time needed to reply"""
+    remaining = None
+    if context is not None:
+        remaining = context.time_remaining()
+    if remaining is None:
+        return _NO_DEADLINE
+    return Deadline(max(remaining - _REPLY_MARGIN, 0.0))
+
+
+@contextmanager
+def _request_deadline(deadline):
+    """Makes `deadline` the one returned by :py:meth:`Deadline.current` in the
+    block"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
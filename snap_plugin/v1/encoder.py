@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Writes serialized `rpc.MetricsReply` messages without building protobuf
+objects.
+
+The output is byte for byte what
+``MetricsReply.SerializeToString(deterministic=True)`` returns for the same
+metrics: fields are written in field number order, fields holding their
+default value are skipped (except for the members of the `data` oneof) and
+tags are written sorted by key.
+"""
+
+import struct
+from collections import namedtuple
+
+import six
+
+from . import metric as _metric
+from .metric import Metric
+from .metric_batch import MetricBatch, _data_field
+from .metric_list import MetricList, _extend_metrics
+from .namespace_element import NamespaceElement
+from .plugin_pb2 import Metric as PbMetric
+from .plugin_pb2 import MetricsReply
+from .plugin_pb2 import NamespaceElement as PbNamespaceElement
+from .tag_set import TagSet
+from .timestamp import _NS, _now_ns, _split
+
+_BYTES = [six.int2byte(i) for i in range(256)]
+
+# field keys (field number << 3 | wire type) of rpc.Metric and rpc.MetricsReply
+_METRICS_KEY = b"\x0a"        # MetricsReply.metrics = 1
+_ERROR_KEY = b"\x12"          # MetricsReply.error = 2
+_NAMESPACE_KEY = b"\x0a"      # Metric.Namespace = 1
+_VERSION_KEY = b"\x10"        # Metric.Version = 2
+_LAST_ADVERTISED_KEY = b"\x22"  # Metric.LastAdvertisedTime = 4
+_TAGS_KEY = b"\x2a"           # Metric.Tags = 5
+_TIMESTAMP_KEY = b"\x32"      # Metric.Timestamp = 6
+_UNIT_KEY = b"\x3a"           # Metric.Unit = 7
+_DESCRIPTION_KEY = b"\x42"    # Metric.Description = 8
+_VALUE_KEY = b"\x0a"          # NamespaceElement.Value = 1, map key = 1
+_MAP_VALUE_KEY = b"\x12"      # map value = 2
+_SEC_KEY = b"\x08"            # Time.sec = 1
+_NSEC_KEY = b"\x10"           # Time.nsec = 2
+
+_DOUBLE = struct.Struct("<d")
+
+
+def _varint(value):
+    """Returns the varint encoding of `value` (negative values as int64)"""
+    if 0 <= value < 0x80:
+        return _BYTES[value]
+    if value < 0:
+        value += 1 << 64
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _utf8(value):
+    if isinstance(value, six.text_type):
+        return value.encode("utf-8")
+    return value
+
+
+def _delimited(key, value):
+    """Returns a length-delimited field"""
+    return key + _varint(len(value)) + value
+
+
+def _string(key, value):
+    """Returns a string field, or nothing for the empty string"""
+    if not value:
+        return b""
+    return _delimited(key, _utf8(value))
+
+
+def _encode_time(sec, nsec):
+    """Returns the encoded rpc.Time"""
+    out = b""
+    if sec:
+        out += _SEC_KEY + _varint(sec)
+    if nsec:
+        out += _NSEC_KEY + _varint(nsec)
+    return out
+
+
+def _encode_tags(tags):
+    """Returns the Metric.Tags map entries sorted by key"""
+    out = []
+    for key in sorted(tags):
+        key_bytes = _utf8(key)
+        value_bytes = _utf8(tags[key])
+        out.append(_delimited(
+            _TAGS_KEY,
+            _delimited(_VALUE_KEY, key_bytes) +
+            _delimited(_MAP_VALUE_KEY, value_bytes)))
+    return b"".join(out)
+
+
+def _encode_element(element):
+    """Returns the encoded Metric.Namespace entry for a namespace element"""
+    if isinstance(element, NamespaceElement):
+        return _delimited(_NAMESPACE_KEY, element.pb.SerializeToString())
+    return _delimited(_NAMESPACE_KEY, _string(_VALUE_KEY, element))
+
+
+def _encode_double(value):
+    return b"\x59" + _DOUBLE.pack(value)
+
+
+def _encode_int64(value):
+    return b"\x68" + _varint(value)
+
+
+def _encode_uint64(value):
+    return b"\x88\x01" + _varint(value)
+
+
+def _encode_bool(value):
+    return b"\x78\x01" if value else b"\x78\x00"
+
+
+def _encode_string(value):
+    return _delimited(b"\x4a", _utf8(value))
+
+
+def _encode_bytes(value):
+    return _delimited(b"\x72", value)
+
+
+# encodes a value into the member of the 'data' oneof named by the key
+_DATA_ENCODERS = {
+    "float64_data": _encode_double,
+    "int64_data": _encode_int64,
+    "uint64_data": _encode_uint64,
+    "bool_data": _encode_bool,
+    "string_data": _encode_string,
+    "bytes_data": _encode_bytes,
+}
+
+
+def _encode_data(value):
+    """Returns the encoded 'data' oneof for `value`"""
+    if value is None:
+        return b""
+    return _DATA_ENCODERS[_data_field(value)](value)
+
+
+class MetricRow(namedtuple("MetricRow", ["namespace", "data", "timestamp",
+                                         "tags", "unit", "version",
+                                         "description"])):
+    """MetricRow is a metric as a plain tuple.
+
+    Collectors and processors may return rows (or plain tuples laid out the
+    same way) instead of :py:class:`~snap_plugin.v1.metric.Metric` objects.
+    Rows are written straight into the serialized reply by
+    :py:func:`encode_metrics_reply` without creating protobuf objects.
+
+    Args:
+        namespace (:obj:`tuple`): namespace element values (`strings`)
+            and/or
+            :py:class:`~snap_plugin.v1.namespace_element.NamespaceElement`
+        data: metric data (see :py:attr:`snap_plugin.v1.metric.Metric.data`)
+        timestamp (:obj:`float`): time in seconds since Epoch (defaults to the
+            time the reply is encoded)
+        tags (:obj:`dict` or :py:class:`~snap_plugin.v1.tag_set.TagSet`):
+            metric tags
+        unit (:obj:`str`): metric unit
+        version (:obj:`int`): metric version (defaults to the plugin version)
+        description (:obj:`str`): metric description
+
+    Example:
+    ::
+        return [snap.MetricRow(("acme", "sk8", "matix", "rotations"), 42,
+                               tags={"mtype": "counter"})]
+    """
+
+    __slots__ = ()
+
+
+MetricRow.__new__.__defaults__ = (None, None, "", None, "")
+
+
+def _encode_row(row, now, cache):
+    """Returns the encoded rpc.Metric for a row tuple.
+
+    `now` is the encoded LastAdvertisedTime field used by rows without a
+    timestamp.  `cache` maps the id of the tags dicts already encoded during
+    this reply to the dict and its encoding; rows commonly share a tags dict.
+    """
+    size = len(row)
+    namespace, data = row[0], row[1]
+    timestamp = row[2] if size > 2 else None
+    tags = row[3] if size > 3 else None
+    unit = row[4] if size > 4 else ""
+    version = row[5] if size > 5 else None
+    description = row[6] if size > 6 else ""
+    if version is None:
+        version = _metric._plugin_version
+    parts = [_encode_element(element) for element in namespace]
+    if version:
+        parts.append(_VERSION_KEY + _varint(version))
+    if timestamp is None:
+        time_bytes = now
+    else:
+        time_bytes = _delimited(_LAST_ADVERTISED_KEY,
+                                _encode_time(*_split(timestamp)))
+    parts.append(time_bytes)
+    if tags:
+        if isinstance(tags, TagSet):
+            tag_bytes = tags.fragment
+        else:
+            entry = cache.get(id(tags))
+            if entry is None:
+                # the dict is kept alive with its encoding, so that its id
+                # isn't reused by another dict while the reply is encoded
+                entry = cache[id(tags)] = (tags, _encode_tags(tags))
+            tag_bytes = entry[1]
+        parts.append(tag_bytes)
+    # Timestamp (6) holds the same value as LastAdvertisedTime (4)
+    parts.append(_TIMESTAMP_KEY + time_bytes[1:])
+    parts.append(_string(_UNIT_KEY, unit))
+    parts.append(_string(_DESCRIPTION_KEY, description))
+    parts.append(_encode_data(data))
+    return b"".join(parts)
+
+
+def _encode_batch(batch):
+    """Yields the encoded rpc.Metric for every row of a MetricBatch"""
+    if len(batch) == 0:
+        return
+    template = batch.template
+    elements = [_delimited(_NAMESPACE_KEY, element.SerializeToString())
+                for element in template.Namespace]
+    rest = PbMetric()
+    rest.CopyFrom(template)
+    rest.ClearField("Namespace")
+    rest = rest.SerializeToString(deterministic=True)
+    encode = _DATA_ENCODERS[batch._field]
+    index = batch._index
+    if index is None:
+        head = b"".join(elements) + rest
+        for value in batch.data:
+            yield head + encode(value)
+        return
+    head = b"".join(elements[:index])
+    tail = b"".join(elements[index + 1:]) + rest
+    element = PbNamespaceElement()
+    element.CopyFrom(template.Namespace[index])
+    element.ClearField("Value")
+    element = element.SerializeToString()
+    for dyn, value in zip(batch.dynamic, batch.data):
+        dyn = _utf8(dyn)
+        if dyn:
+            dyn = _VALUE_KEY + _varint(len(dyn)) + dyn + element
+        else:
+            dyn = element
+        yield (head + _NAMESPACE_KEY + _varint(len(dyn)) + dyn + tail +
+               encode(value))
+
+
+def encode_metrics_reply(metrics=(), error=""):
+    """Returns the serialized `rpc.MetricsReply` holding `metrics`.
+
+    Args:
+        metrics (iterable): :py:class:`~snap_plugin.v1.metric.Metric`,
+            :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` and
+            :py:class:`MetricRow` (or plain tuples laid out like one), or a
+            single :py:class:`~snap_plugin.v1.metric_batch.MetricBatch`
+        error (:obj:`str`): error message
+
+    Returns:
+        :obj:`bytes`: the same bytes as
+            ``MetricsReply.SerializeToString(deterministic=True)``
+    """
+    if isinstance(metrics, MetricBatch):
+        metrics = (metrics,)
+    now = None
+    cache = {}
+    out = []
+    for metric in metrics:
+        if isinstance(metric, Metric):
+            bodies = (metric.pb.SerializeToString(deterministic=True),)
+        elif isinstance(metric, MetricBatch):
+            bodies = _encode_batch(metric)
+        else:
+            if now is None:
+                now = _delimited(_LAST_ADVERTISED_KEY,
+                                 _encode_time(*divmod(_now_ns(), _NS)))
+            bodies = (_encode_row(metric, now, cache),)
+        for body in bodies:
+            out.append(_METRICS_KEY)
+            out.append(_varint(len(body)))
+            out.append(body)
+    out.append(_string(_ERROR_KEY, error))
+    return b"".join(out)
+
+
+def _metrics_reply(metrics):
+    """Returns the reply for the metrics returned by a plugin.
+
+    Batches and rows are encoded directly into the serialized reply (the
+    servicer passes bytes through untouched); a list of
+    :py:class:`~snap_plugin.v1.metric.Metric` is added to a
+    :py:class:`~snap_plugin.v1.plugin_pb2.MetricsReply` as before.
+    """
+    if isinstance(metrics, MetricBatch):
+        return encode_metrics_reply(metrics)
+    if isinstance(metrics, MetricList):
+        # the plugin may have appended batches or rows to the request
+        items = metrics._items
+    else:
+        if not isinstance(metrics, (list, tuple)):
+            metrics = list(metrics)
+        items = metrics
+    for item in items:
+        if isinstance(item, (MetricBatch, tuple)):
+            return encode_metrics_reply(metrics)
+    reply = MetricsReply()
+    _extend_metrics(reply.metrics, metrics)
+    return reply
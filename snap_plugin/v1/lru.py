@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+
+
+class _LRU(object):
+    """The entries of a cache, least recently used first, with a ttl.
+
+    The caches of the library (results, catalogs and resources) keep their
+    entries in one so that they age and are dropped the same way:
+
+        - an entry is stale `ttl` seconds after it was stored, or after it
+          was last used if `idle` is set.  A None ttl keeps the entries until
+          they are evicted.  Pinned entries don't go stale.
+        - :py:meth:`get` takes a stale entry for a miss, the entry is left
+          until it's replaced, expired or evicted
+        - :py:meth:`expire` drops every stale entry
+        - :py:meth:`put` drops the least recently used entries beyond
+          `max_size`
+
+    It isn't thread-safe: the caches call it under their lock, with the
+    current time.  The methods dropping entries return their values.
+    """
+
+    __slots__ = ("max_size", "ttl", "idle", "_entries", "hits", "misses",
+                 "evictions")
+
+    def __init__(self, max_size, ttl=None, idle=False):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.idle = idle
+        # key -> [value, time stored or used, pinned]
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _stale(self, entry, now):
+        return (self.ttl is not None and not entry[2] and
+                now - entry[1] > self.ttl)
+
+    def get(self, key, now, default=None):
+        """Returns the value of `key`, now the most recently used, or
+        `default` if it's missing or stale"""
+        entry = self._entries.get(key)
+        if entry is None or self._stale(entry, now):
+            self.misses += 1
+            return default
+        del self._entries[key]
+        self._entries[key] = entry
+        if self.idle:
+            entry[1] = now
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, key, now, default=None):
+        """Like :py:meth:`get` without using the entry or counting"""
+        entry = self._entries.get(key)
+        if entry is None or self._stale(entry, now):
+            return default
+        return entry[0]
+
+    def put(self, key, value, now, pinned=False):
+        """Stores `value` as the most recently used entry.
+
+        Returns:
+            :obj:`list`: the values dropped, the one replaced included
+        """
+        dropped = []
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[0] is not value:
+            dropped.append(entry[0])
+            if self._stale(entry, now):
+                self.evictions += 1
+        self._entries[key] = [value, now, pinned]
+        while len(self._entries) > self.max_size:
+            dropped.append(self._entries.popitem(last=False)[1][0])
+            self.evictions += 1
+        return dropped
+
+    def pinned(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[2]
+
+    def unpin(self, key):
+        """Lets the entry of `key` go stale `ttl` seconds after it was
+        stored"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[2] = False
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def expire(self, now):
+        """Drops the stale entries.
+
+        Returns:
+            :obj:`list`: the values dropped
+        """
+        stale = [key for key, entry in self._entries.items()
+                 if self._stale(entry, now)]
+        dropped = [self._entries.pop(key)[0] for key in stale]
+        self.evictions += len(dropped)
+        return dropped
+
+    def clear(self):
+        """Drops every entry, returns their values"""
+        values = [entry[0] for entry in self._entries.values()]
+        self._entries.clear()
+        return values
+
+
+class _LRUCache(object):
+    """The settings and counters of a cache keeping its entries in
+    `self._lru`"""
+
+    def __len__(self):
+        return len(self._lru)
+
+    @property
+    def ttl(self):
+        return self._lru.ttl
+
+    @ttl.setter
+    def ttl(self, ttl):
+        self._lru.ttl = ttl
+
+    @property
+    def max_size(self):
+        return self._lru.max_size
+
+    @property
+    def hits(self):
+        return self._lru.hits
+
+    @property
+    def misses(self):
+        return self._lru.misses
+
+    @property
+    def evictions(self):
+        return self._lru.evictions
@@ -15,15 +15,44 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
 from builtins import int
+from itertools import product
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
 
 from past.builtins import basestring
 
-from .config_map import ConfigMap
+from .config_map import ConfigMap, FrozenConfigMap
 from .namespace import Namespace
 from .plugin_pb2 import Metric as PbMetric
-from .timestamp import Timestamp
+from .timestamp import _NS, Timestamp, _now_ns, _split
+
+# maps the fields of the protobuf 'data' oneof to the python type they hold
+_DATA_TYPES = {
+    "int32_data": int,
+    "int64_data": int,
+    "uint32_data": int,
+    "uint64_data": int,
+    "float32_data": float,
+    "float64_data": float,
+    "string_data": str,
+    "bool_data": bool,
+    "bytes_data": bytes,
+}
+
+# the version of metrics created without one, see _set_plugin_version
+_plugin_version = 0
+
+
+def _set_plugin_version(version):
+    """Sets the version given to metrics created without an explicit one.
+
+    Called once by :py:class:`snap_plugin.v1.plugin.Meta`.
+    """
+    global _plugin_version
+    _plugin_version = version
 
 
 class Metric(object):
@@ -36,12 +65,20 @@ class Metric(object):
             :py:class:`~snap_plugin.v1.namespace_element.NamespaceElement`):
             namespace elements
         version (:obj:`int`): metric version
-        tags (:obj:`dict`): metric tags (key/value pairs)
+        tags (:obj:`dict` or :py:class:`~snap_plugin.v1.tag_set.TagSet`):
+            metric tags (key/value pairs)
         config (:py:class:`~snap_plugin.v1.config_map.ConfigMap`): config for
             metric (key/value pairs)
-        timestamp (:obj:`float`): metric timestamp (see time.time())
+        timestamp (:obj:`float`): metric timestamp (see time.time()), defaults
+            to the current time (or to the reply timestamp, see
+            :py:class:`~snap_plugin.v1.plugin.Meta`)
         unit (:obj:`str`): metric unit
         description (:obj:`str`): metric description
+        validate (:obj:`bool`): type check the arguments (default).  Plugins
+            creating many metrics from trusted input can disable the checks;
+            `config` must then be a :obj:`dict`.
+        timestamp_ns (:obj:`int`): metric timestamp in nanoseconds since
+            Epoch (see time.time_ns()), an alternative to `timestamp`
 
     Example:
         metric = Metric(namespace=("acme", "sk8", "matix", "rotations"),
@@ -51,67 +88,67 @@ class Metric(object):
         TypeError: Provided with arguments of wrong type, constructor will raise TypeError
 
     """
-    def __init__(self, namespace=[], version=None, tags={}, config={},
-                 timestamp=time.time(), unit="", description="", **kwargs):
+    __slots__ = ("_pb", "_config", "_namespace", "_timestamp", "_data_type")
+
+    def __init__(self, namespace=(), version=None, tags=None, config=None,
+                 timestamp=None, unit="", description="", validate=True,
+                 timestamp_ns=None, **kwargs):
+        # the config, namespace and timestamp wrappers are created on first
+        # access
+        self._config = None
+        self._namespace = None
+        self._timestamp = None
         if "pb" in kwargs:
             self._pb = kwargs.get("pb")
-            self._config = ConfigMap(pb=self._pb.Config)
-            self._namespace = Namespace(pb=self._pb.Namespace)
-            self._timestamp = Timestamp(pb=self._pb.Timestamp)
-            if self._pb.HasField("int32_data"):
-                self._data_type = int
-            elif self._pb.HasField("int64_data"):
-                self._data_type = int
-            elif self._pb.HasField("uint32_data"):
-                self._data_type = int
-            elif self._pb.HasField("uint64_data"):
-                self._data_type = int
-            elif self._pb.HasField("float64_data"):
-                self._data_type = float
-            elif self._pb.HasField("float32_data"):
-                self._data_type = float
-            elif self._pb.HasField("string_data"):
-                self._data_type = str
-            elif self._pb.HasField("bool_data"):
-                self._data_type = bool
-            elif self._pb.HasField("bytes_data"):
-                self._data_type = bytes
+            self._data_type = _DATA_TYPES.get(self._pb.WhichOneof("data"))
             return
-        self._pb = PbMetric()
+        pb = self._pb = PbMetric()
+        if validate:
+            if not isinstance(namespace, (list, tuple)):
+                raise TypeError("The 'namespace', kwarg requires a list or tuple "
+                                "of :obj:`snap_plugin.v1.namespace_element.NamespaceElement.  (given: `{}`)"
+                                .format(type(namespace)))
+            if (tags is not None and not isinstance(tags, dict) and
+                    not isinstance(tags, Mapping)):
+                raise TypeError("The 'tags' kwarg requires a dict of strings. "
+                                "(given: `{}`)".format(type(tags)))
         # namespace
-        if isinstance(namespace, (list, tuple)):
-            self._namespace = Namespace(self._pb.Namespace, *namespace)
-        else:
-            raise TypeError("The 'namespace', kwarg requires a list or tuple "
-                            "of :obj:`snap_plugin.v1.namespace_element.NamespaceElement.  (given: `{}`)"
-                            .format(type(namespace)))
+        if namespace:
+            Namespace(pb.Namespace, *namespace)
         # version
-        if version is None:
-            from snap_plugin.v1 import PLUGIN_VERSION
-            self._pb.Version = PLUGIN_VERSION
-        else:
-            self._pb.Version = version
+        version = _plugin_version if version is None else version
+        if version:
+            pb.Version = version
         # unit
-        self._pb.Unit = unit
+        if unit:
+            pb.Unit = unit
         # description
-        self._pb.Description = description
+        if description:
+            pb.Description = description
         # tags
-        if isinstance(tags, dict):
-            self._pb.Tags.update(tags)
-        else:
-            raise TypeError("The 'tags' kwarg requires a dict of strings. "
-                            "(given: `{}`)".format(type(tags)))
+        if tags:
+            pb.Tags.update(tags)
         # configs
-        self._set_config(config)
+        if config is not None:
+            if not validate:
+                if config:
+                    self._config = ConfigMap(pb=pb.Config, **config)
+            elif not isinstance(config, (list, tuple, dict)) or len(config) > 0:
+                self._set_config(config)
 
         # timestamp
-        self._timestamp = Timestamp(pb=self._pb.Timestamp,
-                                    time=timestamp)
+        if timestamp is not None:
+            sec, nsec = _split(timestamp)
+        else:
+            sec, nsec = divmod(
+                _now_ns() if timestamp_ns is None else timestamp_ns, _NS)
+        pb.Timestamp.sec = sec
+        pb.Timestamp.nsec = nsec
 
         # this was added as a stop gap until
         # https://github.com/intelsdi-x/snap/issues/1394 lands
-        self._last_advertised_time = Timestamp(pb=self._pb.LastAdvertisedTime,
-                                               time=timestamp)
+        pb.LastAdvertisedTime.sec = sec
+        pb.LastAdvertisedTime.nsec = nsec
         # data
         if "data" in kwargs:
             self.data = kwargs.get("data")
@@ -126,6 +163,8 @@ class Metric(object):
             :obj:`list` of
                 :py:class:`~snap_plugin.v1.namespace_element.NamespaceElement`)
         """
+        if self._namespace is None:
+            self._namespace = Namespace(self._pb.Namespace)
         return self._namespace
 
     @property
@@ -155,12 +194,25 @@ class Metric(object):
             :py:class:`~snap_plugin.v1.config_map.ConfigMap`
 
         """
+        if self._config is None:
+            self._config = ConfigMap(pb=self._pb.Config)
         return self._config
 
     @config.setter
     def config(self, value):
         self._set_config(value)
 
+    @property
+    def frozen_config(self):
+        """An immutable, hashable snapshot of the metric config.
+
+        Metrics with equal configs return the same object.
+
+        Returns:
+            :py:class:`~snap_plugin.v1.config_map.FrozenConfigMap`
+        """
+        return FrozenConfigMap.from_pb(self._pb.Config)
+
     @property
     def timestamp(self):
         """Time in seconds since Epoch.
@@ -171,11 +223,41 @@ class Metric(object):
         Returns:
             `float`: time in seconds since Epoch (see time.time())
         """
+        if self._timestamp is None:
+            self._timestamp = Timestamp(pb=self._pb.Timestamp)
         return self._timestamp.time
 
     @timestamp.setter
     def timestamp(self, value):
-        self._timestamp.set(value)
+        if self._timestamp is None:
+            self._timestamp = Timestamp(pb=self._pb.Timestamp, time=value)
+        else:
+            self._timestamp.set(value)
+
+    @property
+    def timestamp_ns(self):
+        """Time in nanoseconds since Epoch.
+
+        Unlike :py:attr:`timestamp` the value is an integer and is not
+        rounded by float math.
+
+        Args:
+            value (:obj:`int`): time in nanoseconds since Epoch (see
+                time.time_ns())
+
+        Returns:
+            `int`: time in nanoseconds since Epoch
+        """
+        if self._timestamp is None:
+            self._timestamp = Timestamp(pb=self._pb.Timestamp)
+        return self._timestamp.time_ns
+
+    @timestamp_ns.setter
+    def timestamp_ns(self, value):
+        if self._timestamp is None:
+            self._timestamp = Timestamp(pb=self._pb.Timestamp, time_ns=value)
+        else:
+            self._timestamp.set_ns(value)
 
     @property
     def tags(self):
@@ -254,27 +336,10 @@ class Metric(object):
             :obj:`TypeError`
 
         """
-        if self._data_type == int:
-            if self._pb.HasField("int64_data"):
-                return self._pb.int64_data
-            if self._pb.HasField("int32_data"):
-                return self._pb.int32_data
-            if self._pb.HasField("uint64_data"):
-                return self._pb.uint64_data
-            if self._pb.HasField("uint32_data"):
-                return self._pb.uint32_data
-        elif self._data_type == float:
-            if self._pb.HasField("float32_data"):
-                return self._pb.float32_data
-            if self._pb.HasField("float64_data"):
-                return self._pb.float64_data
-        elif self._data_type == str:
-            return self._pb.string_data
-        elif self._data_type == bool:
-            return self._pb.bool_data
-        elif self._data_type == bytes:
-            return self._pb.bytes_data
-        return None
+        field = self._pb.WhichOneof("data")
+        if field is None:
+            return None
+        return getattr(self._pb, field)
 
     @data.setter
     def data(self, value):
@@ -301,13 +366,74 @@ class Metric(object):
     def pb(self):
         return self._pb
 
+    def expand(self, values, *more_values):
+        """Yields copies of the metric with their dynamic elements filled in.
+
+        The metric (typically a requested metric whose dynamic elements are
+        "*") is copied once per item of `values` and the values are written
+        into the copies.  It's a shorthand for copying the metric and setting
+        the values by hand, which costs about the same.
+
+        Args:
+            values (iterable): the value of the dynamic element of each copy
+                or, for a namespace with several dynamic elements, a
+                :obj:`tuple` holding the value of each of them
+            *more_values (iterable): when given the copies are the
+                cross-product of `values` and `more_values`, one iterable per
+                dynamic element
+
+        Example:
+        ::
+            # /intel/cpu/*/core/*/util
+            for m in metric.expand(range(cpus), range(cores)):
+                cpu, core = m.namespace[2].value, m.namespace[4].value
+                m.data = read_util(cpu, core)
+
+        Yields:
+            :py:class:`~snap_plugin.v1.metric.Metric`
+
+        Raises:
+            ValueError: the namespace has no dynamic element or the number of
+                values doesn't match the number of dynamic elements
+        """
+        indexes = self.namespace.dynamic_indexes()
+        if not indexes:
+            raise ValueError("The namespace {} has no dynamic element to "
+                             "expand".format(self.namespace.key))
+        if more_values:
+            values = product(values, *more_values)
+        elif len(indexes) == 1:
+            values = ((value,) for value in values)
+        return self._expand(indexes, values)
+
+    def _expand(self, indexes, values):
+        pb = self._pb
+        for item in values:
+            if not isinstance(item, (tuple, list)):
+                raise ValueError(
+                    "The namespace has {} dynamic elements, each value must "
+                    "be a tuple of as many values.  (given: `{!r}`)".format(
+                        len(indexes), item))
+            if len(item) != len(indexes):
+                raise ValueError(
+                    "The namespace has {} dynamic elements.  (given: {} "
+                    "values)".format(len(indexes), len(item)))
+            copy = PbMetric()
+            copy.CopyFrom(pb)
+            namespace = copy.Namespace
+            for index, value in zip(indexes, item):
+                if not isinstance(value, basestring):
+                    value = str(value)
+                namespace[index].Value = value
+            yield Metric(pb=copy)
+
     def _set_config(self, config):
         if isinstance(config, (list, tuple)):
             self._config = ConfigMap(pb=self._pb.Config, *config)
         elif isinstance(config, dict):
             self._config = ConfigMap(pb=self._pb.Config, **config)
         elif isinstance(config, ConfigMap):
-            self._config = ConfigMap(config.items(), pb=self._pb.Config)
+            self._config = ConfigMap(*config.items(), pb=self._pb.Config)
         else:
             raise TypeError("The 'config' kwarg requires a list, tuple or"
                             " dict.  (given: `{}`)".format(type(config)))
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from builtins import int
+
+from past.builtins import basestring
+
+from .metric import Metric
+from .namespace import Namespace
+from .plugin_pb2 import Metric as PbMetric
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# maps the kind of a numpy dtype to the protobuf field holding its values
+_NUMPY_FIELDS = {
+    "b": "bool_data",
+    "i": "int64_data",
+    "u": "uint64_data",
+    "f": "float64_data",
+    "U": "string_data",
+}
+
+
+class MetricBatch(object):
+    """MetricBatch holds many metrics sharing everything but one namespace
+    element and their value.
+
+    The metrics are stored in columns: a namespace template containing (at
+    most) one dynamic element, the values of that dynamic element and the
+    data values.  The unit, tags, version, description and timestamp are
+    shared by every row.  A collector can return a batch (or a list
+    containing batches and metrics) from
+    :py:meth:`~snap_plugin.v1.collector.Collector.collect` and the library
+    will add all of its rows to the reply in a single pass.
+
+    Args:
+        namespace (:obj:`list` of
+            :py:class:`~snap_plugin.v1.namespace_element.NamespaceElement`
+            or :obj:`list` of `strings`): namespace template
+        dynamic (:obj:`list` or :obj:`numpy.ndarray`): the value of the
+            dynamic namespace element for each row
+        data (:obj:`list` or :obj:`numpy.ndarray`): the value of each row.
+            All values must have the same type, except that a column mixing
+            ints and floats is sent as floats.  The data field of a 1-D
+            numpy array is picked from its dtype (`float64_data`,
+            `int64_data`, `uint64_data`, `bool_data` or `string_data`).
+        version (:obj:`int`): metric version
+        tags (:obj:`dict` or :py:class:`~snap_plugin.v1.tag_set.TagSet`):
+            tags of every row
+        unit (:obj:`str`): unit of every row
+        description (:obj:`str`): description of every row
+        timestamp (:obj:`float`): timestamp of every row (defaults to the time
+            the batch is created)
+
+    Example:
+    ::
+        snap.MetricBatch(
+            namespace=[
+                snap.NamespaceElement(value="intel"),
+                snap.NamespaceElement(name="cpu_id", description="cpu id"),
+                snap.NamespaceElement(value="utilization")
+            ],
+            dynamic=["0", "1", "2", "3"],
+            data=[12.5, 3.0, 99.1, 0.2],
+            unit="percent"
+        )
+
+    With numpy the columns may be passed as arrays:
+    ::
+        snap.MetricBatch(
+            namespace=("intel", snap.NamespaceElement(name="cpu_id",
+                                                      description="cpu id"),
+                       "utilization"),
+            dynamic=numpy.arange(len(readings)),
+            data=readings  # 1-D float64 array
+        )
+
+    Raises:
+        ValueError: the columns have different lengths, the data values have
+            different types or the namespace holds more than one dynamic
+            element
+    """
+
+    __slots__ = ("_template", "_index", "_dynamic", "_data", "_field")
+
+    def __init__(self, namespace, dynamic=(), data=(), version=None,
+                 tags=None, unit="", description="", timestamp=None):
+        self._template = Metric(namespace=namespace, version=version,
+                                tags=tags, unit=unit, description=description,
+                                timestamp=timestamp).pb
+        indexes = Namespace(self._template.Namespace).dynamic_indexes()
+        if len(indexes) > 1:
+            raise ValueError("A MetricBatch supports a single dynamic "
+                             "namespace element.  (given: {})".format(len(indexes)))
+        self._index = indexes[0] if indexes else None
+        if self._index is None and len(dynamic) > 0:
+            raise ValueError("Dynamic values were provided but the namespace "
+                             "has no dynamic element.")
+        if self._index is not None and len(dynamic) != len(data):
+            raise ValueError("The 'dynamic' and 'data' columns must have the "
+                             "same length.  (given: {} and {})"
+                             .format(len(dynamic), len(data)))
+        self._field = None
+        if numpy is not None and isinstance(data, numpy.ndarray):
+            if data.ndim != 1:
+                raise ValueError("The 'data' array must be 1-D.  (given: {}-D)"
+                                 .format(data.ndim))
+            if data.dtype.kind not in _NUMPY_FIELDS:
+                raise TypeError("Unsupported data dtype '{}'.  (Supported: "
+                                "bool, int, uint, float and str)"
+                                .format(data.dtype))
+            self._field = _NUMPY_FIELDS[data.dtype.kind]
+            # tolist converts the whole column to python scalars in one call
+            data = data.tolist()
+        elif len(data) > 0:
+            self._field, data = _column_field(data)
+        if numpy is not None and isinstance(dynamic, numpy.ndarray):
+            dynamic = dynamic.astype(str).tolist()
+        self._dynamic = dynamic
+        self._data = data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        for pb in self._fill(None):
+            yield Metric(pb=pb)
+
+    @property
+    def dynamic(self):
+        "Values of the dynamic namespace element."
+        return self._dynamic
+
+    @property
+    def data(self):
+        "Data values."
+        return self._data
+
+    @property
+    def template(self):
+        """The protobuf metric every row is copied from.
+
+        Returns:
+            :py:class:`snap_plugin.v1.plugin_pb2.Metric`
+        """
+        return self._template
+
+    def _extend(self, repeated):
+        """Appends the rows to a repeated protobuf metric field"""
+        for _ in self._fill(repeated):
+            pass
+
+    def _fill(self, repeated):
+        """Yields a protobuf metric per row, added to `repeated` if given"""
+        if len(self._data) == 0:
+            return
+        template = self._template
+        field = self._field
+        add = repeated.add if repeated is not None else PbMetric
+        if self._index is None:
+            for value in self._data:
+                pb = add()
+                pb.CopyFrom(template)
+                setattr(pb, field, value)
+                yield pb
+            return
+        index = self._index
+        for dyn, value in zip(self._dynamic, self._data):
+            pb = add()
+            pb.CopyFrom(template)
+            pb.Namespace[index].Value = dyn
+            setattr(pb, field, value)
+            yield pb
+
+
+def _data_field(value):
+    """Returns the protobuf field used to hold values like the one given"""
+    if isinstance(value, bool):
+        return "bool_data"
+    elif isinstance(value, int):
+        return "int64_data"
+    elif isinstance(value, float):
+        return "float64_data"
+    elif isinstance(value, basestring):
+        return "string_data"
+    elif isinstance(value, bytes):
+        return "bytes_data"
+    raise TypeError("Unsupported data type '{}'.  (Supported: "
+                    "int, long, float, str and bool)".format(value))
+
+
+def _column_field(data):
+    """Returns the protobuf field holding every value of a data column and
+    the column, its ints converted to floats if it mixes both"""
+    fields = set(_data_field(value) for value in data)
+    if len(fields) == 1:
+        return fields.pop(), data
+    if fields == {"int64_data", "float64_data"}:
+        return "float64_data", [float(value) for value in data]
+    raise ValueError("The values of the 'data' column must have the same "
+                     "type.  (given: {})".format(
+                         ", ".join(sorted(set(type(value).__name__
+                                              for value in data)))))
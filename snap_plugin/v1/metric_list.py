@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from collections.abc import MutableSequence
+except ImportError:
+    from collections import MutableSequence
+
+from .config_map import FrozenConfigMap, _config_key
+from .metric import Metric
+from .metric_batch import MetricBatch
+from .plugin_pb2 import Metric as PbMetric
+
+
+class MetricList(MutableSequence):
+    """MetricList is the list of metrics handed to plugins by the library.
+
+    The list holds the protobuf metrics of a request and wraps each of them in
+    a :py:class:`~snap_plugin.v1.metric.Metric` only when it is first
+    accessed.  Plugins which do not look at every metric (a publisher
+    forwarding data for instance) therefore don't pay for wrapping them.
+    Apart from that it behaves like a regular :obj:`list` of
+    :py:class:`~snap_plugin.v1.metric.Metric` (`sort`, `copy` and `+`
+    included), though it isn't a :obj:`list` subclass.
+
+    Like the list a plugin returns, it may also hold
+    :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` and
+    :py:class:`~snap_plugin.v1.encoder.MetricRow` items, which are returned
+    as they are.
+
+    Args:
+        metrics (iterable): protobuf metrics and/or
+            :py:class:`~snap_plugin.v1.metric.Metric` objects
+
+    """
+
+    __slots__ = ("_items",)
+
+    def __init__(self, metrics=()):
+        self._items = list(metrics)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return MetricList(self._items[index])
+        item = self._items[index]
+        if isinstance(item, PbMetric):
+            item = Metric(pb=item)
+            self._items[index] = item
+        return item
+
+    def __setitem__(self, index, value):
+        self._items[index] = value
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        for index in range(len(self._items)):
+            yield self[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, MetricList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return MetricList(self._items + list(other))
+
+    def __radd__(self, other):
+        return MetricList(list(other) + self._items)
+
+    def insert(self, index, value):
+        self._items.insert(index, value)
+
+    def copy(self):
+        """Returns a shallow copy of the list, like :py:meth:`list.copy`"""
+        return MetricList(self._items)
+
+    def sort(self, key=None, reverse=False):
+        """Sorts the list in place, like :py:meth:`list.sort`.
+
+        The metrics are wrapped to be compared.
+        """
+        items = list(self)
+        items.sort(key=key, reverse=reverse)
+        self._items = items
+
+    @property
+    def pbs(self):
+        """The protobuf metrics held by the list.
+
+        Reading them doesn't wrap the metrics which haven't been accessed yet.
+
+        Returns:
+            :obj:`list` of :py:class:`snap_plugin.v1.plugin_pb2.Metric`
+
+        Raises:
+            TypeError: the list holds batches or rows
+        """
+        return [_pb(item) for item in self._items]
+
+    def by_config(self):
+        """Groups the metrics by config.
+
+        Requests usually carry the same config on every metric of a task, so
+        this yields a handful of groups however many metrics were requested.
+        The snapshots are interned and can be used as dict keys to keep state
+        per config.
+
+        Returns:
+            :obj:`list` of
+                (:py:class:`~snap_plugin.v1.config_map.FrozenConfigMap`,
+                :py:class:`MetricList`): the groups in the order their first
+                metric appears in the list
+        """
+        groups = {}
+        order = []
+        for item in self._items:
+            pb = _pb(item)
+            key = _config_key(pb.Config)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (FrozenConfigMap.from_pb(pb.Config), [])
+                order.append(key)
+            group[1].append(item)
+        return [(groups[key][0], MetricList(groups[key][1])) for key in order]
+
+    def group_by(self, key):
+        """Groups the metrics by the value of `key`.
+
+        Args:
+            key (callable): called with each
+                :py:class:`~snap_plugin.v1.metric.Metric`, returns the
+                (hashable) value identifying its group
+
+        Returns:
+            :obj:`list` of (value, :py:class:`MetricList`): the groups in the
+                order their first metric appears in the list
+        """
+        groups = {}
+        order = []
+        for metric in self:
+            value = key(metric)
+            group = groups.get(value)
+            if group is None:
+                group = groups[value] = []
+                order.append(value)
+            group.append(metric)
+        return [(value, MetricList(groups[value])) for value in order]
+
+
+def _pb(item):
+    """Returns the protobuf metric of a MetricList item"""
+    if isinstance(item, PbMetric):
+        return item
+    if isinstance(item, Metric):
+        return item.pb
+    raise TypeError("The list holds a {} rather than a metric"
+                    .format(type(item).__name__))
+
+
+def _extend_metrics(repeated, metrics):
+    """Appends the metrics returned by a plugin to a repeated protobuf field.
+
+    `metrics` is a :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` or
+    an iterable (a :py:class:`MetricList` included) of
+    :py:class:`~snap_plugin.v1.metric.Metric` and
+    :py:class:`~snap_plugin.v1.metric_batch.MetricBatch`.  Rows are written by
+    the encoder instead.
+    """
+    if isinstance(metrics, MetricBatch):
+        metrics._extend(repeated)
+        return
+    if isinstance(metrics, MetricList):
+        # no need to wrap the metrics which weren't accessed
+        metrics = metrics._items
+    pbs = []
+    for metric in metrics:
+        if isinstance(metric, MetricBatch):
+            repeated.extend(pbs)
+            pbs = []
+            metric._extend(repeated)
+        else:
+            pbs.append(_pb(metric))
+    repeated.extend(pbs)
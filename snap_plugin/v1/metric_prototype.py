@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from .metric import Metric
+from .plugin_pb2 import Metric as PbMetric
+from .timestamp import _NS, _now_ns, _split
+
+
+class MetricPrototype(object):
+    """MetricPrototype creates metrics from a precompiled template.
+
+    The prototype is compiled once from a metric (typically one returned by
+    :py:meth:`~snap_plugin.v1.collector.Collector.update_catalog`).  New
+    metrics are created by copying the compiled protobuf and writing the
+    data and timestamp, so the namespace, tags, unit, description, version
+    and config are not rebuilt for every metric.
+
+    Args:
+        metric (:py:class:`~snap_plugin.v1.metric.Metric`): the metric to
+            compile.  Its data and timestamps are not part of the prototype.
+
+    Example:
+    ::
+        # once, e.g. in __init__
+        self.rotations = snap.MetricPrototype(
+            snap.Metric(namespace=("acme", "sk8", "matix", "rotations"),
+                        unit="rpm", tags={"mtype": "gauge"}))
+
+        # in collect
+        metrics.append(self.rotations.new(read_rotations()))
+    """
+
+    __slots__ = ("_pb",)
+
+    def __init__(self, metric):
+        self._pb = PbMetric()
+        self._pb.CopyFrom(metric.pb)
+        self._pb.ClearField("Timestamp")
+        self._pb.ClearField("LastAdvertisedTime")
+        data = self._pb.WhichOneof("data")
+        if data is not None:
+            self._pb.ClearField(data)
+
+    @property
+    def pb(self):
+        "Returns the compiled protobuf metric."
+        return self._pb
+
+    def new(self, data=None, timestamp=None):
+        """Returns a new metric created from the prototype.
+
+        Args:
+            data: metric data (see :py:attr:`snap_plugin.v1.metric.Metric.data`)
+            timestamp (:obj:`float`): time in seconds since Epoch (defaults
+                to the current time)
+
+        Returns:
+            :py:class:`~snap_plugin.v1.metric.Metric`
+        """
+        pb = PbMetric()
+        pb.CopyFrom(self._pb)
+        if timestamp is None:
+            sec, nsec = divmod(_now_ns(), _NS)
+        else:
+            sec, nsec = _split(timestamp)
+        pb.Timestamp.sec = pb.LastAdvertisedTime.sec = sec
+        pb.Timestamp.nsec = pb.LastAdvertisedTime.nsec = nsec
+        metric = Metric(pb=pb)
+        if data is not None:
+            metric.data = data
+        return metric
@@ -19,6 +19,13 @@
 from past.builtins import basestring
 
 from .namespace_element import NamespaceElement
+from .plugin_pb2 import Metric as PbMetric
+
+# candidate separators of the namespace key, the first one which appears in
+# none of the element values is used
+_SEPARATORS = [u"/", u"|", u"%", u":", u"-", u";", u"_", u"^", u">", u"<",
+               u"+", u"=", u"&", u"㊽", u"Ä", u"大", u"小", u"ᵹ", u"☍", u"ヒ"]
+_LAST_SEPARATOR = u"\U0001f422"
 
 
 class Namespace(object):
@@ -32,8 +39,11 @@ class Namespace(object):
 
     """
 
+    __slots__ = ("_pb", "_key")
+
     def __init__(self, pb, *elements):
         self._pb = pb
+        self._key = None
         for nse in elements:
             if isinstance(nse, basestring):
                 self.add_static_element(nse)
@@ -42,31 +52,78 @@ class Namespace(object):
                     self.add(nse)
 
     def __getitem__(self, index):
-        return NamespaceElement(pb=self._pb.__getitem__(index))
+        return NamespaceElement(pb=self._pb.__getitem__(index), parent=self)
 
     def __delitem__(self, index):
+        self._key = None
         return self._pb.__delitem__(index)
 
     def __len__(self):
         return len(self._pb)
 
     def __repr__(self):
-        separators = ["/", "|", "%", ":", "-", ";", "_", "^", ">", "<", "+", "=", "&", "㊽", "Ä", "大", "小", "ᵹ", "☍", "ヒ"]
-        separator = "\U0001f422"
-        for sep in separators:
-            found = False
-            for n in self:
-                if sep in n.value:
-                    found = True
-                    break
-            if not found:
-                separator = sep
-                break
-
-        result = separator
-        for n in self:
-            result += n.value + separator
-        return result[:-1]
+        return self.key
+
+    def __eq__(self, other):
+        if not isinstance(other, Namespace):
+            return NotImplemented
+        return self.key == other.key
+
+    def __ne__(self, other):
+        if not isinstance(other, Namespace):
+            return NotImplemented
+        return self.key != other.key
+
+    # a namespace can be changed, index by its key instead
+    __hash__ = None
+
+    @property
+    def key(self):
+        """The namespace as a string, e.g. "/intel/cpu/0/utilization".
+
+        The first character is the separator: the first of "/", "|", "%",
+        ... which isn't part of any element value.  Two namespaces have the
+        same key when their element values are equal, so the key can be used
+        to index metrics; namespaces compare by key but, being mutable,
+        aren't hashable themselves.  The key is computed once and recomputed
+        after the namespace is changed through this object or its elements.
+
+        Returns:
+            :obj:`str`
+        """
+        if self._key is None:
+            self._key = _format([nse.Value for nse in self._pb])
+        return self._key
+
+    def dynamic_indexes(self):
+        """Returns the positions of the dynamic elements.
+
+        An element is dynamic when its `name` is set or its `value` is "*".
+
+        Returns:
+            :obj:`list` of :obj:`int`
+        """
+        return [i for i, nse in enumerate(self._pb)
+                if nse.Name != "" or nse.Value == "*"]
+
+    @classmethod
+    def from_string(cls, key):
+        """Returns the namespace of static elements described by a key.
+
+        The first character of `key` is the separator (see :py:attr:`key`).
+
+        Example:
+            Namespace.from_string("/intel/cpu/utilization")
+
+        Returns:
+            :py:class:`snap_plugin.v1.namespace.Namespace`
+        """
+        namespace = cls(PbMetric().Namespace)
+        if key:
+            pb = namespace._pb
+            for value in key[1:].split(key[0]):
+                pb.add(Value=value)
+        return namespace
 
     def add_dynamic_element(self, name, description):
         """Adds a dynamic namespace element to the end of the Namespace.
@@ -86,6 +143,7 @@ class Namespace(object):
         Returns:
             :py:class:`snap_plugin.v1.namespace.Namespace`
         """
+        self._key = None
         self._pb.add(Name=name, Description=description, Value="*")
         return self
 
@@ -104,6 +162,7 @@ class Namespace(object):
         Returns:
             :py:class:`snap_plugin.v1.namespace.Namespace`
         """
+        self._key = None
         self._pb.add(Value=value)
         return self
 
@@ -117,9 +176,26 @@ class Namespace(object):
         Args:
             **kwargs (optional): key=-1
         """
+        self._key = None
         return self._pb.pop(key)
 
     def add(self, namespace_element):
-        self._pb.add(Value=namespace_element.value,
-                     Name=namespace_element.name,
-                     Description=namespace_element.description)
+        self._key = None
+        pb = namespace_element.pb
+        if pb.Name or pb.Description:
+            self._pb.add().CopyFrom(pb)
+        else:
+            self._pb.add(Value=pb.Value)
+
+
+def _format(values):
+    """Returns the namespace key of the element values"""
+    if not values:
+        return ""
+    joined = "".join(values)
+    for separator in _SEPARATORS:
+        if separator not in joined:
+            break
+    else:
+        separator = _LAST_SEPARATOR
+    return separator + separator.join(values)
@@ -42,7 +42,11 @@ class NamespaceElement(object):
 
     """
 
+    __slots__ = ("_pb", "_parent")
+
     def __init__(self, name="", description="", value="", **kwargs):
+        # the namespace holding the element, told when the value changes
+        self._parent = kwargs.get("parent")
         if "pb" in kwargs:
             self._pb = kwargs.get("pb")
         else:
@@ -56,12 +60,10 @@ class NamespaceElement(object):
                 # default '*'.
                 self._pb.Value = "*"
 
-    def __getattr__(self, attr):
-        if attr in self.__dict__:
-            # this object has it
-            return getattr(self, attr)
-        # proxy to the wrapped object
-        return getattr(self._pb, attr)
+    @property
+    def pb(self):
+        "Returns the wrapped protobuf data holder."
+        return self._pb
 
     @property
     def value(self):
@@ -70,6 +72,8 @@ class NamespaceElement(object):
     @value.setter
     def value(self, value):
         self._pb.Value = value
+        if self._parent is not None:
+            self._parent._key = None
 
     @property
     def description(self):
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+from concurrent import futures
+
+from past.builtins import basestring
+
+from .metric_batch import MetricBatch
+from .metric_list import MetricList
+from .namespace import Namespace
+from .timestamp import copy_context
+
+LOG = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+
+class NamespaceRouter(object):
+    """NamespaceRouter maps namespace patterns to handlers.
+
+    The patterns are kept in a trie indexed by element value, so finding the
+    handler of a namespace costs one dict lookup per element.  A "*" element
+    in a pattern matches any value; an exact element is preferred over "*"
+    when both match.
+
+    Collectors own a router (see
+    :py:meth:`~snap_plugin.v1.collector.Collector.add_handler`) which
+    dispatches the requested metrics before
+    :py:meth:`~snap_plugin.v1.collector.Collector.collect` is called.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self):
+        # a node is [children by element value, handler]
+        self._root = [{}, None]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pattern, handler):
+        """Registers `handler` for the namespaces matching `pattern`.
+
+        Args:
+            pattern (:obj:`tuple` of `strings` or :obj:`str`): element values,
+                "*" matching any value, or a namespace key such as
+                "/intel/cpu/*/utilization"
+            handler (callable): called with a
+                :py:class:`~snap_plugin.v1.metric_list.MetricList` of the
+                requested metrics which match `pattern`, returns the collected
+                metrics (like
+                :py:meth:`~snap_plugin.v1.collector.Collector.collect`)
+
+        Raises:
+            ValueError: a handler is already registered for `pattern`
+        """
+        if isinstance(pattern, basestring):
+            pattern = [nse.Value for nse in Namespace.from_string(pattern)._pb]
+        node = self._root
+        for value in pattern:
+            node = node[0].setdefault(value, [{}, None])
+        if node[1] is not None:
+            raise ValueError("A handler is already registered for the "
+                             "namespace {}".format(list(pattern)))
+        node[1] = handler
+        self._size += 1
+
+    def match(self, values):
+        """Returns the handler of a namespace or None.
+
+        Args:
+            values (:obj:`list` of `strings`): the element values
+        """
+        return _match(self._root, values, 0)
+
+    def route(self, metrics):
+        """Groups metrics by handler.
+
+        Args:
+            metrics (:py:class:`~snap_plugin.v1.metric_list.MetricList`):
+                requested metrics
+
+        Returns:
+            (:obj:`list` of (handler, `MetricList`), `MetricList`): the groups
+                in the order their first metric was requested and the
+                metrics matching no pattern
+        """
+        root = self._root
+        groups = {}
+        order = []
+        unmatched = []
+        for pb in metrics.pbs:
+            handler = _match(root, [nse.Value for nse in pb.Namespace], 0)
+            if handler is None:
+                unmatched.append(pb)
+                continue
+            group = groups.get(handler)
+            if group is None:
+                group = groups[handler] = []
+                order.append(handler)
+            group.append(pb)
+        return ([(handler, MetricList(groups[handler])) for handler in order],
+                MetricList(unmatched))
+
+    def dispatch(self, metrics, default, key=None, executor=None,
+                 deadline=None):
+        """Calls the handler of every group of metrics.
+
+        Args:
+            metrics (:py:class:`~snap_plugin.v1.metric_list.MetricList`):
+                requested metrics
+            default (callable): called with the metrics matching no pattern,
+                if any
+            key (callable): splits the metrics of a handler further, see
+                :py:meth:`~snap_plugin.v1.metric_list.MetricList.group_by`.
+                The handler is called once per group.
+            executor (:py:class:`concurrent.futures.Executor`): runs the
+                handler calls concurrently; the calling thread runs the
+                first one
+            deadline (:py:class:`~snap_plugin.v1.deadline.Deadline`): with
+                an `executor`, the time after which the groups still being
+                collected are left out of the result
+
+        Returns:
+            :obj:`list`: the metrics returned by the handlers, in the order
+                the groups were first requested
+
+        Raises:
+            concurrent.futures.TimeoutError: no group was collected by the
+                deadline
+        """
+        groups, unmatched = self.route(metrics)
+        if len(unmatched) > 0:
+            groups.append((default, unmatched))
+        if key is not None:
+            groups = [(handler, subgroup) for handler, group in groups
+                      for _, subgroup in group.group_by(key)]
+        collected = []
+        if deadline is not None and deadline.time_remaining is None:
+            deadline = None
+        if executor is None or (len(groups) < 2 and deadline is None):
+            for handler, group in groups:
+                _extend(collected, handler(group))
+            return collected
+        # the handlers see the context of the request (reply timestamp,
+        # deadline).  The calling thread collects the first group unless it
+        # has to answer at the deadline.
+        start = 0 if deadline is not None else 1
+        pending = [executor.submit(copy_context().run, handler, group)
+                   for handler, group in groups[start:]]
+        if start:
+            handler, group = groups[0]
+            _extend(collected, handler(group))
+        late = []
+        stuck = []
+        for future, (_, group) in zip(pending, groups[start:]):
+            try:
+                _extend(collected, future.result(
+                    None if deadline is None else deadline.time_remaining))
+            except futures.TimeoutError:
+                if not future.cancel():
+                    # already running, it can't be stopped
+                    stuck.append(future)
+                late.append(group)
+        if stuck and isinstance(executor, _GroupExecutor):
+            executor.abandon(stuck)
+        if late:
+            _missed_deadline(late, len(groups))
+        return collected
+
+
+class _GroupExecutor(object):
+    """Thread pool collecting the groups of
+    :py:meth:`~snap_plugin.v1.collector.Collector.group_by`.
+
+    A group still running at the deadline can't be stopped and would hold
+    its thread, so that a source which hangs would take one more thread of
+    the pool every interval.  The pool is replaced by a new one as soon as a
+    group is abandoned; the threads of the old one exit once their group
+    returns.
+    """
+
+    def __init__(self, max_workers):
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.replaced = 0
+
+    def submit(self, fn, *args, **kwargs):
+        executor = self._executor
+        future = executor.submit(fn, *args, **kwargs)
+        future.executor = executor
+        return future
+
+    def abandon(self, running):
+        """Replaces the pool if the `running` futures hold its threads"""
+        with self._lock:
+            executor = self._executor
+            if not any(future.executor is executor for future in running):
+                # replaced meanwhile
+                return
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=self._max_workers)
+            self.replaced += 1
+        LOG.warning("{} metric groups are still being collected after the "
+                    "deadline, replacing their thread pool".format(
+                        len(running)))
+        executor.shutdown(wait=False)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def _match(node, values, index):
+    """Returns the handler for values[index:] below node, or None"""
+    if index == len(values):
+        return node[1]
+    children = node[0]
+    value = values[index]
+    child = children.get(value)
+    if child is not None:
+        handler = _match(child, values, index + 1)
+        if handler is not None:
+            return handler
+    if value != WILDCARD:
+        child = children.get(WILDCARD)
+        if child is not None:
+            return _match(child, values, index + 1)
+    return None
+
+
+def _extend(collected, metrics):
+    """Adds what a handler returned to the list of collected metrics"""
+    if isinstance(metrics, MetricBatch):
+        collected.append(metrics)
+    else:
+        collected.extend(metrics)
+
+
+def _missed_deadline(late, count):
+    """Reports the groups of metrics left out at the deadline.
+
+    The collected groups are returned without error (Snap drops the metrics
+    of a reply carrying one), so the others are only logged, unless none of
+    the `count` groups was collected.
+    """
+    namespaces = ["/" + "/".join(nse.Value
+                                 for nse in group.pbs[0].Namespace)
+                  for group in late[:5]]
+    if len(late) > 5:
+        namespaces.append("...")
+    msg = "{} of {} metric groups ({} metrics) weren't collected by the " \
+          "deadline: {}".format(len(late), count,
+                                sum(len(group) for group in late),
+                                ", ".join(namespaces))
+    if len(late) == count:
+        raise futures.TimeoutError(msg)
+    LOG.warning(msg)
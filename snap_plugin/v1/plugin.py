@@ -29,6 +29,7 @@ from enum import Enum
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from past.builtins import basestring
 from socket import error as socket_error
+import threading
 from threading import Thread
 from timeit import default_timer as timer
 
@@ -37,9 +38,18 @@ import six
 
 from .plugin_pb2 import GetConfigPolicyReply
 from .config_map import ConfigMap
+from .metric import Metric, _set_plugin_version
+from .resource_cache import ResourceCache
+from .servicers import _ControlExecutor, _per_method_pools, _Slots
 
 LOG = logging.getLogger(__name__)
 
+# threads serving Ping, Kill and GetConfigPolicy
+_CONTROL_WORKERS = 2
+
+# seconds between the expiries of the cached state (see Plugin._expire)
+_EXPIRY_INTERVAL = 1.5
+
 class _Timer(object):
     """Timer for diagnostic timing"""
     def __enter__(self):
@@ -60,6 +70,37 @@ class _Timer(object):
         return "{:.3f} {}".format(float(elapsed), unit)
 
 
+class PingStats(object):
+    """Latency of the pings (health checks) received from Snap.
+
+    The latency of a ping runs from the moment the gRPC server queued it to
+    the moment it was answered, in seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.last = None
+        self.max = None
+
+    def add(self, latency):
+        """Records the latency of a ping"""
+        with self._lock:
+            self.count += 1
+            self.total += latency
+            self.last = latency
+            if self.max is None or latency > self.max:
+                self.max = latency
+
+    @property
+    def mean(self):
+        """The mean latency, None before the first ping"""
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+
 def _make_standalone_handler(preamble):
     """Class factory used so that preamble can be passed to :py:class:`_StandaloneHandler`
      without use of static members"""
@@ -274,6 +315,53 @@ class Meta(object):
         root_cert_paths (:obj:`string`): Paths to the root certificates. Colon delimited.
         server_cert_path (:obj:`string`): Path to the server certificate.
         private_key_path (:obj:`string`): Path to the private key file.
+        reply_timestamp (:obj:`bool`): Stamp every metric created without a
+            timestamp while a collect (or process) request is handled with
+            the time the request arrived, instead of reading the clock for
+            each metric.
+        apply_config_policy (:obj:`bool`): Fill in the defaults of the config
+            policy and check its rules on the config of every request before
+            it's handed to the plugin.  Requests with a config which doesn't
+            comply get an error reply.
+        catalog_cache_ttl (:obj:`float`): Collectors only.  Seconds the
+            metric catalog returned by `update_catalog` is reused for
+            requests with the same config.  The catalog isn't cached by
+            default.
+        catalog_cache_size (:obj:`int`): The number of configs whose catalog
+            is cached, in memory and in `catalog_cache_path`.
+        catalog_cache_path (:obj:`string`): Directory the cached catalogs
+            are written to.  A restarted plugin answers with the catalog
+            found there and refreshes it in the background.
+        worker_count (:obj:`int`): The number of threads handling gRPC
+            requests.  Defaults to `concurrency_count`, i.e. 5 threads unless
+            it's set; earlier versions of the library always used 10 threads
+            for all requests.  Ping, Kill and GetConfigPolicy requests are
+            handled by two threads of their own (by two more worker threads
+            with grpcio releases lacking per-method thread pools).
+        maximum_concurrent_rpcs (:obj:`int`): The number of plugin requests
+            (collect, process, publish, stream and the metric types) served
+            at once, further requests are rejected with RESOURCE_EXHAUSTED.
+            gRPC's own limit, which counts every request, is set two above
+            so that pings, Kill and GetConfigPolicy are still accepted.
+            Unbounded by default.
+        grpc_options (:obj:`list` of :obj:`tuple`): gRPC server options
+            (key/value pairs), e.g.
+            ``[("grpc.max_receive_message_length", 8 * 1024 * 1024)]``
+        process_workers (:obj:`int`): Collectors and processors only, but
+            not the asyncio ones (which refuse to start with it).  The
+            number of worker processes `collect` (or `process`) runs in, for
+            plugins whose work is CPU bound.  The workers are forked when the
+            plugin starts and only the serialized requests and replies are
+            passed to them.  Requests are handled by the gRPC threads by
+            default.  Requires Python 3.7+ on a POSIX system: elsewhere the
+            plugin refuses to start with a ValueError.
+        result_cache (:obj:`bool`): Collectors only.  Keep the collected
+            metrics for `cache_ttl` and answer the requests for the same
+            metrics (namespace and config) meanwhile from the cache, see
+            :py:class:`~snap_plugin.v1.result_cache.ResultCache`.  The ttl is
+            read like Snap does, in nanoseconds, and defaults to 500ms.
+        result_cache_size (:obj:`int`): The number of requested metrics
+            whose results are cached.
     """
     def __init__(self,
                  type,
@@ -287,10 +375,22 @@ class Meta(object):
                  rpc_version=1,
                  root_cert_paths=None,
                  server_cert_path=None,
-                 private_key_path=None):
+                 private_key_path=None,
+                 reply_timestamp=False,
+                 apply_config_policy=False,
+                 catalog_cache_ttl=None,
+                 catalog_cache_size=16,
+                 catalog_cache_path=None,
+                 worker_count=None,
+                 maximum_concurrent_rpcs=None,
+                 grpc_options=None,
+                 process_workers=None,
+                 result_cache=False,
+                 result_cache_size=4096):
         self.name = name
         self.version = version
         setattr(sys.modules["snap_plugin.v1"], "PLUGIN_VERSION", version)
+        _set_plugin_version(version)
         self.type = type
         self.concurrency_count = concurrency_count
         self.routing_strategy = routing_strategy
@@ -302,6 +402,17 @@ class Meta(object):
         self.root_cert_paths = root_cert_paths.split(":") if root_cert_paths is not None else None
         self.server_cert_path = server_cert_path
         self.private_key_path = private_key_path
+        self.reply_timestamp = reply_timestamp
+        self.apply_config_policy = apply_config_policy
+        self.catalog_cache_ttl = catalog_cache_ttl
+        self.catalog_cache_size = catalog_cache_size
+        self.catalog_cache_path = catalog_cache_path
+        self.worker_count = worker_count
+        self.maximum_concurrent_rpcs = maximum_concurrent_rpcs
+        self.grpc_options = grpc_options
+        self.process_workers = process_workers
+        self.result_cache = result_cache
+        self.result_cache_size = result_cache_size
         self.cipher_suites = ["ECDHE-RSA-AES128-GCM-SHA256", "ECDHE-RSA-AES256-GCM-SHA386"]
 
 
@@ -315,10 +426,21 @@ class Plugin(object):
     :py:class:`snap_plugin.v1.publisher.Publisher`.
     """
 
+    # whether the requests may be handled by worker processes
+    # (:py:attr:`Meta.process_workers`)
+    _process_pool_supported = False
+
     def __init__(self):
         self.meta = None
         self.proxy = None
-        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        # the gRPC server is created when the plugin starts, once the
+        # command line flags are known
+        self.server = None
+        self._control = None
+        self._slots = None
+        self._process_pool = None
+        self._stop_expiry = threading.Event()
+        self.ping_stats = PingStats()
         self._port = 0
         self._last_ping = time.time()
         self._shutting_down = False
@@ -327,6 +449,7 @@ class Plugin(object):
         self._config = {}
         self._flags = _Flags()
         self.standalone_server = None
+        self.resources = ResourceCache()
 
         # init argparse module and add arguments
         self._parser = argparse.ArgumentParser(description="%(prog)s - a Snap framework plugin.",
@@ -345,6 +468,11 @@ class Plugin(object):
             Flag("root-cert-paths", FlagType.value, "paths to root certificate; delimited by ':'", json_name="RootCertPaths"),
             Flag("key-path", FlagType.value, "path to server private key", json_name="KeyPath"),
             Flag("cert-path", FlagType.value, "path to server certificate", json_name="CertPath"),
+            Flag("worker-count", FlagType.value, "number of gRPC worker threads", json_name="WorkerCount"),
+            Flag("max-concurrent-rpcs", FlagType.value, "maximum number of concurrent gRPC requests",
+                 json_name="MaxConcurrentRPCs"),
+            Flag("grpc-options", FlagType.value, "gRPC server options as a JSON object", json_name="GRPCOptions"),
+            Flag("process-workers", FlagType.value, "number of worker processes", json_name="ProcessWorkers"),
         ]
         self._flags.add_multiple(flags)
 
@@ -356,13 +484,30 @@ class Plugin(object):
         """
         self._last_ping = time.time()
 
+    def init_worker(self):
+        """Prepares a worker process of the plugin.
+
+        Called in every process forked when :py:attr:`Meta.process_workers`
+        is set, before it handles any request.  Plugins may override it to
+        open connections or load data each process needs of its own.
+        """
+        pass
+
     def stop_plugin(self):
         """Stops the plugin"""
         LOG.debug("plugin stopping")
         self._shutting_down = True
-        _stop_event = self.server.stop(0)
-        while not _stop_event.is_set():
-            time.sleep(.1)
+        if self.server is not None:
+            _stop_event = self.server.stop(0)
+            while not _stop_event.is_set():
+                time.sleep(.1)
+        if self._control is not None:
+            # the Kill request stopping the plugin runs on this executor
+            self._control.shutdown(wait=False)
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+        self._stop_expiry.set()
+        self.resources.clear()
         LOG.debug("plugin stopped")
 
     def start_plugin(self):
@@ -424,7 +569,104 @@ class Plugin(object):
             sys.stdout.write("At the time being, plugin diagnostic is supported only by Collector plugins.")
             sys.stdout.flush()
 
+    @abstractmethod
+    def _add_servicer(self, server):
+        """Registers the plugin proxy with the gRPC server, the control
+        requests being served by `self._control` and the others limited by
+        `self._slots`"""
+        pass
+
+    def _server_settings(self):
+        """Returns the worker count, the maximum concurrent RPCs and the gRPC
+        options, the command line flags overriding the plugin meta"""
+        workers = self._config.get("WorkerCount", self.meta.worker_count)
+        if workers is None:
+            workers = self.meta.concurrency_count
+        max_rpcs = self._config.get("MaxConcurrentRPCs",
+                                    self.meta.maximum_concurrent_rpcs)
+        options = self._config.get("GRPCOptions", self.meta.grpc_options)
+        if isinstance(options, basestring):
+            options = json.loads(options)
+        if isinstance(options, dict):
+            options = list(options.items())
+        return (int(workers),
+                int(max_rpcs) if max_rpcs is not None else None,
+                [tuple(option) for option in options or ()])
+
+    def _reserve_control(self, max_rpcs):
+        """Returns the gRPC server's `maximum_concurrent_rpcs`.
+
+        gRPC counts the control requests too, and rejected pings get the
+        plugin killed by Snap.  The plugin requests are limited to `max_rpcs`
+        by `self._slots` and the server accepts as many more requests as
+        there are control threads.
+        """
+        if max_rpcs is None:
+            self._slots = None
+            return None
+        self._slots = _Slots(max_rpcs)
+        return max_rpcs + _CONTROL_WORKERS
+
+    def _start_process_pool(self):
+        workers = self._config.get("ProcessWorkers",
+                                   self.meta.process_workers)
+        if not workers or not self._process_pool_supported:
+            return
+        # the workers are forked and ProcessPoolExecutor takes an
+        # initializer from Python 3.7 on
+        if sys.version_info < (3, 7) or os.name != "posix":
+            raise ValueError(
+                "process_workers requires Python 3.7+ on a POSIX system.  "
+                "(running Python {} on {})".format(platform.python_version(),
+                                                  platform.system()))
+        from .process_pool import _ProcessPool
+        self._process_pool = _ProcessPool(self, int(workers))
+
+    def _create_server(self):
+        # the worker processes are forked before gRPC starts any thread
+        self._start_process_pool()
+        workers, max_rpcs, options = self._server_settings()
+        max_rpcs = self._reserve_control(max_rpcs)
+        # pings have threads of their own so that busy workers don't delay
+        # them until the plugin is considered hung
+        self._control = _ControlExecutor(max_workers=_CONTROL_WORKERS)
+        if not _per_method_pools():
+            LOG.warning("grpcio {} serves every request on the worker "
+                        "threads: pings may wait behind slow requests, "
+                        "upgrade grpcio to serve them on threads of their "
+                        "own".format(grpc.__version__))
+            workers += _CONTROL_WORKERS
+        LOG.debug("gRPC server: {} workers, {} concurrent RPCs, options {}"
+                  .format(workers, max_rpcs, options))
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers),
+                             options=options,
+                             maximum_concurrent_rpcs=max_rpcs)
+        self._add_servicer(server)
+        return server
+
+    def _expire(self):
+        """Drops the cached state unused for longer than its ttl (the
+        resources of :py:attr:`resources`)"""
+        self.resources.expire()
+
+    def _start_expiry(self):
+        """Calls :py:meth:`_expire` periodically on a thread of its own, so
+        that closing resources doesn't delay the requests (pings above
+        all)"""
+        def _run():
+            while not self._stop_expiry.wait(_EXPIRY_INTERVAL):
+                try:
+                    self._expire()
+                except Exception:
+                    LOG.exception("failed to expire the cached state")
+        thread = threading.Thread(target=_run, name="snap-plugin-expiry")
+        thread.daemon = True
+        thread.start()
+
     def _generate_preamble_and_serve(self):
+        if self.server is None:
+            self.server = self._create_server()
+            self._start_expiry()
         if self._config.get("TLSEnabled", False) == True:
             try:
                 self._tls_setup()
@@ -668,27 +910,24 @@ class Plugin(object):
             sys.stdout.write("Printing metric catalog took {}\n\n".format(print_timer.elapsed()))
             sys.stdout.flush()
 
-            # apply config to metrics for collection
+            # apply config to metrics for collection, the defaults matching
+            # each metric's namespace fill in missing config entries.  The
+            # policy writes into the protobufs, so the metrics are wrapped
+            # again afterwards (a ConfigMap wouldn't see the defaults).
+            compiled = cpolicy.compile()
+            configured = []
             for metric in metrics:
-                metric_config = self._config.copy()
-                # search for default values matching metric's namespace
-                for (ns, default) in defaults:
-                    match = True
-                    for i in range(len(ns)):
-                        if ns[i] != metric.namespace[i].value:
-                            match = False
-                            break
-                    # apply default value if no config entry is present
-                    if match and default[0] not in metric_config:
-                        metric_config[default[0]] = default[1]
-
-                metric.config = metric_config
+                pb = metric.pb
+                ConfigMap(pb=pb.Config, **self._config)
+                compiled.apply(pb.Config, [nse.Value for nse in pb.Namespace])
+                configured.append(Metric(pb=pb))
+            metrics = configured
 
             # collected metrics
             with print_timer:
                 sys.stdout.write("Metrics that can be collected right now are:\n")
                 metrics_table = []
-                metrics = self.collect(metrics)
+                metrics = self._collect_now(metrics)
                 for metric in metrics:
                     metrics_table.append([metric.namespace, metric.data_type, metric.data])
 
@@ -709,6 +948,10 @@ class Plugin(object):
         sys.stdout.write("Printing diagnostic took {}\n\n".format(diagnostics_timer.elapsed()))
         sys.stdout.flush()
 
+    def _collect_now(self, metrics):
+        """Collects metrics outside of a request (diagnostics)"""
+        return self.collect(metrics)
+
     def _parse_policy_namespaces(self, policy, key_type):
         """Returns list of keys with their info from all namespaces present in a given policy"""
         entries = []
@@ -734,6 +977,16 @@ class Plugin(object):
 
         return entries, required_configs_missing, defaults
 
+    def invalidate_config_policy(self):
+        """Makes the next request for the config policy rebuild it.
+
+        The library calls :py:meth:`get_config_policy` once and reuses the
+        result.  A plugin whose policy changes at runtime calls this method
+        after the change.
+        """
+        if self.proxy is not None:
+            self.proxy.invalidate_config_policy()
+
     @abstractmethod
     def get_config_policy(self):
         """Returns the config policy for a plugin.
@@ -748,6 +1001,9 @@ class Plugin(object):
         Returns:
             :py:class:`snap_plugin.v1.config_policy.ConfigPolicy`
 
+        Note:
+            The policy is built once, see
+            :py:meth:`invalidate_config_policy`.
         """
         return GetConfigPolicyReply()
 
@@ -18,8 +18,12 @@
 
 import logging
 import traceback
+from timeit import default_timer as timer
 
+from .deadline import _from_context, _request_deadline
 from .plugin_pb2 import ErrReply, GetConfigPolicyReply
+from .servicers import _queued_at
+from .timestamp import _reply_timestamp, _time_ns
 
 LOG = logging.getLogger(__name__)
 
@@ -29,10 +33,58 @@ class PluginProxy(object):
 
     def __init__(self, plugin):
         self.plugin = plugin
+        self._compiled_policy = None
+        self._policy_reply = None
+
+    def _reply_timestamp(self):
+        """Returns the context in which the metrics of a reply are built.
+
+        With :py:attr:`Meta.reply_timestamp` set the metrics created in it
+        without a timestamp share the time the request arrived.
+        """
+        meta = self.plugin.meta
+        if meta is not None and meta.reply_timestamp:
+            return _reply_timestamp(_time_ns())
+        return _reply_timestamp(None)
+
+    def _deadline(self, context):
+        """Returns the context in which the request is handled by the plugin,
+        :py:meth:`Deadline.current` being the deadline of the gRPC request"""
+        return _request_deadline(_from_context(context))
+
+    def _config_policy(self):
+        """Returns the compiled config policy to apply to requests, or None.
+
+        The policy is only applied with :py:attr:`Meta.apply_config_policy`
+        set.  It's compiled on the first request.
+        """
+        meta = self.plugin.meta
+        if meta is None or not meta.apply_config_policy:
+            return None
+        if self._compiled_policy is None:
+            self._compiled_policy = self.plugin.get_config_policy().compile()
+        return self._compiled_policy
+
+    def _apply_config_policy(self, config):
+        """Applies the config policy to the config of a request.
+
+        Raises:
+            ValueError: the config doesn't comply with the policy
+        """
+        policy = self._config_policy()
+        if policy is not None:
+            problems = policy.apply(config)
+            if problems:
+                raise ValueError("Invalid config: {}".format(
+                    "; ".join(problems)))
 
     def Ping(self, request, context):
         """Responds to ping request"""
+        queued = _queued_at()
+        if queued is None:
+            queued = timer()
         self.plugin.ping()
+        self.plugin.ping_stats.add(timer() - queued)
         return ErrReply()
 
     def Kill(self, request, context):
@@ -41,11 +93,25 @@ class PluginProxy(object):
         return ErrReply()
 
     def GetConfigPolicy(self, request, context):
-        """Dispatches the request to the plugins get_config_policy method"""
+        """Dispatches the request to the plugins get_config_policy method
+
+        The serialized reply is kept and returned to the following requests
+        until :py:meth:`invalidate_config_policy` is called.
+        """
+        reply = self._policy_reply
+        if reply is not None:
+            return reply
         try:
             policy = self.plugin.get_config_policy()
-            return policy._pb
+            reply = policy._pb.SerializeToString()
         except Exception as err:
             msg = "message: {}\n\nstack trace: {}".format(
-                err.message, traceback.format_exc())
+                err, traceback.format_exc())
             return GetConfigPolicyReply(error=msg)
+        self._policy_reply = reply
+        return reply
+
+    def invalidate_config_policy(self):
+        """Drops the cached config policy and its compiled form"""
+        self._policy_reply = None
+        self._compiled_policy = None
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs collect and process requests in worker processes (Python 3.7+).
+
+The workers are forked from the plugin before its gRPC server starts, so
+they hold a copy of the plugin and nothing but the serialized request and
+reply crosses the process boundary.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+
+from .plugin_pb2 import MetricsArg, MetricsReply, PubProcArg
+
+LOG = logging.getLogger(__name__)
+
+# the request type of the proxy methods run by the workers (collections
+# skip the result cache, which is the parent's)
+_REQUESTS = {
+    "_collect_metrics": MetricsArg,
+    "Process": PubProcArg,
+}
+
+# the plugin served by this worker process
+_plugin = None
+
+
+class _ProcessPool(object):
+    """Pool of forked processes running the requests of `plugin`"""
+
+    def __init__(self, plugin, workers):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise ValueError("Worker processes require fork, which isn't "
+                             "available on this platform")
+        self._plugin = plugin
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        executor = futures.ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker, initargs=(self._plugin,))
+        # fork every worker now rather than on the first requests
+        for future in [executor.submit(os.getpid)
+                       for _ in range(self._workers)]:
+            future.result()
+        LOG.debug("started {} worker processes".format(self._workers))
+        return executor
+
+    def call(self, method, request, context=None):
+        """Runs the proxy `method` on `request` in a worker process.
+
+        The deadline of the gRPC `context`, if any, is passed on to the
+        worker.
+
+        Returns:
+            :obj:`bytes`: the serialized reply
+        """
+        deadline = None
+        if context is not None:
+            remaining = context.time_remaining()
+            if remaining is not None:
+                # the processes share the wall clock, not the monotonic one
+                deadline = time.time() + remaining
+        executor = self._executor
+        try:
+            return executor.submit(_call, method, request.SerializeToString(),
+                                   deadline).result()
+        except BrokenProcessPool as err:
+            # a worker died, likely while serving this request
+            self._restart(executor)
+            msg = "message: worker process failed: {}\n\nstack trace: {}" \
+                .format(err, traceback.format_exc())
+            return MetricsReply(metrics=[], error=msg)
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                # another request restarted the pool already
+                return
+            LOG.warning("a worker process died, restarting the pool")
+            broken.shutdown(wait=False)
+            self._executor = self._start()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def _init_worker(plugin):
+    global _plugin
+    _plugin = plugin
+    # the requests are served here, not sent to another pool
+    plugin._process_pool = None
+    plugin.init_worker()
+
+
+class _Context(object):
+    """The part of grpc.ServicerContext read by the proxy in a worker"""
+
+    def __init__(self, deadline):
+        self._deadline = deadline
+
+    def time_remaining(self):
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.time(), 0.0)
+
+
+def _call(method, request, deadline):
+    reply = getattr(_plugin.proxy, method)(
+        _REQUESTS[method].FromString(request), _Context(deadline))
+    if isinstance(reply, bytes):
+        return reply
+    return reply.SerializeToString()
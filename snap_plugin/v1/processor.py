@@ -22,7 +22,7 @@ from abc import ABCMeta, abstractmethod
 import six
 
 from .plugin import Meta, Plugin, PluginType
-from .plugin_pb2 import add_ProcessorServicer_to_server
+from .servicers import add_ProcessorServicer_to_server
 from .processor_proxy import _ProcessorProxy
 
 LOG = logging.getLogger(__name__)
@@ -41,11 +41,16 @@ class Processor(Plugin):
         - :py:meth:`~snap_plugin.v1.plugin.Plugin.get_config_policy`
     """
 
+    _process_pool_supported = True
+
     def __init__(self, name, version, **kwargs):
         super(Processor, self).__init__()
         self.meta = Meta(PluginType.processor, name, version, **kwargs)
         self.proxy = _ProcessorProxy(self)
-        add_ProcessorServicer_to_server(self.proxy, self.server)
+
+    def _add_servicer(self, server):
+        add_ProcessorServicer_to_server(self.proxy, server, self._control,
+                                        self._slots)
 
     @abstractmethod
     def process(self, metrics, config):
@@ -65,6 +70,9 @@ class Processor(Plugin):
 
         Returns:
             :obj:`list` of :obj:`snap_plugin.v1.Metric`:
-                List of processed metrics.
+                List of processed metrics.  The list may also hold
+                :obj:`snap_plugin.v1.MetricBatch` and
+                :obj:`snap_plugin.v1.MetricRow` items, which are encoded
+                straight into the serialized reply.
         """
         pass
@@ -20,7 +20,8 @@ import logging
 import traceback
 
 from .config_map import ConfigMap
-from .metric import Metric
+from .encoder import _metrics_reply
+from .metric_list import MetricList
 from .plugin_pb2 import MetricsReply
 from .plugin_proxy import PluginProxy
 
@@ -36,12 +37,17 @@ class _ProcessorProxy(PluginProxy):
     def Process(self, request, context):
         """Dispatches the request to the plugins process method"""
         LOG.debug("Process called")
+        pool = self.plugin._process_pool
+        if pool is not None:
+            return pool.call("Process", request, context)
         try:
-            metrics = self.plugin.process(
-                [Metric(pb=m) for m in request.Metrics],
-                ConfigMap(pb=request.Config)
-            )
-            return MetricsReply(metrics=[m.pb for m in metrics])
+            self._apply_config_policy(request.Config)
+            with self._reply_timestamp(), self._deadline(context):
+                metrics = self.plugin.process(
+                    MetricList(request.Metrics),
+                    ConfigMap(pb=request.Config)
+                )
+                return _metrics_reply(metrics)
         except Exception as err:
             msg = "message: {}\n\nstack trace: {}".format(
                 err, traceback.format_exc())
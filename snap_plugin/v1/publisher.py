@@ -22,7 +22,7 @@ from abc import ABCMeta, abstractmethod
 import six
 
 from .plugin import Meta, Plugin, PluginType
-from .plugin_pb2 import add_PublisherServicer_to_server
+from .servicers import add_PublisherServicer_to_server
 from .publisher_proxy import PublisherProxy
 
 LOG = logging.getLogger(__name__)
@@ -45,7 +45,10 @@ class Publisher(Plugin):
         super(Publisher, self).__init__()
         self.meta = Meta(PluginType.publisher, name, version, **kwargs)
         self.proxy = PublisherProxy(self)
-        add_PublisherServicer_to_server(self.proxy, self.server)
+
+    def _add_servicer(self, server):
+        add_PublisherServicer_to_server(self.proxy, server, self._control,
+                                        self._slots)
 
     @abstractmethod
     def publish(self, metrics, config):
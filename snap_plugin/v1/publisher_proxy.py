@@ -20,7 +20,7 @@ import traceback
 
 from .plugin_pb2 import ErrReply
 from .config_map import ConfigMap
-from .metric import Metric
+from .metric_list import MetricList
 from .plugin_proxy import PluginProxy
 
 LOG = logging.getLogger(__name__)
@@ -36,8 +36,9 @@ class PublisherProxy(PluginProxy):
         """Dispatches the request to the plugins publish method"""
         LOG.debug("Publish called")
         try:
+            self._apply_config_policy(request.Config)
             self.plugin.publish(
-                [Metric(pb=m) for m in request.Metrics],
+                MetricList(request.Metrics),
                 ConfigMap(pb=request.Config)
             )
             return ErrReply()
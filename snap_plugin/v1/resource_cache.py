@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+from timeit import default_timer as _now
+
+from .config_map import ConfigMap, FrozenConfigMap
+from .lru import _LRU, _LRUCache
+
+LOG = logging.getLogger(__name__)
+
+# the get result of a config without resource (resources may be None)
+_MISSING = object()
+
+
+class ResourceCache(_LRUCache):
+    """ResourceCache holds expensive per config resources of a plugin.
+
+    Sockets, open files or parsed credentials are created once per task
+    config and reused by the following requests.  Entries are keyed by the
+    frozen config (see
+    :py:class:`~snap_plugin.v1.config_map.FrozenConfigMap`), the least
+    recently used entry is closed when the cache is full and entries unused
+    for `ttl` seconds are closed when they are next looked up or by the
+    plugin's expiry thread, every 1.5 seconds.
+
+    Every plugin has a cache, :py:attr:`Plugin.resources`, which is drained
+    when the plugin stops.  It can be replaced by one with other settings in
+    the plugin's constructor.
+
+    Args:
+        max_size (:obj:`int`): the number of resources kept
+        ttl (:obj:`float`): seconds after which an unused resource is closed,
+            None keeps resources until they are evicted
+        close (callable): called with a resource when it leaves the cache.  By
+            default the `close` method of the resource, if any, is called.
+
+    Example:
+    ::
+        def collect(self, metrics):
+            for config, group in metrics.by_config():
+                conn = self.resources.get(
+                    config, lambda cfg: connect(cfg["host"], cfg["port"]))
+                ...
+    """
+
+    def __init__(self, max_size=128, ttl=None, close=None):
+        # frozen config -> resource, aging from its last use
+        self._lru = _LRU(max_size, ttl, idle=True)
+        self._close = close
+        self._lock = threading.Lock()
+
+    def __contains__(self, config):
+        return _freeze(config) in self._lru
+
+    def get(self, config, factory):
+        """Returns the resource of `config`, creating it if needed.
+
+        Args:
+            config: a :py:class:`~snap_plugin.v1.config_map.ConfigMap`,
+                :py:class:`~snap_plugin.v1.config_map.FrozenConfigMap` or
+                :obj:`dict`
+            factory (callable): called with the
+                :py:class:`~snap_plugin.v1.config_map.FrozenConfigMap` to
+                create the resource when it isn't cached
+
+        Returns:
+            the resource
+        """
+        config = _freeze(config)
+        with self._lock:
+            resource = self._lru.get(config, _now(), _MISSING)
+        if resource is not _MISSING:
+            return resource
+        # the factory may be slow, other configs are served meanwhile
+        resource = factory(config)
+        with self._lock:
+            now = _now()
+            existing = self._lru.peek(config, now, _MISSING)
+            if existing is not _MISSING:
+                # another thread created it first
+                dropped, resource = [resource], existing
+            else:
+                # the expired resource of the config, if any, is replaced
+                dropped = self._lru.put(config, resource, now)
+        for item in dropped:
+            self._close_resource(item)
+        return resource
+
+    def pop(self, config):
+        """Closes and removes the resource of `config`, if any.
+
+        Returns:
+            bool: True if a resource was removed
+        """
+        with self._lock:
+            resource = self._lru.pop(_freeze(config), _MISSING)
+        if resource is _MISSING:
+            return False
+        self._close_resource(resource)
+        return True
+
+    def expire(self):
+        """Closes the resources unused for longer than the ttl.
+
+        Returns:
+            :obj:`int`: the number of resources closed
+        """
+        with self._lock:
+            expired = self._lru.expire(_now())
+        for resource in expired:
+            self._close_resource(resource)
+        return len(expired)
+
+    def clear(self):
+        """Closes and removes every resource."""
+        with self._lock:
+            resources = self._lru.clear()
+        for resource in resources:
+            self._close_resource(resource)
+
+    def _close_resource(self, resource):
+        try:
+            if self._close is not None:
+                self._close(resource)
+            elif hasattr(resource, "close"):
+                resource.close()
+        except Exception:
+            LOG.exception("failed to close the resource %r", resource)
+
+
+def _freeze(config):
+    if isinstance(config, FrozenConfigMap):
+        return config
+    if isinstance(config, ConfigMap):
+        return config.freeze()
+    return FrozenConfigMap(*config.items())
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from timeit import default_timer as _now
+
+from .config_map import _config_key
+from .encoder import _METRICS_KEY, _delimited
+from .lru import _LRU, _LRUCache
+from .namespace_router import WILDCARD
+from .plugin_pb2 import MetricsArg, MetricsReply
+
+# Snap's default cache TTL, in seconds
+_DEFAULT_TTL = .5
+
+
+class ResultCache(_LRUCache):
+    """ResultCache keeps the metrics collected by a collector.
+
+    The metrics returned for a requested metric are kept for `ttl` seconds,
+    keyed by its namespace and config, so that the tasks requesting the same
+    metrics meanwhile are answered without calling
+    :py:meth:`~snap_plugin.v1.collector.Collector.collect` again.  Only the
+    metrics missing from the cache are passed to `collect`; requested metrics
+    for which it returned nothing aren't cached.  The metrics are
+    kept serialized: every reply gets its own copy and the timestamps of the
+    original collection.
+
+    Collectors get a cache when :py:attr:`Meta.result_cache` is set, its ttl
+    being :py:attr:`Meta.cache_ttl`.
+
+    Args:
+        ttl (:obj:`float`): seconds a collected value is reused for
+        max_size (:obj:`int`): the number of requested metrics kept, the least
+            recently used are dropped first
+    """
+
+    def __init__(self, ttl, max_size=4096):
+        # (namespace, config) -> serialized metrics, aging from their
+        # collection
+        self._lru = _LRU(max_size, ttl)
+        self._lock = threading.Lock()
+
+    def lookup(self, metrics):
+        """Finds the cached results of the requested metrics.
+
+        Args:
+            metrics (:obj:`list` of
+                :py:class:`snap_plugin.v1.plugin_pb2.Metric`): the requested
+                metrics
+
+        Returns:
+            (:obj:`list`, :obj:`list`): the cached results of the requested
+                metrics (None when not cached) and the requested metrics to
+                collect
+        """
+        keys = [_key(pb) for pb in metrics]
+        cached = []
+        misses = []
+        missed = set()
+        with self._lock:
+            now = _now()
+            for key, pb in zip(keys, metrics):
+                result = self._lru.get(key, now)
+                cached.append(result)
+                if result is None and key not in missed:
+                    missed.add(key)
+                    misses.append(pb)
+        return cached, misses
+
+    def merge(self, metrics, cached, reply):
+        """Caches the reply to the collection of the missing metrics and
+        returns the reply to the request.
+
+        Args:
+            metrics (:obj:`list` of
+                :py:class:`snap_plugin.v1.plugin_pb2.Metric`): the requested
+                metrics
+            cached (:obj:`list`): the results returned by :py:meth:`lookup`
+            reply: the reply to the metrics to collect, a
+                :py:class:`snap_plugin.v1.plugin_pb2.MetricsReply` or its
+                serialization; None when every metric was cached
+
+        Returns:
+            :obj:`bytes`: the serialized reply, or `reply` if it's an error
+        """
+        results = {}
+        extra = []
+        if reply is not None:
+            if isinstance(reply, bytes):
+                reply = MetricsReply.FromString(reply)
+            if reply.error:
+                return reply
+            misses = [pb for pb, result in zip(metrics, cached)
+                      if result is None]
+            results, extra = _attribute(misses, reply.metrics)
+            now = _now()
+            with self._lock:
+                for key, result in results.items():
+                    self._lru.put(key, result, now)
+        out = []
+        for pb, result in zip(metrics, cached):
+            out.append(result if result is not None
+                       else results.get(_key(pb), b""))
+        out.extend(extra)
+        return b"".join(out)
+
+    def expire(self):
+        """Drops the results older than the ttl.
+
+        Returns:
+            :obj:`int`: the number of results dropped
+        """
+        with self._lock:
+            return len(self._lru.expire(_now()))
+
+    def clear(self):
+        """Drops every result"""
+        with self._lock:
+            self._lru.clear()
+
+
+def _key(pb):
+    return tuple(nse.Value for nse in pb.Namespace), _config_key(pb.Config)
+
+
+def _attribute(requested, collected):
+    """Assigns the collected metrics to the requested metrics they answer.
+
+    A collected metric answers the requested metric with the same namespace
+    and config, else the first one with its namespace, "*" elements matching
+    any value (dynamic elements).
+
+    Returns:
+        (:obj:`dict`, :obj:`list`): the serialized metrics of each requested
+            metric key which got any and those answering no requested metric
+    """
+    by_key = {}
+    by_namespace = {}
+    dynamic = []
+    for pb in requested:
+        key = _key(pb)
+        by_key[key] = key
+        by_namespace.setdefault(key[0], key)
+        if WILDCARD in key[0]:
+            dynamic.append(key)
+    parts = dict((key, []) for key in by_key)
+    extra = []
+    for pb in collected:
+        namespace = tuple(nse.Value for nse in pb.Namespace)
+        key = by_key.get((namespace, _config_key(pb.Config)))
+        if key is None:
+            key = by_namespace.get(namespace)
+        if key is None:
+            key = _match(dynamic, namespace)
+        entry = _delimited(_METRICS_KEY, pb.SerializeToString())
+        if key is None:
+            extra.append(entry)
+        else:
+            parts[key].append(entry)
+    # a requested metric left out of the reply (e.g. its group missed the
+    # deadline) isn't cached as having no metrics
+    return dict((key, b"".join(entries)) for key, entries in parts.items()
+                if entries), extra
+
+
+def _match(dynamic, namespace):
+    for key in dynamic:
+        pattern = key[0]
+        if len(pattern) == len(namespace) and all(
+                p == WILDCARD or p == v for p, v in zip(pattern, namespace)):
+            return key
+    return None
+
+
+def _miss_request(misses):
+    """Returns the request for the metrics missing from the cache"""
+    return MetricsArg(metrics=misses)
+
+
+def _result_cache(meta):
+    """Returns the result cache configured by `meta`, or None"""
+    if not meta.result_cache:
+        return None
+    ttl = _DEFAULT_TTL
+    if meta.cache_ttl is not None:
+        # Snap reads the cache TTL as a Go time.Duration, in nanoseconds
+        ttl = meta.cache_ttl / 1e9
+    return ResultCache(ttl, meta.result_cache_size)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Registers the plugin proxies with a gRPC server.
+
+These mirror the ``add_*Servicer_to_server`` functions generated in
+:py:mod:`snap_plugin.v1.plugin_pb2` except for the response serializers:
+a proxy method may return a reply which is already serialized (see
+:py:mod:`snap_plugin.v1.encoder`) and those bytes are sent untouched, and
+the control requests (Ping, Kill and GetConfigPolicy) can be served by their
+own executor so that they aren't queued behind slow collects.
+"""
+
+import inspect
+import threading
+from concurrent import futures
+from timeit import default_timer as timer
+
+import grpc
+
+from .plugin_pb2 import (CollectArg, CollectReply, Empty, ErrReply,
+                         GetConfigPolicyReply, GetMetricTypesArg, KillArg,
+                         MetricsArg, MetricsReply, PubProcArg)
+
+
+def _serializer(message_type):
+    """Returns a response serializer which passes serialized replies through"""
+    serialize = message_type.SerializeToString
+
+    def _serialize(reply):
+        if isinstance(reply, bytes):
+            return reply
+        return serialize(reply)
+    return _serialize
+
+
+# the time the control request run by the current thread was queued
+_lane = threading.local()
+
+
+class _ControlExecutor(futures.ThreadPoolExecutor):
+    """Executor of the control requests, remembers when they were queued"""
+
+    def submit(self, fn, *args, **kwargs):
+        return super(_ControlExecutor, self).submit(
+            _run_queued, timer(), fn, args, kwargs)
+
+
+def _run_queued(queued, fn, args, kwargs):
+    _lane.queued = queued
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _lane.queued = None
+
+
+def _queued_at():
+    """Returns when the control request being handled was queued, or None"""
+    return getattr(_lane, "queued", None)
+
+
+def _per_method_pools():
+    """Tells whether this gRPC release honors `experimental_thread_pool`.
+
+    Older releases ignore the attribute silently and serve the control
+    requests on the server pool, behind the collects.
+    """
+    try:
+        from grpc import _server
+    except ImportError:
+        return False
+    return hasattr(_server, "_select_thread_pool_for_behavior")
+
+
+def _on(executor, method):
+    """Returns `method` to be run by `executor` rather than the server pool.
+
+    gRPC runs a method on the executor found in its
+    `experimental_thread_pool` attribute (see :py:func:`_per_method_pools`).
+    """
+    if executor is None:
+        return method
+
+    def _method(request, context):
+        return method(request, context)
+    _method.experimental_thread_pool = executor
+    return _method
+
+
+class _Slots(object):
+    """Caps the plugin requests (collect, process, publish...) served at once.
+
+    gRPC's `maximum_concurrent_rpcs` counts every request, so the server
+    limit leaves room for the control requests on top of the slots: a
+    plugin saturated with collects still answers pings.
+    """
+
+    def __init__(self, count):
+        self._semaphore = threading.Semaphore(count)
+
+    def acquire(self):
+        """Takes a slot, returns False if none is free"""
+        return self._semaphore.acquire(False)
+
+    def release(self):
+        self._semaphore.release()
+
+
+# the details gRPC gives requests over maximum_concurrent_rpcs
+_EXHAUSTED = "Concurrent RPC limit exceeded"
+
+
+def _reject(context):
+    context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+    context.set_details(_EXHAUSTED)
+
+
+def _is_async(method):
+    """Tells whether `method` is a coroutine or an async generator"""
+    return any(getattr(inspect, check, lambda _: False)(method)
+               for check in ("iscoroutinefunction", "isasyncgenfunction"))
+
+
+def _limited(slots, method):
+    """Returns `method` rejecting the requests once `slots` are taken"""
+    if slots is None:
+        return method
+    if _is_async(method):
+        from .aio import _limited_async
+        return _limited_async(slots, method)
+    if inspect.isgeneratorfunction(method):
+        def _stream(request_iterator, context):
+            if not slots.acquire():
+                _reject(context)
+                return
+            try:
+                for reply in method(request_iterator, context):
+                    yield reply
+            finally:
+                slots.release()
+        return _stream
+
+    def _method(request, context):
+        if not slots.acquire():
+            _reject(context)
+            return None
+        try:
+            return method(request, context)
+        finally:
+            slots.release()
+    return _method
+
+
+def _unary(method, request_type, reply_type):
+    return grpc.unary_unary_rpc_method_handler(
+        method,
+        request_deserializer=request_type.FromString,
+        response_serializer=_serializer(reply_type),
+    )
+
+
+def _add_handlers(server, service, servicer, control, handlers):
+    handlers.update({
+        'Ping': _unary(_on(control, servicer.Ping), Empty, ErrReply),
+        'Kill': _unary(_on(control, servicer.Kill), KillArg, ErrReply),
+        'GetConfigPolicy': _unary(_on(control, servicer.GetConfigPolicy),
+                                  Empty, GetConfigPolicyReply),
+    })
+    generic_handler = grpc.method_handlers_generic_handler(service, handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+
+
+def add_CollectorServicer_to_server(servicer, server, control=None,
+                                    slots=None):
+    _add_handlers(server, 'rpc.Collector', servicer, control, {
+        'CollectMetrics': _unary(_limited(slots, servicer.CollectMetrics),
+                                 MetricsArg, MetricsReply),
+        'GetMetricTypes': _unary(_limited(slots, servicer.GetMetricTypes),
+                                 GetMetricTypesArg, MetricsReply),
+    })
+
+
+def add_ProcessorServicer_to_server(servicer, server, control=None,
+                                    slots=None):
+    _add_handlers(server, 'rpc.Processor', servicer, control, {
+        'Process': _unary(_limited(slots, servicer.Process), PubProcArg,
+                          MetricsReply),
+    })
+
+
+def add_PublisherServicer_to_server(servicer, server, control=None,
+                                    slots=None):
+    _add_handlers(server, 'rpc.Publisher', servicer, control, {
+        'Publish': _unary(_limited(slots, servicer.Publish), PubProcArg,
+                          ErrReply),
+    })
+
+
+def add_StreamCollectorServicer_to_server(servicer, server, control=None,
+                                          slots=None):
+    _add_handlers(server, 'rpc.StreamCollector', servicer, control, {
+        'StreamMetrics': grpc.stream_stream_rpc_method_handler(
+            _limited(slots, servicer.StreamMetrics),
+            request_deserializer=CollectArg.FromString,
+            response_serializer=_serializer(CollectReply),
+        ),
+        'GetMetricTypes': _unary(_limited(slots, servicer.GetMetricTypes),
+                                 GetMetricTypesArg, MetricsReply),
+    })
@@ -21,9 +21,10 @@ from abc import ABCMeta, abstractmethod
 
 import six
 
+from .catalog_cache import _catalog_cache
 from .stream_collector_proxy import _StreamCollectorProxy
 from .plugin import Meta, Plugin, PluginType, RPCType
-from .plugin_pb2 import add_StreamCollectorServicer_to_server
+from .servicers import add_StreamCollectorServicer_to_server
 
 LOG = logging.getLogger(__name__)
 
@@ -45,8 +46,12 @@ class StreamCollector(Plugin):
     def __init__(self, name, version, **kwargs):
         super(StreamCollector, self).__init__()
         self.meta = Meta(PluginType.stream_collector, name, version, rpc_type=RPCType.grpc_stream, **kwargs)
+        self.catalog_cache = _catalog_cache(self.meta)
         self.proxy = _StreamCollectorProxy(self)
-        add_StreamCollectorServicer_to_server(self.proxy, self.server)
+
+    def _add_servicer(self, server):
+        add_StreamCollectorServicer_to_server(self.proxy, server, self._control,
+                                              self._slots)
 
     @abstractmethod
     def stream(self, metrics):
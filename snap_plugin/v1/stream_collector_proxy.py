@@ -17,7 +17,6 @@
 
 import logging
 import threading
-import traceback
 import time
 # It is needed to prevent ImportError in python 3.x, caused by renaming package Queue to queue
 try:
@@ -25,10 +24,12 @@ try:
 except ImportError:
     import queue as queue
 
+from .catalog_cache import _metric_types
+from .deadline import Deadline, _request_deadline
 from .metric import Metric
+from .metric_list import MetricList
 from .plugin_pb2 import MetricsReply, CollectReply
 from .plugin_proxy import PluginProxy
-from .config_map import ConfigMap
 
 LOG = logging.getLogger(__name__)
 
@@ -44,22 +45,18 @@ class _StreamCollectorProxy(PluginProxy):
         self.max_collect_duration = 10
 
     def _stream_wrapper(self, metrics):
-        requested_metrics = []
-        for metric in metrics.Metrics_Arg.metrics:
-            requested_metrics.append(Metric(pb=metric))
+        requested_metrics = MetricList(metrics.Metrics_Arg.metrics)
         while self.done_queue.empty():
-            returned_metrics = self.plugin.stream(requested_metrics)
-            if not isinstance(returned_metrics, list):
+            # metrics are due once per max-collect-duration
+            with _request_deadline(Deadline(self.max_collect_duration)):
+                returned_metrics = self.plugin.stream(requested_metrics)
+            if not isinstance(returned_metrics, (list, tuple, MetricList)):
                 self.metrics_queue.put([returned_metrics])
             else:
                 self.metrics_queue.put(returned_metrics)
 
-    def StreamMetrics(self, request_iterator, context):
-        """Dispatches metrics streamed by collector"""
-        LOG.debug("StreamMetrics called")
-
-        # set up arguments
-        collect_args = (next(request_iterator))
+    def _schedule(self, collect_args):
+        """Reads the buffering parameters from the config of the request"""
         max_metrics_buffer = 0
         max_collect_duration = 0
         cfg = Metric(pb=collect_args.Metrics_Arg.metrics[0])
@@ -76,6 +73,14 @@ class _StreamCollectorProxy(PluginProxy):
         if max_collect_duration > 0:
             self.max_collect_duration = max_collect_duration
 
+    def StreamMetrics(self, request_iterator, context):
+        """Dispatches metrics streamed by collector"""
+        LOG.debug("StreamMetrics called")
+
+        # set up arguments
+        collect_args = (next(request_iterator))
+        self._schedule(collect_args)
+
         # start collection thread
         thread = threading.Thread(target=self._stream_wrapper, args=(collect_args,),)
         thread.daemon = True
@@ -122,10 +127,4 @@ class _StreamCollectorProxy(PluginProxy):
     def GetMetricTypes(self, request, context):
         """Dispatches the request to the plugins update_catalog method"""
         LOG.debug("GetMetricTypes called")
-        try:
-            metrics = self.plugin.update_catalog(ConfigMap(pb=request.config))
-            return MetricsReply(metrics=[m.pb for m in metrics])
-        except Exception as err:
-            msg = "message: {}\n\nstack trace: {}".format(
-                err, traceback.format_exc())
-            return MetricsReply(metrics=[], error=msg)
+        return _metric_types(self.plugin, request.config)
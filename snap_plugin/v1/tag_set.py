@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import weakref
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from .metric import Metric
+from .metric_batch import MetricBatch
+from .metric_list import MetricList
+from .plugin_pb2 import Metric as PbMetric
+
+
+class TagSet(Mapping):
+    """TagSet is an immutable, interned set of tags.
+
+    Creating a TagSet from tags equal to those of a live TagSet returns the
+    existing object, so the code building metrics can share a handful of tag
+    sets rather than building a dict per metric.  A TagSet can be given
+    wherever tags are expected (:py:class:`~snap_plugin.v1.metric.Metric`,
+    :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` and
+    :py:class:`~snap_plugin.v1.encoder.MetricRow`), but only rows share its
+    serialized form: the encoder copies the prebuilt fragment into each row
+    instead of encoding the tags again.  A
+    :py:class:`~snap_plugin.v1.metric.Metric` still copies the tags into its
+    own protobuf (a :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` into
+    its template, once for all of its rows).
+
+    Args:
+        tags (:obj:`dict`): tags (key/value strings)
+        **kwargs: more tags
+
+    Example:
+    ::
+        HOST_TAGS = snap.TagSet(host="node-1", rack="r12")
+
+        # in process
+        return HOST_TAGS.apply(metrics)
+    """
+
+    __slots__ = ("_tags", "_fragment", "__weakref__")
+
+    _interned = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+
+    def __new__(cls, tags=(), **kwargs):
+        tags = dict(tags, **kwargs)
+        key = tuple(sorted(tags.items()))
+        with cls._lock:
+            tag_set = cls._interned.get(key)
+            if tag_set is None:
+                tag_set = super(TagSet, cls).__new__(cls)
+                tag_set._tags = tags
+                tag_set._fragment = None
+                cls._interned[key] = tag_set
+        return tag_set
+
+    def __getitem__(self, key):
+        return self._tags[key]
+
+    def __iter__(self):
+        return iter(self._tags)
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __contains__(self, key):
+        return key in self._tags
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        if isinstance(other, TagSet):
+            return self is other
+        return Mapping.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "TagSet({!r})".format(self._tags)
+
+    @property
+    def fragment(self):
+        """The tags serialized as the `Tags` field of a protobuf metric.
+
+        Returns:
+            :obj:`bytes`
+        """
+        if self._fragment is None:
+            pb = PbMetric()
+            pb.Tags.update(self._tags)
+            self._fragment = pb.SerializeToString(deterministic=True)
+        return self._fragment
+
+    def union(self, tags=(), **kwargs):
+        """Returns the TagSet holding these tags updated with `tags`.
+
+        Returns:
+            :py:class:`TagSet`
+        """
+        merged = dict(self._tags)
+        merged.update(tags, **kwargs)
+        return TagSet(merged)
+
+    def apply(self, metrics):
+        """Adds the tags to every metric, replacing tags with the same key.
+
+        The metrics of a :py:class:`~snap_plugin.v1.metric_list.MetricList`
+        are updated without being wrapped and a
+        :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` is updated once
+        for all of its rows.  Rows are tuples: those of a :obj:`list` or a
+        :py:class:`~snap_plugin.v1.metric_list.MetricList` are replaced by
+        rows holding the merged tags.
+
+        Args:
+            metrics (iterable): a
+                :py:class:`~snap_plugin.v1.metric_list.MetricList` or
+                :py:class:`~snap_plugin.v1.metric_batch.MetricBatch`, or an
+                iterable of :py:class:`~snap_plugin.v1.metric.Metric`,
+                :py:class:`~snap_plugin.v1.metric_batch.MetricBatch` and
+                protobuf metrics (and rows, for a list)
+
+        Returns:
+            `metrics`
+
+        Raises:
+            TypeError: rows are given in something else than a list
+        """
+        tags = self._tags
+        if isinstance(metrics, MetricBatch):
+            metrics.template.Tags.update(tags)
+            return metrics
+        items = metrics._items if isinstance(metrics, MetricList) else metrics
+        for index, item in enumerate(items):
+            if isinstance(item, Metric):
+                item = item.pb
+            elif isinstance(item, MetricBatch):
+                item = item.template
+            elif isinstance(item, tuple):
+                if not isinstance(items, list):
+                    raise TypeError("Rows can only be tagged in a list or a "
+                                    "MetricList.  (given: {})".format(
+                                        type(metrics).__name__))
+                items[index] = self._tag_row(item)
+                continue
+            item.Tags.update(tags)
+        return metrics
+
+    def _tag_row(self, row):
+        """Returns the row with these tags added to its own"""
+        from .encoder import MetricRow
+        row = MetricRow(*row)
+        if not row.tags:
+            # the row shares the fragment of this set
+            return row._replace(tags=self)
+        merged = dict(row.tags)
+        merged.update(self._tags)
+        return row._replace(tags=TagSet(merged))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the direct MetricsReply encoder.
+
+Times producing the serialized collect reply for ``rows`` values from a
+MetricBatch and from MetricRow tuples, through protobuf objects
+(``MetricsReply.SerializeToString``) and through
+:py:func:`snap_plugin.v1.encoder.encode_metrics_reply`.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_encoder [rows ...]
+"""
+
+import sys
+from timeit import default_timer as timer
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.encoder import encode_metrics_reply
+from snap_plugin.v1.metric_list import _extend_metrics
+from snap_plugin.v1.plugin import _tabulate
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+_TAGS = {"mtype": "gauge"}
+
+
+def _batch(dynamic, data):
+    return snap.MetricBatch(
+        namespace=[snap.NamespaceElement(value="intel"),
+                   snap.NamespaceElement(name="cpu", description="cpu id"),
+                   snap.NamespaceElement(value="util")],
+        dynamic=dynamic, data=data,
+        version=1, tags=_TAGS, unit="percent")
+
+
+def _rows(dynamic, data):
+    return [snap.MetricRow(("intel", dyn, "util"), value, tags=_TAGS,
+                           unit="percent", version=1)
+            for dyn, value in zip(dynamic, data)]
+
+
+def _metrics(rows):
+    return [snap.Metric(namespace=row.namespace, data=row.data,
+                        tags=row.tags, unit=row.unit, version=row.version)
+            for row in rows]
+
+
+def _protobuf(metrics):
+    reply = MetricsReply()
+    _extend_metrics(reply.metrics, metrics)
+    return reply.SerializeToString()
+
+
+def _time(function, *args):
+    start = timer()
+    function(*args)
+    return timer() - start
+
+
+def main(*sizes):
+    rows = []
+    for size in sizes or (10000, 100000):
+        dynamic = [str(i) for i in range(size)]
+        data = [float(i) for i in range(size)]
+        batch = _batch(dynamic, data)
+        batch_pb = _time(_protobuf, batch)
+        batch_enc = _time(encode_metrics_reply, batch)
+        # rows go through Metric objects without the encoder
+        row_pb = _time(lambda: _protobuf(_metrics(_rows(dynamic, data))))
+        row_enc = _time(lambda: encode_metrics_reply(_rows(dynamic, data)))
+        rows.append([size,
+                     "{:.3f}".format(batch_pb), "{:.3f}".format(batch_enc),
+                     "{:.1f}x".format(batch_pb / batch_enc),
+                     "{:.3f}".format(row_pb), "{:.3f}".format(row_enc),
+                     "{:.1f}x".format(row_pb / row_enc)])
+    headers = ["ROWS", "BATCH PB (s)", "BATCH ENC (s)", "SPEEDUP",
+               "ROWS PB (s)", "ROWS ENC (s)", "SPEEDUP"]
+    sys.stdout.write(_tabulate(rows, headers))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
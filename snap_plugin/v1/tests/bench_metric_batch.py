@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of MetricBatch against one Metric per row.
+
+Times building a serialized collect reply from ``rows`` values, the way
+``_CollectorProxy.CollectMetrics`` does.  When numpy is installed the batch
+is also built from numpy arrays.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_metric_batch [rows ...]
+"""
+
+import sys
+from timeit import default_timer as timer
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.metric_list import _extend_metrics
+from snap_plugin.v1.plugin import _tabulate
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _per_metric(dynamic, data):
+    metrics = []
+    for dyn, value in zip(dynamic, data):
+        metrics.append(snap.Metric(
+            namespace=[snap.NamespaceElement(value="intel"),
+                       snap.NamespaceElement(name="cpu", description="cpu id",
+                                             value=dyn),
+                       snap.NamespaceElement(value="util")],
+            version=1, tags={"mtype": "gauge"}, unit="percent", data=value))
+    return metrics
+
+
+def _batch(dynamic, data):
+    return snap.MetricBatch(
+        namespace=[snap.NamespaceElement(value="intel"),
+                   snap.NamespaceElement(name="cpu", description="cpu id"),
+                   snap.NamespaceElement(value="util")],
+        dynamic=dynamic, data=data,
+        version=1, tags={"mtype": "gauge"}, unit="percent")
+
+
+def _time_reply(build, dynamic, data):
+    start = timer()
+    reply = MetricsReply()
+    _extend_metrics(reply.metrics, build(dynamic, data))
+    reply.SerializeToString()
+    return timer() - start
+
+
+def main(*sizes):
+    rows = []
+    for size in sizes or (10000, 100000, 1000000):
+        dynamic = [str(i) for i in range(size)]
+        data = [float(i) for i in range(size)]
+        metric_time = _time_reply(_per_metric, dynamic, data)
+        batch_time = _time_reply(_batch, dynamic, data)
+        row = [size, "{:.3f}".format(metric_time), "{:.3f}".format(batch_time),
+               "{:.2f}x".format(metric_time / batch_time)]
+        if numpy is not None:
+            numpy_time = _time_reply(_batch, numpy.arange(size),
+                                     numpy.arange(size, dtype=numpy.float64))
+            row.append("{:.3f}".format(numpy_time))
+        rows.append(row)
+    headers = ["ROWS", "METRIC (s)", "BATCH (s)", "SPEEDUP"]
+    if numpy is not None:
+        headers.append("NUMPY BATCH (s)")
+    sys.stdout.write(_tabulate(rows, headers))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of Metric.expand.
+
+Times filling in /intel/cpu/*/core/*/util for ``cpus`` x ``cores`` instances
+by copying the requested metric and setting ``namespace[i].value`` by hand,
+and with :py:meth:`snap_plugin.v1.metric.Metric.expand`.  Both cost about the
+same: most of the time goes to the protobuf copies, which expand makes too.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_metric_expand [cpus cores]
+"""
+
+import sys
+from timeit import default_timer as timer
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.plugin import _tabulate
+from snap_plugin.v1.plugin_pb2 import Metric as PbMetric
+
+
+def _requested():
+    return snap.Metric(namespace=[
+        "intel", snap.NamespaceElement(name="cpu", description="cpu id"),
+        "core", snap.NamespaceElement(name="core", description="core id"),
+        "util"], tags={"mtype": "gauge"}, unit="percent")
+
+
+def _by_hand(metric, cpus, cores):
+    metrics = []
+    for cpu in range(cpus):
+        for core in range(cores):
+            pb = PbMetric()
+            pb.CopyFrom(metric.pb)
+            copy = snap.Metric(pb=pb)
+            copy.namespace[1].value = str(cpu)
+            copy.namespace[3].value = str(core)
+            metrics.append(copy)
+    return metrics
+
+
+def _expand(metric, cpus, cores):
+    return list(metric.expand(range(cpus), range(cores)))
+
+
+def main(cpus=256, cores=64):
+    rows = []
+    for name, function in (("by hand", _by_hand), ("expand", _expand)):
+        metric = _requested()
+        start = timer()
+        function(metric, cpus, cores)
+        elapsed = timer() - start
+        rows.append([name, "{:.3f}".format(elapsed),
+                     "{:.2f}".format(elapsed / (cpus * cores) * 10 ** 6)])
+    sys.stdout.write("{} x {} metrics\n".format(cpus, cores))
+    sys.stdout.write(_tabulate(rows, ["CASE", "TOTAL (s)", "μs/METRIC"]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
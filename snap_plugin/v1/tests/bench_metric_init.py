@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Micro-benchmarks of the Metric constructor.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_metric_init [count]
+"""
+
+import sys
+import time
+from timeit import repeat
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.plugin import _tabulate
+
+NAMESPACE = [snap.NamespaceElement(value="intel"),
+             snap.NamespaceElement(value="bench"),
+             snap.NamespaceElement(value="value")]
+TAGS = {"mtype": "gauge"}
+CONFIG = {"user": "root"}
+NOW = time.time()
+
+CASES = [
+    ("no arguments",
+     lambda: snap.Metric()),
+    ("namespace + data",
+     lambda: snap.Metric(namespace=NAMESPACE, data=1.0)),
+    ("namespace + version + data",
+     lambda: snap.Metric(namespace=NAMESPACE, version=1, data=1.0)),
+    ("all arguments",
+     lambda: snap.Metric(namespace=NAMESPACE, version=1, tags=TAGS,
+                         config=CONFIG, timestamp=NOW, unit="B",
+                         description="bench", data=1.0)),
+    ("all arguments, validate=False",
+     lambda: snap.Metric(namespace=NAMESPACE, version=1, tags=TAGS,
+                         config=CONFIG, timestamp=NOW, unit="B",
+                         description="bench", data=1.0, validate=False)),
+]
+
+
+def main(count=20000):
+    rows = []
+    for name, case in CASES:
+        best = min(repeat(case, number=count, repeat=3))
+        rows.append([name, "{:.2f}".format(best / count * 10 ** 6)])
+    sys.stdout.write("{} metrics, best of 3\n".format(count))
+    sys.stdout.write(_tabulate(rows, ["CASE", "μs/METRIC"]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Memory benchmark for the metric wrappers.
+
+Reports the number of bytes allocated per metric when plugin code builds
+metrics and when the library wraps the metrics of an incoming request.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_metric_memory [count]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.plugin import _tabulate
+from snap_plugin.v1.plugin_pb2 import MetricsArg
+
+
+def _new_metric():
+    return snap.Metric(namespace=("intel", "bench", "value"),
+                       version=1,
+                       tags={"mtype": "gauge"},
+                       config={"user": "root"},
+                       data=1.0)
+
+
+def _bytes_per_item(factory, count):
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    items = factory(count)
+    after = tracemalloc.get_traced_memory()[0]
+    del items
+    return (after - before) / float(count)
+
+
+def main(count=20000):
+    request = MetricsArg(metrics=[_new_metric().pb for _ in range(count)])
+
+    def build(n):
+        return [_new_metric() for _ in range(n)]
+
+    def wrap(n):
+        return [snap.Metric(pb=pb) for pb in request.metrics]
+
+    def wrap_and_read(n):
+        metrics = wrap(n)
+        for m in metrics:
+            m.namespace, m.config, m.timestamp
+        return metrics
+
+    tracemalloc.start()
+    rows = [
+        ["Metric(...)", "{:.0f}".format(_bytes_per_item(build, count))],
+        ["Metric(pb=...)", "{:.0f}".format(_bytes_per_item(wrap, count))],
+        ["Metric(pb=...) + accessors",
+         "{:.0f}".format(_bytes_per_item(wrap_and_read, count))],
+    ]
+    tracemalloc.stop()
+    sys.stdout.write("{} metrics\n".format(count))
+    sys.stdout.write(_tabulate(rows, ["CASE", "BYTES/METRIC"]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of MetricPrototype.new against the Metric constructor.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_metric_prototype [count]
+"""
+
+import sys
+import time
+from timeit import default_timer as timer
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.plugin import _tabulate
+
+
+def _metric(data, timestamp):
+    return snap.Metric(namespace=[snap.NamespaceElement(value="intel"),
+                                  snap.NamespaceElement(value="bench"),
+                                  snap.NamespaceElement(value="value")],
+                       version=1,
+                       tags={"mtype": "gauge", "host": "localhost"},
+                       unit="B",
+                       description="benchmark metric",
+                       timestamp=timestamp,
+                       data=data)
+
+
+def main(count=20000):
+    now = time.time()
+    proto = snap.MetricPrototype(_metric(0.0, now))
+
+    start = timer()
+    for i in range(count):
+        _metric(float(i), now)
+    metric_time = timer() - start
+
+    start = timer()
+    for i in range(count):
+        proto.new(float(i), now)
+    proto_time = timer() - start
+
+    rows = [["Metric(...)", "{:.2f}".format(metric_time / count * 10 ** 6)],
+            ["MetricPrototype.new", "{:.2f}".format(proto_time / count * 10 ** 6)]]
+    sys.stdout.write("{} metrics\n".format(count))
+    sys.stdout.write(_tabulate(rows, ["CASE", "μs/METRIC"]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
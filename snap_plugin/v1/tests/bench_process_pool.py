@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the worker processes (Meta.process_workers).
+
+Serves a processor whose ``process`` spends ``work`` iterations of pure
+Python arithmetic per metric and times ``requests`` Process calls of
+``metrics`` metrics sent by ``clients`` threads at once, first handled by
+the gRPC threads, then by 1, 2, 4 and 8 worker processes.  The speedup is
+bound by the number of cores, which is printed along with the results.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_process_pool \
+[clients requests metrics work]
+"""
+
+import multiprocessing
+import sys
+import threading
+from timeit import default_timer as timer
+
+import grpc
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.plugin import _tabulate
+from snap_plugin.v1.plugin_pb2 import ProcessorStub, PubProcArg
+
+
+class _Processor(snap.Processor):
+
+    def __init__(self, work, **kwargs):
+        super(_Processor, self).__init__("bench", 1, **kwargs)
+        self.work = work
+
+    def process(self, metrics, config):
+        for metric in metrics:
+            total = 0
+            for i in range(self.work):
+                total += i * i % 7
+            metric.data = total
+        return metrics
+
+    def get_config_policy(self):
+        return snap.ConfigPolicy()
+
+
+def _run(processes, clients, requests, request):
+    processor = _Processor(request[1], worker_count=clients,
+                           process_workers=processes)
+    server = processor._create_server()
+    processor.server = server
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    channel = grpc.insecure_channel("127.0.0.1:{}".format(port))
+    stub = ProcessorStub(channel)
+    stub.Process(request[0])
+    per_client = requests // clients
+
+    def client():
+        for _ in range(per_client):
+            stub.Process(request[0])
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = timer() - start
+    channel.close()
+    processor.stop_plugin()
+    return per_client * clients / elapsed
+
+
+def main(clients=8, requests=64, metrics=10, work=20000):
+    request = PubProcArg(Metrics=[
+        snap.Metric(namespace=("bench", str(i)), data=0).pb
+        for i in range(metrics)])
+    rows = []
+    for processes in (None, 1, 2, 4, 8):
+        rate = _run(processes, clients, requests, (request, work))
+        rows.append([processes or "threads", "{:.1f}".format(rate)])
+    sys.stdout.write(
+        "{} cores, {} clients, {} requests of {} metrics, {} iterations "
+        "per metric\n".format(multiprocessing.cpu_count(), clients, requests,
+                              metrics, work))
+    sys.stdout.write(_tabulate(rows, ["PROCESSES", "REQUESTS/s"]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark of the gRPC worker pool size.
+
+Serves a collector whose ``collect`` waits ``delay`` milliseconds (like a
+plugin reading a remote endpoint) and times ``requests`` CollectMetrics calls
+sent by ``clients`` threads at once, for several worker counts.
+
+Usage::
+
+    python -m snap_plugin.v1.tests.bench_workers [clients requests delay]
+"""
+
+import sys
+import threading
+import time
+from timeit import default_timer as timer
+
+import grpc
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.metrics_arg import MetricsArg
+from snap_plugin.v1.plugin import _tabulate
+from snap_plugin.v1.plugin_pb2 import CollectorStub
+
+
+class _Collector(snap.Collector):
+
+    def __init__(self, delay, **kwargs):
+        super(_Collector, self).__init__("bench", 1, **kwargs)
+        self.delay = delay
+
+    def collect(self, metrics):
+        time.sleep(self.delay)
+        for metric in metrics:
+            metric.data = 1.0
+        return metrics
+
+    def update_catalog(self, config):
+        return []
+
+    def get_config_policy(self):
+        return snap.ConfigPolicy()
+
+
+def _run(workers, clients, requests, delay):
+    collector = _Collector(delay, worker_count=workers)
+    server = collector._create_server()
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    channel = grpc.insecure_channel("127.0.0.1:{}".format(port))
+    stub = CollectorStub(channel)
+    request = MetricsArg(snap.Metric(namespace=("bench", "metric"))).pb
+    stub.CollectMetrics(request)
+    per_client = requests // clients
+
+    def client():
+        for _ in range(per_client):
+            stub.CollectMetrics(request)
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = timer() - start
+    channel.close()
+    server.stop(0)
+    return per_client * clients / elapsed
+
+
+def main(clients=16, requests=320, delay=10):
+    rows = []
+    for workers in (1, 2, 4, 8, 16, 32):
+        rate = _run(workers, clients, requests, delay / 1000.0)
+        rows.append([workers, "{:.0f}".format(rate)])
+    sys.stdout.write("{} clients, {} requests, collect takes {} ms\n".format(
+        clients, requests, delay))
+    sys.stdout.write(_tabulate(rows, ["WORKERS", "REQUESTS/s"]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
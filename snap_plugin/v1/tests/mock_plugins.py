@@ -25,13 +25,27 @@ import snap_plugin.v1 as snap
 class MockCollector(snap.Collector, threading.Thread):
     """Mock collector plugin """
 
-    def __init__(self, name, ver):
-        super(MockCollector, self).__init__(name, ver)
+    def __init__(self, name, ver, **kwargs):
+        super(MockCollector, self).__init__(name, ver, **kwargs)
         self._flags.add('require-config', snap.plugin.FlagType.toggle, '')
         threading.Thread.__init__(self, group=None, target=None, name=None)
         self._stopper = threading.Event()
 
     def collect(self, metrics):
+        if len(metrics) > 0 and "batch" in metrics[0].config:
+            return snap.MetricBatch(
+                namespace=[
+                    snap.NamespaceElement(value="acme"),
+                    snap.NamespaceElement(name="id", description="some id"),
+                    snap.NamespaceElement(value="matix")
+                ],
+                dynamic=[str(i) for i in range(metrics[0].config["batch"])],
+                data=[float(i) for i in range(metrics[0].config["batch"])],
+                version=2
+            )
+        if len(metrics) > 0 and "rows" in metrics[0].config:
+            return [snap.MetricRow(("acme", "row", str(i)), i, version=2)
+                    for i in range(metrics[0].config["rows"])]
         for metric in metrics:
             metric.timestamp = time.time()
             metric.version = 2
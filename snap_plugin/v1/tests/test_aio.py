@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+
+import grpc
+import pytest
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.get_metrictypes_arg import GetMetricTypesArg
+from snap_plugin.v1.metrics_arg import MetricsArg
+from snap_plugin.v1.plugin_pb2 import (CollectArg, CollectorStub, Empty,
+                                       ProcessorStub, StreamCollectorStub)
+from snap_plugin.v1.pub_proc_arg import _ProcessArg
+
+aio = pytest.importorskip("snap_plugin.v1.aio")
+
+
+class MockAsyncCollector(snap.AsyncCollector):
+
+    async def collect(self, metrics):
+        await asyncio.sleep(.2)
+        for metric in metrics:
+            metric.data = 1
+        return metrics
+
+    def update_catalog(self, config):
+        return [snap.Metric(namespace=("acme", "async"))]
+
+    def get_config_policy(self):
+        return snap.ConfigPolicy()
+
+
+class MockAsyncProcessor(snap.AsyncProcessor):
+
+    async def process(self, metrics, config):
+        await asyncio.sleep(0)
+        return snap.TagSet(processed="async").apply(metrics)
+
+    def get_config_policy(self):
+        return snap.ConfigPolicy()
+
+
+class MockAsyncStreamCollector(snap.AsyncStreamCollector):
+
+    async def stream(self, metrics):
+        await asyncio.sleep(.01)
+        for metric in metrics:
+            metric.data = 2
+        # the requested MetricList is streamed back as is
+        return metrics
+
+    def update_catalog(self, config):
+        return []
+
+    def get_config_policy(self):
+        return snap.ConfigPolicy()
+
+
+def _serve(plugin):
+    plugin.server = plugin._create_server()
+    port = plugin.server.add_insecure_port("127.0.0.1:0")
+    plugin.server.start()
+    return grpc.insecure_channel("127.0.0.1:{}".format(port))
+
+
+def test_collector():
+    col = MockAsyncCollector("async", 1, worker_count=1)
+    stub = CollectorStub(_serve(col))
+    try:
+        request = MetricsArg(snap.Metric(namespace=("acme", "async"))).pb
+        start = time.time()
+        calls = [stub.CollectMetrics.future(request) for _ in range(50)]
+        stub.Ping(Empty(), timeout=1)
+        replies = [call.result(timeout=5) for call in calls]
+        # the requests wait concurrently, not one per worker thread
+        assert time.time() - start < 2
+        assert all(reply.error == "" and reply.metrics[0].int64_data == 1
+                   for reply in replies)
+        reply = stub.GetMetricTypes(GetMetricTypesArg({}).pb)
+        assert reply.metrics[0].Namespace[1].Value == "async"
+        assert stub.GetConfigPolicy(Empty()).error == ""
+    finally:
+        col.stop_plugin()
+
+
+def test_collector_handlers():
+    col = MockAsyncCollector("async", 1)
+    order = []
+
+    def handler(name, delay):
+        async def _handler(metrics):
+            await asyncio.sleep(delay)
+            order.append(name)
+            return [snap.MetricRow(("acme", name), 3)]
+        return _handler
+    col.add_handler(("acme", "slow"), handler("slow", .1))
+    col.add_handler(("acme", "fast"), handler("fast", 0))
+    stub = CollectorStub(_serve(col))
+    try:
+        request = MetricsArg(snap.Metric(namespace=("acme", "slow")),
+                             snap.Metric(namespace=("acme", "fast"))).pb
+        reply = stub.CollectMetrics(request, timeout=5)
+        # the handlers run concurrently, the reply keeps the request order
+        assert order == ["fast", "slow"]
+        assert [m.Namespace[1].Value for m in reply.metrics] == \
+            ["slow", "fast"]
+    finally:
+        col.stop_plugin()
+
+
+def test_processor():
+    proc = MockAsyncProcessor("async", 1)
+    stub = ProcessorStub(_serve(proc))
+    try:
+        reply = stub.Process(_ProcessArg(
+            metrics=[snap.Metric(namespace=("foo",))],
+            config=snap.ConfigMap()).pb, timeout=5)
+        assert reply.error == ""
+        assert reply.metrics[0].Tags["processed"] == "async"
+    finally:
+        proc.stop_plugin()
+
+
+def test_processor_deadline():
+    proc = MockAsyncProcessor("async", 1)
+    remaining = []
+
+    async def process(metrics, config):
+        remaining.append(snap.Deadline.current().time_remaining)
+        return metrics
+    proc.process = process
+    stub = ProcessorStub(_serve(proc))
+    try:
+        reply = stub.Process(_ProcessArg(
+            metrics=[snap.Metric(namespace=("foo",))],
+            config=snap.ConfigMap()).pb, timeout=5)
+        assert reply.error == ""
+        assert 0 < remaining[0] <= 5
+    finally:
+        proc.stop_plugin()
+
+
+def test_stream_collector():
+    col = MockAsyncStreamCollector("async", 1, maximum_concurrent_rpcs=2)
+    stub = StreamCollectorStub(_serve(col))
+    try:
+        metric = snap.Metric(namespace=("acme", "stream"),
+                             config={"max-metrics-buffer": 3})
+        arg = CollectArg()
+        arg.Metrics_Arg.metrics.extend([metric.pb])
+        replies = stub.StreamMetrics(iter([arg]), timeout=5)
+        reply = next(replies)
+        assert [m.int64_data for m in reply.Metrics_Reply.metrics] == [2] * 3
+        replies.cancel()
+    finally:
+        col.stop_plugin()
+
+
+def test_collector_deadline():
+    col = MockAsyncCollector("async", 1)
+
+    async def slow(metrics):
+        assert snap.Deadline.current().time_remaining <= .3
+        await asyncio.sleep(5)
+        return metrics
+    col.add_handler(("acme", "slow"), slow)
+    stub = CollectorStub(_serve(col))
+    try:
+        request = MetricsArg(snap.Metric(namespace=("acme", "slow")),
+                             snap.Metric(namespace=("acme", "async"))).pb
+        start = time.time()
+        reply = stub.CollectMetrics(request, timeout=.35)
+        # answered at the deadline with the metrics collected by then
+        assert time.time() - start < 1
+        assert reply.error == ""
+        assert [m.Namespace[1].Value for m in reply.metrics] == ["async"]
+    finally:
+        col.stop_plugin()
+
+
+def test_collect_now_uses_handlers():
+    col = MockAsyncCollector("async", 1)
+
+    async def handler(metrics):
+        return [snap.MetricRow(("acme", "handled"), 5)]
+    col.add_handler(("acme", "handled"), handler)
+    collected = col._collect_now([snap.Metric(namespace=("acme", "handled")),
+                                  snap.Metric(namespace=("acme", "async"))])
+    assert [(repr(m.namespace), m.data) for m in collected] == [
+        ("/acme/handled", 5), ("/acme/async", 1)]
+
+
+def test_process_workers_refused():
+    col = MockAsyncCollector("async", 1, process_workers=2)
+    with pytest.raises(ValueError):
+        col._create_server()
+    assert col._process_pool is None
+
+
+def test_max_rpcs_keeps_room_for_pings():
+    col = MockAsyncCollector("async", 1, maximum_concurrent_rpcs=1)
+    stub = CollectorStub(_serve(col))
+    try:
+        request = MetricsArg(snap.Metric(namespace=("acme", "async"))).pb
+        busy = stub.CollectMetrics.future(request)
+        time.sleep(.1)
+        with pytest.raises(grpc.RpcError) as err:
+            stub.CollectMetrics(request, timeout=2)
+        assert err.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        stub.Ping(Empty(), timeout=1)
+        assert busy.result(timeout=5).error == ""
+    finally:
+        col.stop_plugin()
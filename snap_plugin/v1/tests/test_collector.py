@@ -26,7 +26,7 @@ from past.builtins import basestring
 
 import snap_plugin.v1 as snap
 from snap_plugin.v1.metrics_arg import MetricsArg
-from snap_plugin.v1.plugin_pb2 import CollectorStub, Empty
+from snap_plugin.v1.plugin_pb2 import CollectorStub, Empty, MetricsReply
 from snap_plugin.v1.tests import ThreadPrinter
 
 from .mock_plugins import MockCollector
@@ -191,6 +191,55 @@ def test_collect(collector_client):
     assert reply.error == ''
     assert bool(snap.Metric(pb=reply.metrics[0]).data) is True
 
+    # collect a batch
+    metric.config.clear()
+    metric.config["batch"] = 3
+    reply = collector_client.CollectMetrics(MetricsArg(metric).pb)
+    assert reply.error == ''
+    assert len(reply.metrics) == 3
+    assert [m.Namespace[1].Value for m in reply.metrics] == ["0", "1", "2"]
+    assert [m.float64_data for m in reply.metrics] == [0.0, 1.0, 2.0]
+
+    # collect rows
+    metric.config.clear()
+    metric.config["rows"] = 2
+    reply = collector_client.CollectMetrics(MetricsArg(metric).pb)
+    assert reply.error == ''
+    assert [m.Namespace[2].Value for m in reply.metrics] == ["0", "1"]
+    assert [m.int64_data for m in reply.metrics] == [0, 1]
+
+
+def test_reply_timestamp():
+    col = MockCollector("MyCollector", 99)
+    col.collect = lambda metrics: [snap.Metric(namespace=("acme", str(i)))
+                                   for i in range(50)]
+    request = MetricsArg(snap.Metric(namespace=("acme", "*"))).pb
+    col.meta.reply_timestamp = True
+    reply = col.proxy.CollectMetrics(request, None)
+    assert len(set(m.Timestamp.nsec for m in reply.metrics)) == 1
+    col.meta.reply_timestamp = False
+    reply = col.proxy.CollectMetrics(request, None)
+    assert len(set(m.Timestamp.nsec for m in reply.metrics)) > 1
+
+
+def test_collect_appends_batch():
+    col = MockCollector("MyCollector", 99)
+
+    def collect(metrics):
+        for metric in metrics:
+            metric.data = 1
+        metrics.append(snap.MetricBatch(namespace=("acme", "*"),
+                                        dynamic=["a", "b"], data=[2, 3]))
+        return metrics
+    col.collect = collect
+    request = MetricsArg(snap.Metric(namespace=("acme", "x"))).pb
+    reply = col.proxy.CollectMetrics(request, None)
+    if isinstance(reply, bytes):
+        reply = MetricsReply.FromString(reply)
+    assert reply.error == ""
+    assert [(m.Namespace[1].Value, m.int64_data) for m in reply.metrics] == \
+        [("x", 1), ("a", 2), ("b", 3)]
+
 
 def test_get_metric_types(collector_client):
     from snap_plugin.v1.get_metrictypes_arg import GetMetricTypesArg
@@ -205,3 +254,183 @@ def test_get_config_policy(collector_client):
     reply = collector_client.GetConfigPolicy(Empty())
     assert reply.error == ""
     assert reply.string_policy["acme.sk8.matix"].rules["password"].default == "grace"
+
+
+def test_catalog_cache(tmpdir):
+    from snap_plugin.v1.catalog_cache import CatalogCache
+    from snap_plugin.v1.get_metrictypes_arg import GetMetricTypesArg
+    from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+    def get_metric_types(col, config):
+        reply = col.proxy.GetMetricTypes(GetMetricTypesArg(config).pb, None)
+        # cached catalogs are returned serialized
+        if isinstance(reply, bytes):
+            reply = MetricsReply.FromString(reply)
+        return reply
+
+    calls = []
+    col = MockCollector("MyCollector", 99, catalog_cache_ttl=60,
+                        catalog_cache_path=str(tmpdir))
+    assert isinstance(col.catalog_cache, CatalogCache)
+    update_catalog = col.update_catalog
+
+    def counting(config):
+        calls.append(dict(config.items()))
+        if config.get("fail"):
+            raise Exception("catalog failed")
+        return update_catalog(config)
+    col.update_catalog = counting
+    reply = get_metric_types(col, {"int": 1})
+    assert len(reply.metrics) == 1
+    assert get_metric_types(col, {"int": 1}) == reply
+    get_metric_types(col, {"int": 2})
+    assert calls == [{"int": 1}, {"int": 2}]
+    # errors aren't cached
+    for _ in range(2):
+        assert get_metric_types(col, {"fail": True}).error != ""
+    assert len(calls) == 4
+    assert len(tmpdir.listdir()) == 2
+
+    # a restarted plugin answers from disk and refreshes in the background
+    col.catalog_cache.clear()
+    del calls[:]
+    assert get_metric_types(col, {"int": 1}) == reply
+    t_end = time.time() + 5
+    while not calls and time.time() < t_end:
+        time.sleep(.01)
+    assert calls == [{"int": 1}]
+
+    # expired catalogs are dropped by the expiry thread
+    col.catalog_cache.ttl = 0
+    t_end = time.time() + 5
+    while col.catalog_cache.expire() == 0 and time.time() < t_end:
+        time.sleep(.01)
+    col._expire()
+    assert len(col.catalog_cache) == 0
+
+    # the cache is opt-in
+    assert MockCollector("MyCollector", 99).catalog_cache is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7) or sys.platform == "win32",
+                    reason="worker processes require Python 3.7+ and fork")
+def test_process_workers():
+    import os
+    from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+    class PidCollector(MockCollector):
+        def init_worker(self):
+            self.worker = True
+
+        def collect(self, metrics):
+            for metric in metrics:
+                if metric.config.get("crash"):
+                    os._exit(1)
+                if metric.config.get("deadline"):
+                    metric.data = snap.Deadline.current().time_remaining
+                    continue
+                metric.data = os.getpid() if self.worker else 0
+            return metrics
+
+    class Context(object):
+        def __init__(self, time_remaining):
+            self._time_remaining = time_remaining
+
+        def time_remaining(self):
+            return self._time_remaining
+
+    def collect(col, config, time_remaining=None):
+        request = MetricsArg(snap.Metric(namespace=("acme", "pid"),
+                                         config=config)).pb
+        reply = col.proxy.CollectMetrics(request, Context(time_remaining))
+        if isinstance(reply, bytes):
+            reply = MetricsReply.FromString(reply)
+        return reply
+
+    col = PidCollector("MyCollector", 99, process_workers=2)
+    col.worker = False
+    assert col.proxy.CollectMetrics(
+        MetricsArg(snap.Metric(namespace=("acme", "pid"))).pb, None)
+    col._create_server()
+    try:
+        reply = collect(col, {})
+        assert reply.error == ""
+        pid = reply.metrics[0].int64_data
+        assert pid not in (0, os.getpid())
+        # the deadline of the request is passed to the worker
+        reply = collect(col, {"deadline": True}, 10)
+        assert 9 < reply.metrics[0].float64_data < 10
+        # a dead worker fails its request and the pool is started again
+        assert "worker process" in collect(col, {"crash": True}).error
+        reply = collect(col, {})
+        assert reply.error == ""
+        assert reply.metrics[0].int64_data not in (0, pid, os.getpid())
+    finally:
+        col.stop_plugin()
+
+
+def test_process_workers_unsupported(monkeypatch):
+    col = MockCollector("MyCollector", 99, process_workers=2)
+    monkeypatch.setattr("snap_plugin.v1.plugin.os.name", "nt")
+    with pytest.raises(ValueError) as err:
+        col._start_process_pool()
+    assert "POSIX" in str(err.value)
+    assert col._process_pool is None
+
+
+def test_catalog_cache_files(tmpdir, monkeypatch):
+    from snap_plugin.v1.catalog_cache import CatalogCache
+    from snap_plugin.v1.plugin_pb2 import ConfigMap as PbConfigMap
+    from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+    catalog = MetricsReply(metrics=[snap.Metric(namespace=("acme", "x")).pb])
+    cache = CatalogCache(10, max_size=2, path=str(tmpdir))
+    for value in range(3):
+        config = PbConfigMap()
+        config.IntMap["n"] = value
+        cache.get(config, lambda cfg: (catalog, True))
+        time.sleep(.01)
+    # the files of the configs no longer requested are removed
+    assert len(tmpdir.listdir()) == 2
+
+    def failing(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr("snap_plugin.v1.catalog_cache._replace", failing)
+    config = PbConfigMap()
+    config.IntMap["n"] = 3
+    cache.get(config, lambda cfg: (catalog, True))
+    # the temporary file isn't left behind
+    assert sorted(f.ext for f in tmpdir.listdir()) == [".catalog"] * 2
+
+
+def test_catalog_cache_failed_refresh(tmpdir, monkeypatch):
+    from snap_plugin.v1.catalog_cache import CatalogCache
+    from snap_plugin.v1.plugin_pb2 import ConfigMap as PbConfigMap
+    from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+    now = [100.0]
+    monkeypatch.setattr("snap_plugin.v1.catalog_cache._now", lambda: now[0])
+    config = PbConfigMap()
+    catalog = MetricsReply(metrics=[snap.Metric(namespace=("acme", "x")).pb])
+    CatalogCache(10, path=str(tmpdir)).get(config,
+                                            lambda cfg: (catalog, True))
+
+    # a restarted plugin whose catalog can't be built anymore
+    calls = []
+    refreshed = []
+
+    def failing(cfg):
+        calls.append(cfg)
+        refreshed.append(True)
+        return MetricsReply(error="catalog failed"), False
+    cache = CatalogCache(10, path=str(tmpdir))
+    assert cache.get(config, failing) == catalog.SerializeToString()
+    t_end = time.time() + 5
+    while (not refreshed or cache._refreshing) and time.time() < t_end:
+        time.sleep(.01)
+    # the disk copy is served until it expires, then the catalog is built
+    assert cache.get(config, failing) == catalog.SerializeToString()
+    assert len(calls) == 1
+    now[0] += 11
+    assert cache.get(config, failing).error == "catalog failed"
+    assert len(calls) == 2
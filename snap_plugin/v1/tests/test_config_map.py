@@ -17,7 +17,8 @@
 
 import pytest
 
-from snap_plugin.v1.config_map import ConfigMap
+from snap_plugin.v1.config_map import ConfigMap, FrozenConfigMap
+from snap_plugin.v1.plugin_pb2 import ConfigMap as PbConfigMap
 
 
 class TestConfigMap(object):
@@ -156,3 +157,72 @@ class TestConfigMap(object):
                         ("float", 1.1))
         (key, value) = cfg.popitem()
         assert len(cfg) == 3
+
+    def test_typed_get(self):
+        cfg = ConfigMap(int=1, string="asdf", bool=True, float=1.1)
+        assert cfg.get_int("int") == 1
+        assert cfg.get_str("string") == "asdf"
+        assert cfg.get_bool("bool") is True
+        assert cfg.get_float("float") == 1.1
+        assert cfg.get_int("missing") is None
+        assert cfg.get_int("missing", 5) == 5
+        with pytest.raises(TypeError):
+            cfg.get_int("string")
+        with pytest.raises(TypeError):
+            cfg.get_bool("int")
+
+    def test_type_change(self):
+        cfg = ConfigMap(key=1)
+        cfg["key"] = "one"
+        assert cfg["key"] == "one"
+        assert len(cfg) == 1
+        assert "key" not in cfg._pb.IntMap
+
+    def test_wrapped_pb(self):
+        cfg = ConfigMap(("int", 1), ("string", "asdf"))
+        wrapped = ConfigMap(pb=cfg.pb)
+        assert wrapped["int"] == 1 and wrapped["string"] == "asdf"
+        assert "float" not in wrapped
+        with pytest.raises(KeyError):
+            wrapped["float"]
+        assert sorted(wrapped.items()) == [("int", 1), ("string", "asdf")]
+        # lookups don't add keys to the protobuf maps
+        assert len(cfg.pb.FloatMap) == 0
+
+    def test_metric_config_from_config_map(self):
+        from snap_plugin.v1.metric import Metric
+        cfg = ConfigMap(("int", 1), ("string", "asdf"))
+        metric = Metric(config=cfg)
+        assert dict(metric.config.items()) == {"int": 1, "string": "asdf"}
+
+    def test_freeze(self):
+        cfg = ConfigMap(int=1, string="asdf", bool=True, float=1.1)
+        frozen = cfg.freeze()
+        assert frozen is FrozenConfigMap(("string", "asdf"), ("float", 1.1),
+                                         ("bool", True), ("int", 1))
+        assert frozen == {"int": 1, "string": "asdf", "bool": True,
+                          "float": 1.1}
+        assert {frozen: 1}[ConfigMap(**dict(cfg.items())).freeze()] == 1
+        assert frozen.get_int("int") == 1 and frozen.get_bool("bool") is True
+        with pytest.raises(TypeError):
+            frozen.get_str("int")
+        assert frozen.pb == cfg.pb
+        # the snapshot doesn't follow later changes, types are kept apart
+        cfg["int"] = 2
+        assert frozen["int"] == 1 and cfg.freeze() is not frozen
+        assert FrozenConfigMap(a=1) is not FrozenConfigMap(a=True)
+        assert len(frozen.fingerprint) == 40
+        assert frozen.fingerprint == FrozenConfigMap.from_pb(
+            PbConfigMap.FromString(frozen.pb.SerializeToString())).fingerprint
+
+    def test_metrics_by_config(self):
+        from snap_plugin.v1.metric import Metric
+        from snap_plugin.v1.metric_list import MetricList
+        metrics = MetricList(
+            Metric(namespace=("foo", str(i)), config={"host": host}).pb
+            for i, host in enumerate(["a", "b", "a", "a"]))
+        groups = metrics.by_config()
+        assert [(dict(cfg), [m.namespace[1].value for m in group])
+                for cfg, group in groups] == [({"host": "a"}, ["0", "2", "3"]),
+                                              ({"host": "b"}, ["1"])]
+        assert metrics[3].frozen_config is groups[0][0]
@@ -16,10 +16,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pytest
+
 from snap_plugin.v1.bool_policy import _BoolPolicy, BoolRule
+from snap_plugin.v1.config_map import ConfigMap
 from snap_plugin.v1.config_policy import ConfigPolicy
 from snap_plugin.v1.float_policy import _FloatPolicy, FloatRule
 from snap_plugin.v1.integer_policy import _IntegerPolicy, IntegerRule
+from snap_plugin.v1.metric import Metric
 from snap_plugin.v1.string_policy import _StringPolicy, StringRule
 
 
@@ -60,3 +64,47 @@ def test_config_policy():
         StringRule(default="asdf2", required=True),
     )
     assert len(cfg) == 5
+
+
+def test_compiled_policy():
+    policy = ConfigPolicy(
+        (None, (("host", StringRule(default="localhost")),)),
+        (("acme",), (("port", IntegerRule(default=80, minimum=1,
+                                          maximum=65535)),
+                     ("user", StringRule(required=True)))),
+        (("acme", "db"), (("port", IntegerRule(default=5432)),
+                          ("ratio", FloatRule(maximum=1.0)))),
+    ).compile()
+
+    config = ConfigMap(user="me").pb
+    assert policy.apply(config, ["acme", "db", "size"]) == []
+    # the longest namespace wins
+    assert dict(ConfigMap(pb=config).items()) == {
+        "host": "localhost", "port": 5432, "user": "me"}
+
+    config = ConfigMap(user="me").pb
+    assert policy.apply(config, ["acme", "web"]) == []
+    assert ConfigMap(pb=config)["port"] == 80
+
+    config = ConfigMap(port=0, ratio=2.0).pb
+    assert policy.apply(config, ["acme", "db"]) == [
+        "ratio is greater than the maximum 1.0", "user is required"]
+    assert policy.apply(ConfigMap(port=0).pb, ["acme"]) == [
+        "port is lower than the minimum 1", "user is required"]
+    assert policy.apply(ConfigMap(host=1).pb, ["other"]) == [
+        "host should be a string"]
+    # outcomes are remembered per config
+    config = ConfigMap(user="you").pb
+    assert policy.apply(config, ["acme"]) == []
+    assert ConfigMap(pb=config)["host"] == "localhost"
+
+
+def test_compiled_policy_metrics():
+    policy = ConfigPolicy(
+        (("acme",), (("user", StringRule(required=True)),))).compile()
+    metrics = [Metric(namespace=("acme", "x"), config={"user": "me"}).pb,
+               Metric(namespace=("other",)).pb]
+    policy.apply_metrics(metrics)
+    with pytest.raises(ValueError) as excinfo:
+        policy.apply_metrics([Metric(namespace=("acme", "y")).pb])
+    assert "acme/y" in str(excinfo.value)
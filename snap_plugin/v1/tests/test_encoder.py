@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.encoder import _metrics_reply, encode_metrics_reply
+from snap_plugin.v1.metric_list import MetricList, _extend_metrics
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+from snap_plugin.v1.timestamp import _reply_timestamp
+
+
+def _expected(metrics, error=""):
+    reply = MetricsReply(error=error)
+    _extend_metrics(reply.metrics, metrics)
+    return reply.SerializeToString(deterministic=True)
+
+
+def _metric(namespace, data, **kwargs):
+    return snap.Metric(namespace=namespace, data=data, **kwargs)
+
+
+@pytest.mark.parametrize("data", [
+    0, 1, -1, 127, 128, 2 ** 31, -2 ** 63, 2 ** 63 - 1,
+    0.0, -0.0, 1.5, -3.25, 1e300,
+    True, False,
+    "", "value", u"żółw",
+    b"", b"bytes",
+])
+def test_row_data(data):
+    row = snap.MetricRow(("intel", "data"), data, timestamp=1.25)
+    assert encode_metrics_reply([row]) == _expected(
+        [_metric(("intel", "data"), data, timestamp=1.25)])
+
+
+@pytest.mark.parametrize("timestamp", [0, 0.5, 1, 1500000000.123456,
+                                       -1.5])
+def test_row_timestamp(timestamp):
+    row = snap.MetricRow(("intel", "ts"), 1, timestamp=timestamp)
+    assert encode_metrics_reply([row]) == _expected(
+        [_metric(("intel", "ts"), 1, timestamp=timestamp)])
+
+
+def test_row_fields():
+    namespace = ("intel", snap.NamespaceElement(name="cpu", value="3",
+                                                description=u"cpü id"),
+                 "", "util")
+    kwargs = dict(timestamp=10.5, tags={"z": "1", "a": "", "": "x",
+                                        u"ключ": u"значение"},
+                  unit="percent", version=300, description="utilization")
+    row = snap.MetricRow(namespace, 99.5, **kwargs)
+    expected = _expected([_metric(list(namespace), 99.5, **kwargs)])
+    assert encode_metrics_reply([row]) == expected
+    # plain tuples laid out like a row
+    assert encode_metrics_reply([tuple(row)]) == expected
+
+
+def test_row_tags_from_generator():
+    # the tags dicts of a generator are freed as it goes and their ids reused
+    rows = (snap.MetricRow(("intel", "h"), i, timestamp=1,
+                           tags={"host": "h{}".format(i)}) for i in range(6))
+    reply = MetricsReply.FromString(encode_metrics_reply(rows))
+    assert [m.Tags["host"] for m in reply.metrics] == [
+        "h{}".format(i) for i in range(6)]
+
+
+def test_row_defaults(monkeypatch):
+    monkeypatch.setattr("snap_plugin.v1.metric._plugin_version", 7)
+    rows = [("intel", "a"), 1], [("intel", "b"), None]
+    with _reply_timestamp(12750000000):
+        assert encode_metrics_reply(rows) == _expected(
+            [_metric(("intel", "a"), 1),
+             snap.Metric(namespace=("intel", "b"))])
+
+
+def test_metrics_and_error():
+    metrics = [_metric(("intel", "a"), 1.5, tags={"b": "2", "a": "1"},
+                       config={"user": "root", "port": 22, "on": True,
+                               "ratio": 0.5}),
+               _metric(("intel", "b"), "x", unit="B")]
+    assert encode_metrics_reply(metrics) == _expected(metrics)
+    assert encode_metrics_reply(metrics, error="failed") == _expected(
+        metrics, error="failed")
+    assert encode_metrics_reply(error="failed") == _expected(
+        [], error="failed")
+    assert encode_metrics_reply() == b""
+
+
+def _batch(namespace, **kwargs):
+    return snap.MetricBatch(namespace=namespace, version=3,
+                            tags={"mtype": "gauge", "host": "a"},
+                            unit="percent", description="cpu",
+                            timestamp=10.5, **kwargs)
+
+
+@pytest.mark.parametrize("data", [
+    [1.5, 0.0, -2.0],
+    [0, -1, 2 ** 40],
+    [True, False, True],
+    ["a", "", u"ż"],
+])
+def test_batch(data):
+    namespace = [snap.NamespaceElement(value="intel"),
+                 snap.NamespaceElement(name="cpu", description="cpu id"),
+                 snap.NamespaceElement(value="util")]
+    batch = _batch(namespace, dynamic=["0", "", "2"], data=data)
+    assert encode_metrics_reply(batch) == _expected(batch)
+
+
+def test_batch_without_dynamic_element():
+    batch = _batch(("intel", "util"), data=[1, 2])
+    assert encode_metrics_reply(batch) == _expected(batch)
+    assert encode_metrics_reply(_batch(("intel", "util"))) == b""
+
+
+def test_batch_numpy():
+    numpy = pytest.importorskip("numpy")
+    batch = _batch(("intel", snap.NamespaceElement(name="id"), "util"),
+                   dynamic=numpy.arange(3),
+                   data=numpy.array([1, 2, 3], dtype=numpy.uint64))
+    assert encode_metrics_reply(batch) == _expected(batch)
+
+
+def test_mixed():
+    metric = _metric(("intel", "single"), "x", timestamp=1.0)
+    batch = _batch(("intel", snap.NamespaceElement(name="id"), "util"),
+                   dynamic=["0", "1"], data=[1.0, 2.0])
+    row = snap.MetricRow(("intel", "row"), 5, timestamp=2.0)
+    expected = _expected([metric, batch,
+                          _metric(("intel", "row"), 5, timestamp=2.0)])
+    assert encode_metrics_reply([metric, batch, row]) == expected
+
+
+def test_metrics_reply():
+    metrics = [_metric(("intel", "a"), 1)]
+    # plain metrics are still added to a MetricsReply
+    reply = _metrics_reply(metrics)
+    assert isinstance(reply, MetricsReply)
+    assert isinstance(_metrics_reply(MetricList(metrics)), MetricsReply)
+    # batches and rows are encoded
+    batch = _batch(("intel", "util"), data=[1])
+    assert _metrics_reply(batch) == _expected(batch)
+    assert _metrics_reply(iter(metrics + [batch])) == _expected(
+        metrics + [batch])
+    # ...also when appended to a MetricList
+    listed = MetricList([metrics[0].pb])
+    listed.append(batch)
+    row = snap.MetricRow(("intel", "row"), 5, timestamp=2.0)
+    listed.append(row)
+    assert _metrics_reply(listed) == _expected(
+        metrics + [batch, _metric(("intel", "row"), 5, timestamp=2.0)])
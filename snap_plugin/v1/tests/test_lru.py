@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from snap_plugin.v1.lru import _LRU
+
+
+def test_ttl_from_storage():
+    lru = _LRU(8, ttl=10)
+    lru.put("a", 1, 0)
+    lru.put("b", 2, 5)
+    # a hit doesn't make an entry younger...
+    assert lru.get("a", 8) == 1
+    # ...but the most recently used, which expire doesn't stop at
+    assert lru.expire(12) == [1]
+    assert lru.get("a", 12) is None
+    assert (lru.hits, lru.misses, lru.evictions) == (1, 1, 1)
+    # a stale entry is a miss until it's replaced
+    assert lru.get("b", 16) is None and "b" in lru
+    assert lru.put("b", 3, 16) == [2]
+    assert lru.get("b", 16) == 3
+
+
+def test_idle_ttl():
+    lru = _LRU(8, ttl=10, idle=True)
+    lru.put("a", 1, 0)
+    assert lru.get("a", 8) == 1
+    assert lru.expire(15) == []
+    assert lru.expire(19) == [1]
+
+
+def test_eviction_and_pins():
+    lru = _LRU(2, ttl=10)
+    lru.put("a", 1, 0, pinned=True)
+    lru.put("b", 2, 0)
+    # pinned entries don't go stale but are evicted like the others
+    assert lru.expire(20) == [2]
+    assert lru.pinned("a") and lru.get("a", 20) == 1
+    lru.unpin("a")
+    assert lru.peek("a", 20) is None
+    lru.put("b", 2, 20)
+    assert lru.put("c", 3, 20) == [1]
+    assert lru.pop("b") == 2 and lru.clear() == [3]
+    with pytest.raises(ValueError):
+        _LRU(0)
@@ -152,3 +152,104 @@ class TestMetric(object):
         # verify an error is not raised
         # https://github.com/intelsdi-x/snap-plugin-lib-py/issues/12
         repr(m.config)
+
+    def test_metric_wrappers(self):
+        m = Metric(namespace=("foo", "bar"), config={"int": 1}, timestamp=1.5)
+        for obj in (m, m.namespace, m.namespace[0], m.config, m._timestamp):
+            assert not hasattr(obj, "__dict__")
+        assert m._pb.LastAdvertisedTime.sec == 1
+        assert m._pb.LastAdvertisedTime.nsec == 500000000
+
+        # wrapping a pb must not touch it and creates no wrappers up front
+        wrapped = Metric(pb=m.pb)
+        assert wrapped._namespace is None
+        assert wrapped._config is None
+        assert wrapped._timestamp is None
+        assert wrapped.timestamp == 1.5
+        assert wrapped._timestamp.sec == 1
+        assert wrapped.namespace[1].value == "bar"
+        assert wrapped.config["int"] == 1
+
+    def test_constructor_defaults(self):
+        before = time.time()
+        m = Metric()
+        assert before <= m.timestamp <= time.time()
+        assert m.pb.LastAdvertisedTime == m.pb.Timestamp
+        assert m.tags is not Metric().tags
+
+        # the default version is the one declared by the plugin's Meta
+        import snap_plugin.v1 as snap
+        from snap_plugin.v1 import metric
+        from snap_plugin.v1.plugin import Meta, PluginType
+        saved = metric._plugin_version, snap.PLUGIN_VERSION
+        try:
+            Meta(PluginType.collector, "test", 7)
+            assert Metric().version == 7
+            assert Metric(version=2).version == 2
+        finally:
+            metric._set_plugin_version(saved[0])
+            snap.PLUGIN_VERSION = saved[1]
+
+    def test_timestamp_ns(self):
+        m = Metric(timestamp_ns=1500000000123456789)
+        assert m.timestamp_ns == 1500000000123456789
+        assert m.pb.Timestamp.sec == 1500000000
+        assert m.pb.Timestamp.nsec == 123456789
+        assert m.pb.LastAdvertisedTime == m.pb.Timestamp
+        m.timestamp_ns = 2500000001
+        assert m.timestamp == 2.500000001
+        m.timestamp = 1.5
+        assert m.timestamp_ns == 1500000000
+        assert Metric(timestamp=1.25).timestamp_ns == 1250000000
+
+    def test_reply_timestamp(self):
+        from snap_plugin.v1 import MetricBatch, MetricPrototype
+        from snap_plugin.v1.timestamp import _reply_timestamp
+        with _reply_timestamp(42 * 10 ** 9):
+            metrics = [Metric(), Metric(namespace=("foo",), data=1),
+                       MetricPrototype(Metric(namespace=("foo",))).new(2)]
+            metrics.extend(MetricBatch(namespace=("foo",), data=[3]))
+            explicit = Metric(timestamp=1.5)
+        for m in metrics:
+            assert m.timestamp_ns == 42 * 10 ** 9
+            assert m.pb.LastAdvertisedTime.sec == 42
+        assert explicit.timestamp == 1.5
+        assert Metric().timestamp != 42
+
+    def test_expand(self):
+        metric = Metric(namespace=[
+            "intel", NamespaceElement(name="cpu", description="cpu id"),
+            "util"], tags={"a": "b"})
+        metrics = list(metric.expand(["0", 1]))
+        assert [m.namespace.key for m in metrics] == \
+            ["/intel/0/util", "/intel/1/util"]
+        assert metrics[1].namespace[1].name == "cpu"
+        assert metrics[1].tags["a"] == "b"
+        # the expanded metric is left untouched
+        assert metric.namespace.key == "/intel/*/util"
+
+        metric = Metric(namespace=[
+            "intel", NamespaceElement(name="cpu"), "core",
+            NamespaceElement(name="core"), "util"])
+        assert metric.namespace.dynamic_indexes() == [1, 3]
+        keys = [m.namespace.key for m in metric.expand(range(2), "ab")]
+        assert keys == ["/intel/0/core/a/util", "/intel/0/core/b/util",
+                        "/intel/1/core/a/util", "/intel/1/core/b/util"]
+        keys = [m.namespace.key for m in metric.expand([(0, "x")])]
+        assert keys == ["/intel/0/core/x/util"]
+        with pytest.raises(ValueError):
+            list(metric.expand(["0"]))
+        with pytest.raises(ValueError):
+            list(metric.expand([0]))
+        with pytest.raises(ValueError):
+            Metric(namespace=["intel", "util"]).expand([1])
+
+    def test_constructor_validate(self):
+        with pytest.raises(TypeError):
+            Metric(namespace="foo")
+        with pytest.raises(TypeError):
+            Metric(tags=[("key", "value")])
+        kwargs = dict(namespace=[NamespaceElement(value="foo"), "bar"],
+                      version=1, tags={"key": "value"}, config={"int": 1},
+                      timestamp=1.5, unit="b", description="d", data=2.5)
+        assert Metric(validate=False, **kwargs).pb == Metric(**kwargs).pb
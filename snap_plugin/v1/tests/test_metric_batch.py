@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.encoder import encode_metrics_reply
+from snap_plugin.v1.metric_list import _extend_metrics
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+
+def _batch(**kwargs):
+    return snap.MetricBatch(
+        namespace=[snap.NamespaceElement(value="intel"),
+                   snap.NamespaceElement(name="cpu", description="cpu id"),
+                   snap.NamespaceElement(value="util")],
+        version=1,
+        tags={"mtype": "gauge"},
+        unit="percent",
+        timestamp=10.5,
+        **kwargs)
+
+
+def test_batch_rows():
+    batch = _batch(dynamic=["0", "1", "2"], data=[1.5, 2.5, 3.5])
+    assert len(batch) == 3
+    metrics = list(batch)
+    assert [m.namespace[1].value for m in metrics] == ["0", "1", "2"]
+    assert [m.data for m in metrics] == [1.5, 2.5, 3.5]
+    for m in metrics:
+        assert m.namespace[1].name == "cpu"
+        assert m.tags["mtype"] == "gauge"
+        assert m.unit == "percent"
+        assert m.version == 1
+        assert m.timestamp == 10.5
+    # the template keeps the wildcard
+    assert batch.template.Namespace[1].Value == "*"
+
+
+def test_batch_matches_metrics():
+    batch = _batch(dynamic=["0", "1"], data=[7, 8])
+    expected = MetricsReply()
+    for dyn, value in zip(batch.dynamic, batch.data):
+        metric = snap.Metric(
+            namespace=[snap.NamespaceElement(value="intel"),
+                       snap.NamespaceElement(name="cpu", description="cpu id",
+                                             value=dyn),
+                       snap.NamespaceElement(value="util")],
+            version=1, tags={"mtype": "gauge"}, unit="percent",
+            timestamp=10.5, data=value)
+        expected.metrics.add().CopyFrom(metric.pb)
+    reply = MetricsReply()
+    _extend_metrics(reply.metrics, batch)
+    assert reply == expected
+
+
+def test_mixed_reply():
+    single = snap.Metric(namespace=("intel", "single"), data="x")
+    reply = MetricsReply()
+    _extend_metrics(reply.metrics,
+                    [single, _batch(dynamic=["0", "1"], data=[True, False]),
+                     single])
+    assert len(reply.metrics) == 4
+    assert [m.WhichOneof("data") for m in reply.metrics] == [
+        "string_data", "bool_data", "bool_data", "string_data"]
+
+
+def test_batch_errors():
+    with pytest.raises(ValueError):
+        _batch(dynamic=["0"], data=[1, 2])
+    with pytest.raises(ValueError):
+        snap.MetricBatch(namespace=("intel", "static"), dynamic=["0"], data=[1])
+    with pytest.raises(ValueError):
+        snap.MetricBatch(
+            namespace=[snap.NamespaceElement(name="a", description=""),
+                       snap.NamespaceElement(name="b", description="")],
+            dynamic=["0"], data=[1])
+    with pytest.raises(ValueError):
+        _batch(dynamic=["0", "1"], data=[1, "2"])
+    # no dynamic element: one row per value
+    batch = snap.MetricBatch(namespace=("intel", "static"), data=[1, 2])
+    assert [m.data for m in batch] == [1, 2]
+    assert len(batch.template.Tags) == 0
+
+
+def test_mixed_numbers():
+    batch = _batch(dynamic=["0", "1"], data=[1, 2.5])
+    assert [m.data for m in batch] == [1.0, 2.5]
+    assert [m.pb.WhichOneof("data") for m in batch] == ["float64_data"] * 2
+    reply = MetricsReply.FromString(encode_metrics_reply(batch))
+    assert [m.float64_data for m in reply.metrics] == [1.0, 2.5]
+
+
+def test_numpy_columns():
+    numpy = pytest.importorskip("numpy")
+    for array, field in ((numpy.array([1.5, 2.5]), "float64_data"),
+                         (numpy.array([-1, 2], dtype=numpy.int32), "int64_data"),
+                         (numpy.array([1, 2 ** 63], dtype=numpy.uint64),
+                          "uint64_data"),
+                         (numpy.array([True, False]), "bool_data")):
+        batch = _batch(dynamic=numpy.arange(2), data=array)
+        reply = MetricsReply()
+        _extend_metrics(reply.metrics, batch)
+        assert [m.WhichOneof("data") for m in reply.metrics] == [field, field]
+        assert [getattr(m, field) for m in reply.metrics] == array.tolist()
+        assert [m.Namespace[1].Value for m in reply.metrics] == ["0", "1"]
+
+    with pytest.raises(ValueError):
+        _batch(dynamic=["0"], data=numpy.zeros((1, 1)))
+    with pytest.raises(TypeError):
+        _batch(dynamic=["0"], data=numpy.array([1j]))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from snap_plugin.v1 import Metric, MetricBatch, MetricList, MetricRow
+from snap_plugin.v1.plugin_pb2 import MetricsArg
+
+
+def _request(count):
+    return MetricsArg(metrics=[Metric(namespace=("foo", str(i)), data=i).pb
+                               for i in range(count)])
+
+
+def test_lazy_wrapping():
+    request = _request(3)
+    metrics = MetricList(request.metrics)
+    assert len(metrics) == 3
+    assert not any(isinstance(item, Metric) for item in metrics._items)
+
+    metric = metrics[1]
+    assert isinstance(metric, Metric)
+    assert metric.data == 1
+    assert metric.namespace[1].value == "1"
+    # the wrapper is kept so state set through it survives
+    assert metrics[1] is metric
+    assert isinstance(metrics._items[1], Metric)
+    assert not isinstance(metrics._items[0], Metric)
+
+    # reading the pbs doesn't wrap anything
+    assert metrics.pbs == list(request.metrics)
+    assert not isinstance(metrics._items[2], Metric)
+
+
+def test_list_operations():
+    metrics = MetricList(_request(2).metrics)
+    extra = Metric(namespace=("bar",), data="baz")
+    metrics.append(extra)
+    assert len(metrics) == 3
+    assert metrics[-1] is extra
+    assert metrics.pbs[-1] is extra.pb
+
+    del metrics[0]
+    assert [m.data for m in metrics] == [1, "baz"]
+
+    sliced = metrics[:1]
+    assert isinstance(sliced, MetricList)
+    assert len(sliced) == 1
+
+
+def test_list_methods():
+    metrics = MetricList(_request(3).metrics)
+    metrics.sort(key=lambda m: m.data, reverse=True)
+    assert [m.data for m in metrics] == [2, 1, 0]
+    copy = metrics.copy()
+    assert isinstance(copy, MetricList) and copy == metrics
+    del copy[0]
+    assert len(metrics) == 3
+    extra = [Metric(namespace=("bar",), data=3)]
+    joined = metrics + extra
+    assert isinstance(joined, MetricList)
+    assert [m.data for m in joined] == [2, 1, 0, 3]
+    assert [m.data for m in extra + metrics] == [3, 2, 1, 0]
+    assert metrics == list(metrics) and metrics != extra
+
+
+def test_batches_and_rows():
+    metrics = MetricList(_request(1).metrics)
+    batch = MetricBatch(namespace=("foo", "*"), dynamic=["a"], data=[1])
+    row = MetricRow(("foo", "b"), 2)
+    metrics.append(batch)
+    metrics.insert(0, row)
+    assert list(metrics)[0] is row
+    assert list(metrics)[2] is batch
+    assert metrics[1].data == 0
+    with pytest.raises(TypeError):
+        metrics.pbs
+
+
+def test_data_type():
+    for value, field in ((1.5, "float64_data"), (7, "int64_data"),
+                         ("s", "string_data"), (True, "bool_data")):
+        metric = Metric(pb=Metric(data=value).pb)
+        assert metric.pb.WhichOneof("data") == field
+        assert metric.data == value
+        assert metric._data_type is type(value)
+    assert Metric(pb=Metric().pb).data is None
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from snap_plugin.v1 import Metric, MetricPrototype, NamespaceElement
+
+
+def _catalog_metric():
+    return Metric(namespace=[NamespaceElement(value="acme"),
+                             NamespaceElement(value="sk8"),
+                             NamespaceElement(value="rotations")],
+                  version=3,
+                  tags={"mtype": "gauge"},
+                  config={"user": "root"},
+                  unit="rpm",
+                  description="Rotation count",
+                  timestamp=5.0,
+                  data=1)
+
+
+def test_prototype():
+    proto = MetricPrototype(_catalog_metric())
+    assert proto.pb.WhichOneof("data") is None
+    assert not proto.pb.HasField("Timestamp")
+
+    metric = proto.new(42.5, timestamp=10.25)
+    expected = _catalog_metric()
+    expected.data = 42.5
+    expected.timestamp = 10.25
+    expected.pb.LastAdvertisedTime.CopyFrom(expected.pb.Timestamp)
+    assert metric.pb == expected.pb
+    assert metric.data == 42.5
+    assert metric.timestamp == 10.25
+    assert metric.namespace[2].value == "rotations"
+    assert metric.config["user"] == "root"
+
+
+def test_prototype_copies():
+    proto = MetricPrototype(_catalog_metric())
+    first = proto.new("a")
+    second = proto.new(7)
+    first.namespace[0].value = "changed"
+    first.tags["extra"] = "tag"
+    assert second.namespace[0].value == "acme"
+    assert "extra" not in second.tags
+    assert proto.pb.Namespace[0].Value == "acme"
+    assert first.timestamp > 0
+    assert proto.new().data is None
@@ -16,6 +16,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pytest
+
 from snap_plugin.v1.namespace import Namespace
 from snap_plugin.v1.namespace_element import NamespaceElement
 from snap_plugin.v1.plugin_pb2 import Metric
@@ -60,3 +62,40 @@ def test_namespace():
     assert len(ns3) == 2
     assert ns3[0].value == "runc"
     assert ns3[1].value == "libcontainer"
+
+
+def test_namespace_key():
+    ns = Namespace(Metric().Namespace, "intel", "cpu", "util")
+    assert ns.key == "/intel/cpu/util"
+    assert repr(ns) == ns.key
+    assert repr(Namespace(Metric().Namespace)) == ""
+    # the separator is the first one not found in any value
+    assert repr(Namespace(Metric().Namespace, "a/b", "c|d", "e")) == \
+        "%a/b%c|d%e"
+
+    # the key follows changes made through the namespace and its elements
+    ns[1].value = "mem"
+    assert ns.key == "/intel/mem/util"
+    ns.add_static_element("x/y")
+    assert ns.key == "|intel|mem|util|x/y"
+    ns.pop()
+    del ns[0]
+    assert ns.key == "/mem/util"
+    ns.add(NamespaceElement(name="id", description="id"))
+    assert ns.key == "/mem/util/*"
+
+
+def test_namespace_hash_and_from_string():
+    ns = Namespace(Metric().Namespace, "intel",
+                   NamespaceElement(name="id", value="3"), "util")
+    parsed = Namespace.from_string("/intel/3/util")
+    assert [parsed[i].value for i in range(len(parsed))] == \
+        ["intel", "3", "util"]
+    assert parsed == ns
+    assert parsed != Namespace.from_string("/intel/4/util")
+    assert {ns.key: 1}[parsed.key] == 1
+    # mutable, so indexed by key only
+    with pytest.raises(TypeError):
+        hash(ns)
+    for key in ("", "/a", "|a/b|c", "/a//b"):
+        assert Namespace.from_string(key).key == key
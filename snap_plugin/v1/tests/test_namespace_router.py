@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.metrics_arg import MetricsArg
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+from .mock_plugins import MockCollector
+
+
+def _metrics(*keys):
+    return snap.MetricList(
+        snap.Metric(namespace=key[1:].split(key[0])).pb
+        for key in keys)
+
+
+def test_match():
+    router = snap.NamespaceRouter()
+    router.add(("intel", "cpu", "*", "util"), "cpu")
+    router.add("/intel/cpu/all/util", "all")
+    router.add(("intel", "*"), "short")
+    assert len(router) == 3
+    assert router.match(["intel", "cpu", "3", "util"]) == "cpu"
+    assert router.match(["intel", "cpu", "*", "util"]) == "cpu"
+    # exact elements win over wildcards
+    assert router.match(["intel", "cpu", "all", "util"]) == "all"
+    assert router.match(["intel", "mem"]) == "short"
+    # the wildcard is tried when the exact path leads nowhere
+    assert router.match(["intel", "cpu"]) == "short"
+    assert router.match(["intel", "cpu", "3"]) is None
+    assert router.match(["intel", "cpu", "3", "util", "x"]) is None
+    with pytest.raises(ValueError):
+        router.add("/intel/*", "again")
+
+
+def test_dispatch():
+    calls = []
+
+    def handler(name):
+        def _handler(metrics):
+            calls.append((name, [repr(m.namespace) for m in metrics]))
+            return metrics
+        return _handler
+
+    router = snap.NamespaceRouter()
+    router.add("/a/*", handler("a"))
+    router.add("/b/c", handler("b"))
+    metrics = _metrics("/a/1", "/b/c", "/x/y", "/a/2")
+    collected = router.dispatch(metrics, handler("default"))
+    assert calls == [("a", ["/a/1", "/a/2"]), ("b", ["/b/c"]),
+                     ("default", ["/x/y"])]
+    assert [repr(m.namespace) for m in collected] == \
+        ["/a/1", "/a/2", "/b/c", "/x/y"]
+
+    # the default is only called for unmatched metrics
+    del calls[:]
+    router.dispatch(_metrics("/b/c"), handler("default"))
+    assert calls == [("b", ["/b/c"])]
+
+
+def test_collector_handlers():
+    col = MockCollector("MyCollector", 99)
+
+    def batch(metrics):
+        return snap.MetricBatch(namespace=("acme", "batch"), data=[1.5])
+
+    def rows(metrics):
+        return [snap.MetricRow(("acme", "row", m.namespace[2].value), 2)
+                for m in metrics]
+    col.add_handler(("acme", "batch"), batch)
+    col.add_handler(("acme", "row", "*"), rows)
+    request = MetricsArg(*[snap.Metric(namespace=ns) for ns in
+                           [("acme", "row", "1"), ("acme", "batch"),
+                            ("acme", "row", "2")]]).pb
+    # rows are encoded straight into the serialized reply
+    reply = MetricsReply.FromString(col.proxy.CollectMetrics(request, None))
+    assert reply.error == ""
+    assert [[nse.Value for nse in m.Namespace] for m in reply.metrics] == [
+        ["acme", "row", "1"], ["acme", "row", "2"], ["acme", "batch"]]
+
+
+def test_collector_group_by():
+    import threading
+    import time
+
+    class GroupCollector(MockCollector):
+        def collect(self, metrics):
+            calls.append(([repr(m.namespace) for m in metrics],
+                          threading.current_thread().name))
+            time.sleep(.2)
+            # created in the group's thread, stamped with the request time
+            return [snap.Metric(namespace=[e.value for e in m.namespace],
+                                data=1)
+                    for m in metrics]
+
+    calls = []
+    col = GroupCollector("MyCollector", 99, reply_timestamp=True)
+    col.group_by(2, max_workers=3)
+    request = MetricsArg(*[snap.Metric(namespace=ns.split("/")) for ns in
+                           ["a/x/1", "b/x/1", "a/x/2", "c/x/1"]]).pb
+    start = time.time()
+    reply = col.proxy.CollectMetrics(request, None)
+    elapsed = time.time() - start
+    assert reply.error == ""
+    # the groups are collected at once and merged in request order
+    assert elapsed < .5
+    assert sorted(ns for ns, _ in calls) == [
+        ["/a/x/1", "/a/x/2"], ["/b/x/1"], ["/c/x/1"]]
+    assert len(set(thread for _, thread in calls)) == 3
+    assert [[nse.Value for nse in m.Namespace] for m in reply.metrics] == [
+        ["a", "x", "1"], ["a", "x", "2"], ["b", "x", "1"], ["c", "x", "1"]]
+    assert len(set((m.Timestamp.sec, m.Timestamp.nsec)
+                   for m in reply.metrics)) == 1
+
+    # a config key, within the groups of the handlers
+    metrics = snap.MetricList([
+        snap.Metric(namespace=("a", str(i)),
+                    config={"host": "h{}".format(i % 2)})
+        for i in range(4)])
+    groups = metrics.group_by(lambda m: m.config["host"])
+    assert [(host, len(group)) for host, group in groups] == [("h0", 2),
+                                                              ("h1", 2)]
+    col.add_handler("/a/*", col.collect)
+    col.group_by("host")
+    del calls[:]
+    col.proxy.CollectMetrics(MetricsArg(*metrics).pb, None)
+    assert len(calls) == 2
+
+    with pytest.raises(TypeError):
+        col.group_by(1.5)
+    col.group_by(None)
+    assert col._group_executor is None
+    col.stop_plugin()
+
+
+class _Context(object):
+    """The part of grpc.ServicerContext read by the collector proxy"""
+
+    def __init__(self, time_remaining):
+        self._time_remaining = time_remaining
+
+    def time_remaining(self):
+        return self._time_remaining
+
+
+def test_collect_deadline():
+    import time
+
+    class SlowCollector(MockCollector):
+        def collect(self, metrics):
+            remaining.append(snap.Deadline.current().time_remaining)
+            if metrics[0].namespace[1].value == "slow":
+                time.sleep(1)
+            return [snap.MetricRow(("acme", m.namespace[1].value), 1)
+                    for m in metrics]
+
+    remaining = []
+    col = SlowCollector("MyCollector", 99)
+    col.group_by(2)
+    request = MetricsArg(*[snap.Metric(namespace=("acme", name))
+                           for name in ("fast", "slow", "quick")]).pb
+    start = time.time()
+    reply = MetricsReply.FromString(
+        col.proxy.CollectMetrics(request, _Context(.3)))
+    # the groups collected by the deadline are returned without the slow one
+    assert time.time() - start < .8
+    assert reply.error == ""
+    assert [m.Namespace[1].Value for m in reply.metrics] == ["fast", "quick"]
+    assert len(remaining) == 3
+    assert all(0 < r <= .3 for r in remaining)
+
+    # nothing collected in time
+    request = MetricsArg(snap.Metric(namespace=("acme", "slow"))).pb
+    reply = col.proxy.CollectMetrics(request, _Context(.1))
+    assert "deadline" in reply.error
+
+    # no deadline, nothing left out
+    assert snap.Deadline.current().time_remaining is None
+    assert not snap.Deadline.current().expired
+    reply = MetricsReply.FromString(col.proxy.CollectMetrics(
+        MetricsArg(*[snap.Metric(namespace=("acme", name))
+                     for name in ("slow", "fast")]).pb, _Context(None)))
+    assert len(reply.metrics) == 2
+    col.stop_plugin()
+
+
+def test_collect_now_uses_handlers():
+    col = MockCollector("MyCollector", 99)
+    col.add_handler("/acme/row/*", lambda metrics: [
+        snap.MetricRow(("acme", "row", m.namespace[2].value), 7)
+        for m in metrics])
+    collected = col._collect_now([snap.Metric(namespace=("acme", "row", "1")),
+                                  snap.Metric(namespace=("acme", "other"))])
+    assert [(repr(m.namespace), m.data) for m in collected] == [
+        ("/acme/row/1", 7), ("/acme/other", 99.9)]
+
+
+def test_stuck_groups_release_the_pool():
+    import threading
+
+    release = threading.Event()
+
+    class HangingCollector(MockCollector):
+        def collect(self, metrics):
+            if metrics[0].namespace[1].value == "hung":
+                release.wait(5)
+            return [snap.MetricRow(("acme", m.namespace[1].value), 1)
+                    for m in metrics]
+
+    col = HangingCollector("MyCollector", 99)
+    col.group_by(2, max_workers=2)
+    request = MetricsArg(*[snap.Metric(namespace=("acme", name))
+                           for name in ("hung", "ok")]).pb
+    try:
+        for _ in range(3):
+            # without a new pool the threads would all be stuck on "hung"
+            reply = MetricsReply.FromString(
+                col.proxy.CollectMetrics(request, _Context(.2)))
+            assert [m.Namespace[1].Value for m in reply.metrics] == ["ok"]
+        assert col._group_executor.replaced == 3
+    finally:
+        release.set()
+        col.stop_plugin()
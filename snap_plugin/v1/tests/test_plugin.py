@@ -85,7 +85,7 @@ def _test_tls_bad_file_raises_exc(plugin):
 
 def test_tls():
     # Generate a derived type of Plugin for testing purposes
-    derived = type('Derived', (Plugin,), {'get_config_policy': None})
+    derived = type('Derived', (Plugin,), {'get_config_policy': None, '_add_servicer': None})
 
     def override(self):
         return ""
@@ -137,7 +137,7 @@ def test_tls_emits_valid_meta(data_id, tmpdir):
     preamble_output = tls_emits_valid_meta_output[data_id]
     sys.argv = args_input
     # Generate a derived type of Plugin for testing purposes, skip generating tls credentials with its file checking
-    derived = type('Derived', (Plugin,), {'get_config_policy': None, '_generate_tls_credentials': None})
+    derived = type('Derived', (Plugin,), {'get_config_policy': None, '_add_servicer': None, '_generate_tls_credentials': None})
 
     def override(self):
         return ""
@@ -193,7 +193,7 @@ def test_tls_reads_root_certs(tmpdir, data_id):
     rootpaths, rawfiles = _make_root_cert_files(tls_reads_root_certs_input_rootpaths[data_id], basedir=str(tmpdir.dirpath()))
     badfile = tls_reads_root_certs_output_badfile[data_id]
 
-    derived = type('Derived', (Plugin,), {'get_config_policy': None})
+    derived = type('Derived', (Plugin,), {'get_config_policy': None, '_add_servicer': None})
 
     def override(self):
         return ""
@@ -272,3 +272,99 @@ def test_standalone(capsys, caplog):
     assert caplog.records[0].levelno == 40
 
     col.standalone_server.shutdown()
+
+
+def test_server_settings():
+    col = MockCollector("MyCollector", 1, concurrency_count=8)
+    assert col.server is None
+    assert col._server_settings() == (8, None, [])
+    col.meta.worker_count = 4
+    col.meta.grpc_options = [("grpc.so_reuseport", 0)]
+    assert col._server_settings() == (4, None, [("grpc.so_reuseport", 0)])
+    # command line flags override the meta
+    sys.argv = ["", "--stand-alone", "--worker-count", "16",
+                "--max-concurrent-rpcs", "32",
+                "--grpc-options", '{"grpc.max_receive_message_length": 1024}']
+    col._parse_args()
+    assert col._server_settings() == (
+        16, 32, [("grpc.max_receive_message_length", 1024)])
+    server = col._create_server()
+    server.stop(0)
+
+
+def test_control_lane_unsupported(monkeypatch, caplog):
+    monkeypatch.setattr("snap_plugin.v1.plugin._per_method_pools",
+                        lambda: False)
+    col = MockCollector("MyCollector", 1)
+    server = col._create_server()
+    server.stop(0)
+    col._control.shutdown(wait=False)
+    assert any("pings may wait" in record.getMessage()
+               for record in caplog.records)
+
+
+def test_control_lane():
+    import grpc
+    import threading
+
+    import snap_plugin.v1 as snap
+    from snap_plugin.v1.metrics_arg import MetricsArg
+    from snap_plugin.v1.plugin_pb2 import CollectorStub, Empty
+
+    release = threading.Event()
+    from snap_plugin.v1.servicers import _per_method_pools
+    if not _per_method_pools():
+        pytest.skip("this grpcio serves pings on the worker threads")
+
+    col = MockCollector("MyCollector", 1, worker_count=1)
+    col.collect = lambda metrics: release.wait(5) and metrics
+    col.server = col._create_server()
+    port = col.server.add_insecure_port("127.0.0.1:0")
+    col.server.start()
+    try:
+        stub = CollectorStub(grpc.insecure_channel("127.0.0.1:{}".format(port)))
+        request = MetricsArg(snap.Metric(namespace=("acme", "sk8"))).pb
+        collects = [stub.CollectMetrics.future(request) for _ in range(2)]
+        # the only worker is busy, pings are still answered
+        stub.Ping(Empty(), timeout=2)
+        assert not any(future.done() for future in collects)
+        assert col.ping_stats.count == 1 and col.ping_stats.max < 2
+        release.set()
+        assert all(future.result(timeout=5).error == "" for future in collects)
+    finally:
+        release.set()
+        col.stop_plugin()
+
+
+def test_max_rpcs_keeps_room_for_pings():
+    import grpc
+    import threading
+
+    import snap_plugin.v1 as snap
+    from snap_plugin.v1.metrics_arg import MetricsArg
+    from snap_plugin.v1.plugin_pb2 import CollectorStub, Empty
+
+    release = threading.Event()
+    col = MockCollector("MyCollector", 1, worker_count=2,
+                        maximum_concurrent_rpcs=1)
+    col.collect = lambda metrics: release.wait(5) and metrics
+    col.server = col._create_server()
+    port = col.server.add_insecure_port("127.0.0.1:0")
+    col.server.start()
+    try:
+        stub = CollectorStub(grpc.insecure_channel("127.0.0.1:{}".format(port)))
+        request = MetricsArg(snap.Metric(namespace=("acme", "sk8"))).pb
+        busy = stub.CollectMetrics.future(request)
+        time.sleep(.2)
+        # the plugin requests are limited, the pings aren't
+        with pytest.raises(grpc.RpcError) as err:
+            stub.CollectMetrics(request, timeout=2)
+        assert err.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        stub.Ping(Empty(), timeout=2)
+        release.set()
+        assert busy.result(timeout=5).error == ""
+        # the slot is free again
+        assert stub.CollectMetrics(request, timeout=2).error == ""
+    finally:
+        release.set()
+        col.stop_plugin()
@@ -23,7 +23,7 @@ import grpc
 import pytest
 
 import snap_plugin.v1 as snap
-from snap_plugin.v1.plugin_pb2 import ProcessorStub, Empty
+from snap_plugin.v1.plugin_pb2 import Empty, GetConfigPolicyReply, ProcessorStub
 from snap_plugin.v1.pub_proc_arg import _ProcessArg
 
 from . import ThreadPrinter
@@ -82,3 +82,36 @@ def test_get_config_policy(processor_client):
     reply = processor_client.GetConfigPolicy(Empty())
     assert reply.error == ""
     assert reply.string_policy[""].rules["some-config"].default == "some-value"
+
+
+def test_apply_config_policy():
+    proc = MockProcessor("MyProcessor", 1)
+    request = _ProcessArg(metrics=[snap.Metric(namespace=("foo",))],
+                          config=snap.ConfigMap(foo="bar")).pb
+    reply = proc.proxy.Process(request, None)
+    assert "some-config" not in reply.metrics[0].Tags
+    proc.meta.apply_config_policy = True
+    reply = proc.proxy.Process(request, None)
+    assert reply.error == ""
+    assert reply.metrics[0].Tags["some-config"] == "some-value"
+    assert reply.metrics[0].Tags["foo"] == "bar"
+
+
+def test_config_policy_cached():
+    proc = MockProcessor("MyProcessor", 1)
+    calls = []
+    get_config_policy = proc.get_config_policy
+
+    def counting():
+        calls.append(1)
+        return get_config_policy()
+    proc.get_config_policy = counting
+    reply = proc.proxy.GetConfigPolicy(Empty(), None)
+    assert proc.proxy.GetConfigPolicy(Empty(), None) is reply
+    assert len(calls) == 1
+    policy = GetConfigPolicyReply.FromString(reply)
+    assert policy.string_policy[""].rules["some-config"].default == \
+        "some-value"
+    proc.invalidate_config_policy()
+    proc.proxy.GetConfigPolicy(Empty(), None)
+    assert len(calls) == 2
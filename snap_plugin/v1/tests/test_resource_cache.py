@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import snap_plugin.v1 as snap
+
+from .mock_plugins import MockCollector
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru():
+    closed = []
+    cache = snap.ResourceCache(max_size=2, close=closed.append)
+    configs = [snap.ConfigMap(host=host) for host in "abc"]
+    for config in configs:
+        assert cache.get(config, lambda cfg: cfg["host"]) == config["host"]
+    assert closed == ["a"] and len(cache) == 2
+    # a hit makes "b" the most recently used entry
+    assert cache.get({"host": "b"}, None) == "b"
+    cache.get(snap.FrozenConfigMap(host="d"), lambda cfg: "d")
+    assert closed == ["a", "c"]
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 4, 2)
+    assert configs[1] in cache and configs[2] not in cache
+    assert cache.pop(configs[1]) and not cache.pop(configs[1])
+    cache.clear()
+    assert closed == ["a", "c", "b", "d"] and len(cache) == 0
+    with pytest.raises(ValueError):
+        snap.ResourceCache(max_size=0)
+
+
+def test_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("snap_plugin.v1.resource_cache._now", clock)
+    closed = []
+    cache = snap.ResourceCache(ttl=10, close=closed.append)
+    cache.get({"n": 1}, lambda cfg: 1)
+    clock.now += 5
+    cache.get({"n": 2}, lambda cfg: 2)
+    clock.now += 6
+    assert cache.get({"n": 2}, None) == 2
+    assert cache.expire() == 1 and closed == [1]
+    clock.now += 11
+    # an expired resource is recreated when looked up
+    assert cache.get({"n": 2}, lambda cfg: 3) == 3
+    assert closed == [1, 2]
+
+
+def test_plugin_resources():
+
+    class Resource(object):
+        closed = False
+
+        def close(self):
+            self.closed = True
+            raise IOError("closing errors are logged")
+
+    col = MockCollector("MyCollector", 99)
+    resource = col.resources.get(snap.ConfigMap(), lambda cfg: Resource())
+    col.ping()
+    assert not resource.closed
+    col.stop_plugin()
+    assert resource.closed and len(col.resources) == 0
+
+
+def test_plugin_expiry(monkeypatch):
+    import threading
+    import time
+
+    monkeypatch.setattr("snap_plugin.v1.plugin._EXPIRY_INTERVAL", .01)
+    closing = threading.Event()
+    closed = threading.Event()
+
+    def slow_close(resource):
+        closing.set()
+        time.sleep(.2)
+        closed.set()
+
+    col = MockCollector("MyCollector", 99)
+    col.resources = snap.ResourceCache(ttl=0, close=slow_close)
+    col.resources.get(snap.ConfigMap(), lambda cfg: object())
+    col._start_expiry()
+    # resources are closed on a thread of their own, not by pings
+    assert closing.wait(2)
+    start = time.time()
+    col.ping()
+    assert time.time() - start < .1
+    assert closed.wait(2)
+    col.stop_plugin()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.metrics_arg import MetricsArg
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+from .mock_plugins import MockCollector
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class _CountingCollector(MockCollector):
+
+    def __init__(self, *args, **kwargs):
+        super(_CountingCollector, self).__init__(*args, **kwargs)
+        self.calls = []
+
+    def collect(self, metrics):
+        self.calls.append(["/".join(e.value for e in m.namespace)
+                           for m in metrics])
+        if any(m.config.get("fail") for m in metrics):
+            raise Exception("collect failed")
+        collected = []
+        for metric in metrics:
+            values = [e.value for e in metric.namespace]
+            if "*" in values:
+                # a dynamic element: one metric per instance
+                for instance in ("1", "2"):
+                    collected.append(snap.MetricRow(
+                        [instance if v == "*" else v for v in values],
+                        len(self.calls)))
+            else:
+                metric.data = len(self.calls)
+                collected.append(metric)
+        return collected
+
+
+def _collect(col, *keys, **config):
+    request = MetricsArg(*[snap.Metric(namespace=key.split("/"),
+                                       config=config)
+                           for key in keys]).pb
+    reply = col.proxy.CollectMetrics(request, None)
+    if isinstance(reply, bytes):
+        reply = MetricsReply.FromString(reply)
+    return reply
+
+
+def _values(reply):
+    return [("/".join(nse.Value for nse in m.Namespace), m.int64_data)
+            for m in reply.metrics]
+
+
+def test_collector_cache(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("snap_plugin.v1.result_cache._now", clock)
+    col = _CountingCollector("MyCollector", 99, result_cache=True,
+                             cache_ttl=10 * 10 ** 9)
+    assert isinstance(col.result_cache, snap.ResultCache)
+    assert col.result_cache.ttl == 10
+    first = _collect(col, "a/x", "b/x")
+    assert _values(first) == [("a/x", 1), ("b/x", 1)]
+
+    # only the metrics missing from the cache are collected
+    clock.now += 5
+    reply = _collect(col, "b/x", "c/x")
+    assert col.calls == [["a/x", "b/x"], ["c/x"]]
+    assert _values(reply) == [("b/x", 1), ("c/x", 2)]
+    assert reply.metrics[0].Timestamp == first.metrics[1].Timestamp
+    assert (col.result_cache.hits, col.result_cache.misses) == (1, 3)
+
+    # configs are cached apart
+    _collect(col, "a/x", host="h1")
+    assert col.calls[-1] == ["a/x"]
+
+    # dynamic metrics are cached under the requested namespace
+    _collect(col, "d/*/x")
+    reply = _collect(col, "d/*/x")
+    assert len(col.calls) == 4
+    assert _values(reply) == [("d/1/x", 4), ("d/2/x", 4)]
+
+    # every task gets the cached metrics until they expire
+    clock.now += 6
+    assert _values(_collect(col, "a/x", "b/x")) == [("a/x", 5), ("b/x", 5)]
+    clock.now += 6
+    assert col.result_cache.expire() == 3
+    col._expire()
+    assert len(col.result_cache) == 2
+
+    # errors aren't cached
+    for _ in range(2):
+        assert _collect(col, "e/x", fail=True).error != ""
+    assert len(col.calls) == 7
+    col.stop_plugin()
+    assert len(col.result_cache) == 0
+
+    # the cache is opt-in
+    assert MockCollector("MyCollector", 99).result_cache is None
+
+
+def test_lru():
+    cache = snap.ResultCache(ttl=60, max_size=2)
+    col = _CountingCollector("MyCollector", 99)
+    col.result_cache = cache
+    _collect(col, "a/x", "b/x")
+    _collect(col, "a/x")
+    _collect(col, "c/x")
+    assert len(cache) == 2
+    # "b" was the least recently used
+    _collect(col, "a/x", "b/x", "c/x")
+    assert col.calls[-1] == ["b/x"]
+    with pytest.raises(ValueError):
+        snap.ResultCache(ttl=1, max_size=0)
+
+
+def test_left_out_metrics_not_cached():
+    cache = snap.ResultCache(ttl=60)
+    requested = MetricsArg(*[snap.Metric(namespace=("acme", name))
+                             for name in ("a", "b")]).pb.metrics
+    cached, misses = cache.lookup(requested)
+    assert len(misses) == 2
+    # a partial reply, e.g. "b" missed the deadline
+    reply = MetricsReply(metrics=[requested[0]])
+    merged = MetricsReply.FromString(cache.merge(requested, cached, reply))
+    assert len(merged.metrics) == 1
+    cached, misses = cache.lookup(requested)
+    assert cached[1] is None
+    assert [nse.Value for nse in misses[0].Namespace] == ["acme", "b"]
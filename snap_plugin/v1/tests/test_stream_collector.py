@@ -42,7 +42,9 @@ def test_monitor():
 
 def test_stream():
     sys.stdout = ThreadPrinter()
-    sys.argv = ["", '{"LogLevel": 1, "PingTimeoutDuration": 5000}']
+    # the stream holds one of the slots of the plugin requests
+    sys.argv = ["", '{"LogLevel": 1, "PingTimeoutDuration": 5000, '
+                '"MaxConcurrentRPCs": 1}']
     col = MockStreamCollector("MyStreamCollector", 99)
     col.start()
     t_end = time.time() + 5
@@ -249,3 +251,25 @@ def test_get_config_policy():
     assert reply.error == ""
     assert reply.string_policy["intel.streaming.random"].rules["password"].default == "pass"
     col.stop()
+
+
+def test_stream_returns_metric_list():
+    class ListStreamCollector(MockStreamCollector):
+        def stream(self, requested_metrics):
+            time.sleep(.01)
+            for metric in requested_metrics:
+                metric.data = 3
+            # the requested MetricList itself, or a slice of it
+            return requested_metrics[:1]
+
+    class Context(object):
+        def is_active(self):
+            return True
+
+    col = ListStreamCollector("MyStreamCollector", 99)
+    metric = snap.Metric(namespace=("intel", "streaming", "list"))
+    replies = col.proxy.StreamMetrics(iter([CollectArg(metric).pb]),
+                                      Context())
+    reply = next(replies)
+    col.proxy.done_queue.put(True)
+    assert [m.int64_data for m in reply.Metrics_Reply.metrics] == [3]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# http://www.apache.org/licenses/LICENSE-2.0.txt
+#
+# Copyright 2017 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import snap_plugin.v1 as snap
+from snap_plugin.v1.encoder import encode_metrics_reply
+from snap_plugin.v1.plugin_pb2 import Metric as PbMetric
+from snap_plugin.v1.plugin_pb2 import MetricsReply
+
+
+def test_interned():
+    tags = snap.TagSet({"host": "a"}, rack="r1")
+    assert snap.TagSet(rack="r1", host="a") is tags
+    assert snap.TagSet(host="b", rack="r1") is not tags
+    assert tags == {"host": "a", "rack": "r1"}
+    assert dict(tags) == {"host": "a", "rack": "r1"}
+    assert len(tags) == 2 and "host" in tags and tags["rack"] == "r1"
+    assert tags.union(rack="r2") is snap.TagSet(host="a", rack="r2")
+    assert {tags: 1}[snap.TagSet(host="a", rack="r1")] == 1
+
+
+def test_fragment():
+    tags = snap.TagSet(host="a", rack="r1")
+    pb = PbMetric()
+    pb.MergeFromString(tags.fragment)
+    assert dict(pb.Tags) == {"host": "a", "rack": "r1"}
+
+
+def test_metric_tags():
+    tags = snap.TagSet(host="a")
+    metric = snap.Metric(namespace=("foo",), tags=tags)
+    assert dict(metric.tags) == {"host": "a"}
+    metric.tags = snap.TagSet(host="b")
+    assert dict(metric.tags) == {"host": "b"}
+
+
+def test_apply():
+    tags = snap.TagSet({"instance-id": "xyz"})
+    metrics = [snap.Metric(namespace=("foo",), tags={"a": "1",
+                                                     "instance-id": "old"})
+               for _ in range(3)]
+    assert tags.apply(metrics) is metrics
+    for metric in metrics:
+        assert dict(metric.tags) == {"a": "1", "instance-id": "xyz"}
+
+    # the metrics of a MetricList are tagged without wrapping them
+    metric_list = snap.MetricList(m.pb for m in metrics)
+    snap.TagSet(host="h").apply(metric_list)
+    assert all(pb.Tags["host"] == "h" for pb in metric_list._items)
+    assert not any(isinstance(item, snap.Metric)
+                   for item in metric_list._items)
+
+    # a batch is tagged once
+    batch = snap.MetricBatch(namespace=("foo",), data=[1, 2])
+    tags.apply([batch])
+    assert all(m.tags["instance-id"] == "xyz" for m in batch)
+
+
+def test_apply_rows():
+    tags = snap.TagSet(host="h")
+    plain = ("foo", "plain"), 1
+    metrics = [snap.MetricRow(("foo", "a"), 1),
+               snap.MetricRow(("foo", "b"), 2, tags={"host": "old", "x": "1"}),
+               plain]
+    assert tags.apply(metrics) is metrics
+    assert metrics[0].tags is tags
+    assert dict(metrics[1].tags) == {"host": "h", "x": "1"}
+    assert metrics[2] == snap.MetricRow(("foo", "plain"), 1, tags=tags)
+
+    metric_list = snap.MetricList([snap.Metric(namespace=("foo",)).pb])
+    metric_list.append(snap.MetricRow(("foo", "a"), 1))
+    tags.apply(metric_list)
+    assert metric_list[0].tags["host"] == "h"
+    assert metric_list[1].tags is tags
+
+    with pytest.raises(TypeError):
+        tags.apply(iter([snap.MetricRow(("foo", "a"), 1)]))
+
+
+def test_encoded_rows():
+    tags = snap.TagSet(host="a", rack="r1")
+    rows = [snap.MetricRow(("foo", str(i)), i, timestamp=1.0, tags=tags)
+            for i in range(3)]
+    reply = MetricsReply.FromString(encode_metrics_reply(rows))
+    expected = MetricsReply(metrics=[
+        snap.Metric(namespace=("foo", str(i)), data=i, timestamp=1.0,
+                    tags={"host": "a", "rack": "r1"}).pb
+        for i in range(3)])
+    assert reply == expected
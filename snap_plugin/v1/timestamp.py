@@ -15,34 +15,102 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
+import threading
+import time as _time
+from contextlib import contextmanager
 
 from snap_plugin.v1.plugin_pb2 import Time as PbTime
 
+_NS = 10 ** 9
+
+try:
+    _time_ns = _time.time_ns
+except AttributeError:
+    # python < 3.7
+    def _time_ns():
+        return int(_time.time() * _NS)
+
+try:
+    from contextvars import ContextVar, copy_context
+except ImportError:
+    # python < 3.7
+    _vars = []
+
+    class ContextVar(threading.local):
+        """The part of contextvars.ContextVar used here, per thread"""
+
+        def __init__(self, name, default=None):
+            # called again by every thread using the variable
+            self._value = default
+            if not any(var is self for var in _vars):
+                _vars.append(self)
+
+        def get(self):
+            return self._value
+
+        def set(self, value):
+            token, self._value = self._value, value
+            return token
+
+        def reset(self, token):
+            self._value = token
+
+    class _Context(object):
+        """The part of contextvars.Context used here"""
+
+        def __init__(self):
+            self._values = [(var, var.get()) for var in _vars]
+
+        def run(self, func, *args, **kwargs):
+            tokens = [(var, var.set(value)) for var, value in self._values]
+            try:
+                return func(*args, **kwargs)
+            finally:
+                for var, token in reversed(tokens):
+                    var.reset(token)
+
+    def copy_context():
+        """Returns the values of the context variables of the thread, to run
+        a function with them in another thread"""
+        return _Context()
+
+# holds the timestamp shared by the metrics of the reply being built (see
+# _reply_timestamp).  A context variable rather than a thread local so that
+# the concurrent requests of an asyncio plugin each see their own.
+_reply = ContextVar("snap_reply_time_ns", default=None)
+
 
 class Timestamp(object):
     """Represents time in seconds since Epoch
 
     Args:
-        time (:obj:`float`): time in seconds since Epoch
+        time (:obj:`float`): time in seconds since Epoch.  If it is not
+            provided the time already held by `pb` is used, or the current
+            time when no `pb` is given.
+        time_ns (:obj:`int`): time in nanoseconds since Epoch, an alternative
+            to `time` which is written without float math.
+        pb (:py:class:`snap_plugin.v1.plugin_pb2.Time`): wrapped protobuf
+            message
 
     Note:
         In most cases you shouldn't need to instantiate this class directly as
         the getter and setter on Metric automatically convert a `time.time()`
         into a :py:class:`~snap_plugin.v1.timestamp.Timestamp`.
     """
-    def __init__(self, time=time.time(), pb=PbTime):
-        self._pb = pb
-        self._time = time
-        self._pb.sec = int(self._time)
-        self._pb.nsec = int((self._time - self._pb.sec) * 10 ** 9)
 
-    def __getattr__(self, attr):
-        if attr in self.__dict__:
-            # this object has it
-            return getattr(self, attr)
-        # proxy to the wrapped object
-        return getattr(self._pb, attr)
+    __slots__ = ("_pb", "_time")
+
+    def __init__(self, time=None, pb=None, time_ns=None):
+        if pb is None:
+            pb = PbTime()
+            if time is None and time_ns is None:
+                time_ns = _now_ns()
+        self._pb = pb
+        self._time = None
+        if time is not None:
+            self.set(time)
+        elif time_ns is not None:
+            self.set_ns(time_ns)
 
     @property
     def time(self):
@@ -51,8 +119,34 @@ class Timestamp(object):
         Returns:
             :obj:`float`
         """
+        if self._time is None:
+            self._time = self._pb.sec + self._pb.nsec * 10 ** -9
         return self._time
 
+    @property
+    def time_ns(self):
+        """Gets time in nanoseconds since Epoch
+
+        Returns:
+            :obj:`int`
+        """
+        return self._pb.sec * _NS + self._pb.nsec
+
+    @property
+    def sec(self):
+        "Whole seconds since Epoch."
+        return self._pb.sec
+
+    @property
+    def nsec(self):
+        "Nanoseconds past `sec`."
+        return self._pb.nsec
+
+    @property
+    def pb(self):
+        "Returns the wrapped protobuf data holder."
+        return self._pb
+
     def set(self, time):
         """Sets time in seconds since Epoch
 
@@ -63,5 +157,53 @@ class Timestamp(object):
             None
         """
         self._time = time
-        self._pb.sec = int(self._time)
-        self._pb.nsec = int((self._time - self._pb.sec) * 10 ** 9)
+        _set_pb(self._pb, time)
+
+    def set_ns(self, time_ns):
+        """Sets time in nanoseconds since Epoch
+
+        Args:
+            time_ns (:obj:`int`): time in nanoseconds since Epoch (see
+                time.time_ns())
+
+        Returns:
+            None
+        """
+        self._time = None
+        _set_pb_ns(self._pb, time_ns)
+
+
+def _split(time):
+    """Splits seconds since Epoch into whole seconds and nanoseconds"""
+    sec = int(time)
+    return sec, int((time - sec) * 10 ** 9)
+
+
+def _set_pb(pb, time):
+    """Writes seconds since Epoch into a protobuf Time"""
+    pb.sec, pb.nsec = _split(time)
+
+
+def _set_pb_ns(pb, time_ns):
+    """Writes nanoseconds since Epoch into a protobuf Time"""
+    pb.sec, pb.nsec = divmod(time_ns, _NS)
+
+
+def _now_ns():
+    """Returns the timestamp of the reply being built, or the current time in
+    nanoseconds since Epoch"""
+    now = _reply.get()
+    if now is None:
+        return _time_ns()
+    return now
+
+
+@contextmanager
+def _reply_timestamp(time_ns):
+    """Stamps the metrics created without a timestamp in the block with
+    `time_ns` (nanoseconds since Epoch).  None keeps the current time."""
+    token = _reply.set(time_ns)
+    try:
+        yield
+    finally:
+        _reply.reset(token)